@@ -2,6 +2,11 @@
 
 All the configuration of OTCamera is done here.
 
+The user config YAML file is described by a declarative schema of frozen dataclasses
+(see `UserConfig`). It is loaded and validated in a single pass by `load`, which
+reports all invalid values at once. The currently active configuration is available
+as the frozen `settings` object. The module variables mirror it.
+
 """
 # Copyright (C) 2023 OpenTrafficCam Contributors
 # <https://github.com/OpenTrafficCam>
@@ -21,7 +26,19 @@ All the configuration of OTCamera is done here.
 
 import socket
 import sys
+from dataclasses import dataclass, field, fields, is_dataclass, replace
+from operator import attrgetter
 from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    Tuple,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
 try:
     from yaml import CSafeLoader as SafeLoader
@@ -31,251 +48,626 @@ except ImportError:
 import yaml
 
 
-def parse_user_config(config_file: str):
-    """Parses the OTCamera user configuration YAML file.
+class ConfigValidationError(Exception):
+    """Raised if the user config file contains invalid values.
 
     Args:
-        config_file (str): The path to the user configuration YAML file.
+        config_file (str): The path to the user config file.
+        errors (list[str]): All errors found in the user config file.
     """
-    config_file = str(Path(config_file).expanduser().resolve())
-    try:
-        with open(config_file, mode="rb") as f:
-            user_config = yaml.load(f, Loader=SafeLoader)
-    except FileNotFoundError:
-        # TODO: use log module
-        print("No user config found.")
-        return
 
-    module = sys.modules[__name__]
-    setattr(module, "DEBUG_MODE_ON", user_config["debug_mode"]["enable"])
+    def __init__(self, config_file: str, errors: list[str]) -> None:
+        self.config_file = config_file
+        self.errors = errors
+        super().__init__(
+            f"Invalid user config '{config_file}':\n"
+            + "\n".join(f"  - {error}" for error in errors)
+        )
 
-    try:
-        section = user_config["debug_mode"]
-    except KeyError:
-        _print_key_err_msg("debug_mode")
-    else:
-        try:
-            setattr(module, "DEBUG_MODE_ON", section["enable"])
-        except KeyError:
-            _print_key_err_msg("debug_mode.enable")
 
-    try:
-        section = user_config["relay_server"]
-    except KeyError:
-        _print_key_err_msg("relay_server")
-    else:
-        try:
-            setattr(module, "USE_RELAY", section["enable"])
-        except KeyError:
-            _print_key_err_msg("relay_server.enable")
+def _setting(
+    attr: str,
+    check: Optional[Callable[[Any], bool]] = None,
+    requirement: str = "",
+    convert: Optional[Callable[[Any], Any]] = None,
+) -> Any:
+    """Declares a setting of the user config schema.
 
-    try:
-        section = user_config["recording"]
-    except KeyError:
-        _print_key_err_msg("recording")
-    else:
-        try:
-            setattr(module, "START_HOUR", section["start_hour"])
-        except KeyError:
-            _print_key_err_msg("recording.start_hour")
-        try:
-            setattr(module, "END_HOUR", section["end_hour"])
-        except KeyError:
-            _print_key_err_msg("recording.end_hour")
-        try:
-            global INTERVAL_LENGTH
-            setattr(module, "INTERVAL_LENGTH", section["interval_length"])
-        except KeyError:
-            _print_key_err_msg("recording.interval_length")
-        try:
-            setattr(module, "NUM_INTERVALS", section["num_intervals"])
-        except KeyError:
-            _print_key_err_msg("recording.num_invervals")
-        try:
-            setattr(module, "MIN_FREE_SPACE", section["min_free_space"])
-        except KeyError:
-            _print_key_err_msg("recording.min_free_space")
+    Args:
+        attr (str): Name of the module variable mirroring the setting.
+        check (Optional[Callable[[Any], bool]]): Additional validation of the value.
+        requirement (str): Description of the requirement checked by `check`.
+        convert (Optional[Callable[[Any], Any]]): Conversion applied to the YAML
+            value before validating it.
+    """
+    return field(
+        metadata={
+            "attr": attr,
+            "check": check,
+            "requirement": requirement,
+            "convert": convert,
+        }
+    )
 
-    try:
-        section = user_config["camera"]
-    except KeyError:
-        _print_key_err_msg("camera")
-    else:
-        try:
-            setattr(module, "FPS", section["fps"])
-        except KeyError:
-            _print_key_err_msg("camera.fps")
-        try:
-            setattr(
-                module,
-                "RESOLUTION",
-                (section["resolution"]["width"], section["resolution"]["height"]),
+
+def _resolve_path(path: str) -> str:
+    return str(Path(path).expanduser().resolve())
+
+
+def _resolution(value: dict) -> Tuple[int, int]:
+    return (value["width"], value["height"])
+
+
+def _hour(value: int) -> bool:
+    return 0 <= value <= 24
+
+
+def _positive(value: Union[int, float]) -> bool:
+    return value > 0
+
+
+def _not_negative(value: Union[int, float]) -> bool:
+    return value >= 0
+
+
+def _upload_scheme(value: str) -> bool:
+    return value.lower() in ("ftp", "ftps", "sftp", "scp", "http", "https")
+
+
+def _minutes(time: str) -> int:
+    hours, minutes = time.strip().split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _time_windows(value: list) -> tuple:
+    """Converts windows like "22:00-06:00" to minutes after midnight."""
+    windows = []
+    for window in value:
+        start, end = str(window).split("-")
+        windows.append((_minutes(start), _minutes(end)))
+    return tuple(windows)
+
+
+def _valid_time_windows(value: tuple) -> bool:
+    return all(0 <= minute <= 24 * 60 for window in value for minute in window)
+
+
+def _positive_resolution(value: Tuple[int, int]) -> bool:
+    return value[0] > 0 and value[1] > 0
+
+
+@dataclass(frozen=True)
+class DebugModeConfig:
+    enable: bool = _setting("DEBUG_MODE_ON")
+
+
+@dataclass(frozen=True)
+class RelayServerConfig:
+    enable: bool = _setting("USE_RELAY")
+
+
+@dataclass(frozen=True)
+class RecordingConfig:
+    start_hour: int = _setting("START_HOUR", _hour, "between 0 and 24")
+    end_hour: int = _setting("END_HOUR", _hour, "between 0 and 24")
+    interval_length: int = _setting(
+        "INTERVAL_LENGTH", lambda value: 0 < value <= 60, "between 1 and 60"
+    )
+    num_intervals: int = _setting("NUM_INTERVALS", _not_negative, "not negative")
+    min_free_space: float = _setting("MIN_FREE_SPACE", _not_negative, "not negative")
+
+
+@dataclass(frozen=True)
+class CameraConfig:
+    fps: int = _setting("FPS", _positive, "positive")
+    resolution: Tuple[int, int] = _setting(
+        "RESOLUTION", _positive_resolution, "positive", _resolution
+    )
+    exposure_mode: str = _setting("EXPOSURE_MODE")
+    drc_strength: str = _setting("DRC_STRENGTH")
+    rotation: int = _setting(
+        "ROTATION", lambda value: value in (0, 90, 180, 270), "0, 90, 180 or 270"
+    )
+    awb_mode: str = _setting("AWB_MODE")
+    meter_mode: str = _setting("METER_MODE")
+
+
+@dataclass(frozen=True)
+class LivePreviewConfig:
+    resolution: Tuple[int, int] = _setting(
+        "LIVE_PREVIEW_RESOLUTION", _positive_resolution, "positive", _resolution
+    )
+    quality: int = _setting(
+        "LIVE_PREVIEW_QUALITY", lambda value: 1 <= value <= 100, "between 1 and 100"
+    )
+
+
+@dataclass(frozen=True)
+class PreviewConfig:
+    path: str = _setting("PREVIEW_PATH", convert=_resolve_path)
+    format: str = _setting("PREVIEW_FORMAT")
+    interval: int = _setting(
+        "PREVIEW_INTERVAL", lambda value: 0 < value < 60, "between 1 and 59"
+    )
+    send_to_external: bool = _setting("SEND_PREVIEW_TO_EXTERNAL")
+    url: str = _setting("PREVIEW_URL")
+    live: LivePreviewConfig
+
+
+@dataclass(frozen=True)
+class ServerUploadConfig:
+    upload: bool = _setting("SERVER_UPLOAD_UPLOAD")
+    scheme: str = _setting(
+        "SERVER_UPLOAD_SCHEME",
+        _upload_scheme,
+        "one of ftp, ftps, sftp, scp, http, https",
+    )
+    host: Optional[str] = _setting("SERVER_UPLOAD_HOST")
+    port: Optional[int] = _setting("SERVER_UPLOAD_PORT")
+    user: Optional[str] = _setting("SERVER_UPLOAD_USER")
+    password: Optional[str] = _setting("SERVER_UPLOAD_PASSWORD")
+    server_source: str = _setting("SERVER_UPLOAD_SERVER_SOURCE")
+    archive: bool = _setting("SERVER_UPLOAD_ARCHIVE")
+    windows: tuple = _setting(
+        "SERVER_UPLOAD_WINDOWS",
+        _valid_time_windows,
+        "between 00:00 and 24:00",
+        convert=_time_windows,
+    )
+    require_external_power: bool = _setting("SERVER_UPLOAD_REQUIRE_EXTERNAL_POWER")
+
+
+@dataclass(frozen=True)
+class EncoderConfig:
+    profile: str = _setting("H264_PROFILE")
+    level: str = _setting("H264_LEVEL", convert=str)
+    bitrate: int = _setting("H264_BITRATE", _not_negative, "not negative")
+    quality: int = _setting(
+        "H264_QUALITY", lambda value: 0 <= value <= 40, "between 0 and 40"
+    )
+
+
+@dataclass(frozen=True)
+class ProxyConfig:
+    enable: bool = _setting("USE_PROXY")
+    resolution: Tuple[int, int] = _setting(
+        "PROXY_RESOLUTION", _positive_resolution, "positive", _resolution
+    )
+    bitrate: int = _setting("PROXY_BITRATE", _positive, "positive")
+
+
+@dataclass(frozen=True)
+class VideoConfig:
+    dir: str = _setting("VIDEO_DIR", convert=_resolve_path)
+    format: str = _setting("VIDEO_FORMAT")
+    resolution: Tuple[int, int] = _setting(
+        "RESOLUTION_SAVED_VIDEO_FILE", _positive_resolution, "positive", _resolution
+    )
+    keyframe_index: bool = _setting("USE_KEYFRAME_INDEX")
+    encoder: EncoderConfig
+    proxy: ProxyConfig
+
+
+@dataclass(frozen=True)
+class WifiConfig:
+    delay: int = _setting("WIFI_DELAY", _not_negative, "not negative")
+
+
+@dataclass(frozen=True)
+class LedConfig:
+    enable: bool = _setting("USE_LED")
+
+
+@dataclass(frozen=True)
+class ButtonConfig:
+    enable: bool = _setting("USE_BUTTONS")
+
+
+@dataclass(frozen=True)
+class WatchdogConfig:
+    enable: bool = _setting("USE_WATCHDOG")
+    stall_timeout: float = _setting("WATCHDOG_STALL_TIMEOUT", _positive, "positive")
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    enable: bool = _setting("USE_METRICS")
+    textfile: Optional[str] = _setting("METRICS_TEXTFILE")
+    interval: float = _setting("METRICS_INTERVAL", _positive, "positive")
+    host: str = _setting("METRICS_HOST")
+    port: Optional[int] = _setting("METRICS_PORT")
+
+
+@dataclass(frozen=True)
+class ProfilerConfig:
+    enable: bool = _setting("USE_PROFILER")
+    interval: float = _setting("PROFILER_INTERVAL", _positive, "positive")
+
+
+@dataclass(frozen=True)
+class TelemetryConfig:
+    enable: bool = _setting("USE_TELEMETRY")
+    interval: float = _setting("TELEMETRY_INTERVAL", _positive, "positive")
+
+
+@dataclass(frozen=True)
+class WebServerConfig:
+    enable: bool = _setting("USE_WEBSERVER")
+    host: str = _setting("WEBSERVER_HOST")
+    port: int = _setting("WEBSERVER_PORT", _positive, "positive")
+
+
+@dataclass(frozen=True)
+class UsbOffloadConfig:
+    enable: bool = _setting("USE_USB_OFFLOAD")
+
+
+@dataclass(frozen=True)
+class MsTeamsConfig:
+    enable: bool = _setting("USE_MS_TEAMS_WEBHOOK")
+    url: Optional[str] = _setting("MS_TEAMS_WEBHOOK_URL")
+
+
+@dataclass(frozen=True)
+class UserConfig:
+    """Schema of the user config YAML file.
+
+    Each field corresponds to a section of the YAML file. The leaf fields of the
+    sections correspond to the module variables of this module.
+    """
+
+    debug_mode: DebugModeConfig
+    relay_server: RelayServerConfig
+    recording: RecordingConfig
+    camera: CameraConfig
+    preview: PreviewConfig
+    server_upload: ServerUploadConfig
+    video: VideoConfig
+    wifi: WifiConfig
+    leds: LedConfig
+    buttons: ButtonConfig
+    watchdog: WatchdogConfig
+    metrics: MetricsConfig
+    profiler: ProfilerConfig
+    telemetry: TelemetryConfig
+    webserver: WebServerConfig
+    usb_offload: UsbOffloadConfig
+    msteams: MsTeamsConfig
+
+
+@dataclass(frozen=True)
+class _SchemaEntry:
+    attr: str
+    keys: Tuple[str, ...]
+    type: Any
+    check: Optional[Callable[[Any], bool]]
+    requirement: str
+    convert: Optional[Callable[[Any], Any]]
+    get: Callable[[UserConfig], Any]
+
+    @property
+    def key(self) -> str:
+        return ".".join(self.keys)
+
+
+def _compile_schema(cls: type, keys: Tuple[str, ...] = ()) -> list[_SchemaEntry]:
+    """Flattens the schema into entries with precompiled accessors."""
+    entries: list[_SchemaEntry] = []
+    type_hints = get_type_hints(cls)
+    for schema_field in fields(cls):
+        field_keys = keys + (schema_field.name,)
+        field_type = type_hints[schema_field.name]
+        if is_dataclass(field_type):
+            entries.extend(_compile_schema(field_type, field_keys))
+            continue
+        metadata = schema_field.metadata
+        entries.append(
+            _SchemaEntry(
+                attr=metadata["attr"],
+                keys=field_keys,
+                type=field_type,
+                check=metadata["check"],
+                requirement=metadata["requirement"],
+                convert=metadata["convert"],
+                get=attrgetter(".".join(field_keys)),
             )
-        except KeyError:
-            _print_key_err_msg("camera.resolution.width, camera.resolution.height")
-        try:
-            setattr(module, "EXPOSURE_MODE", section["exposure_mode"])
-        except KeyError:
-            _print_key_err_msg("camera.exposure_mode")
-        try:
-            setattr(module, "DRC_STRENGTH", section["drc_strength"])
-        except KeyError:
-            _print_key_err_msg("camera.drc_strength")
-        try:
-            setattr(module, "ROTATION", section["rotation"])
-        except KeyError:
-            _print_key_err_msg("cammera.rotation")
-        try:
-            setattr(module, "AWB_MODE", section["awb_mode"])
-        except KeyError:
-            _print_key_err_msg("camera.awb_mode")
-        try:
-            setattr(module, "METER_MODE", section["meter_mode"])
-        except KeyError:
-            _print_key_err_msg("camera.meter_mode")
+        )
+    return entries
+
+
+_SCHEMA = _compile_schema(UserConfig)
+_SCHEMA_BY_ATTR = {entry.attr: entry for entry in _SCHEMA}
+_LEAF_KEYS = {entry.keys for entry in _SCHEMA}
+
+
+def _is_instance(value: Any, expected: Any) -> bool:
+    if get_origin(expected) is Union:
+        return any(_is_instance(value, arg) for arg in get_args(expected))
+    if expected is type(None):
+        return value is None
+    if get_origin(expected) is tuple:
+        return isinstance(value, tuple) and all(
+            _is_instance(item, arg) for item, arg in zip(value, get_args(expected))
+        )
+    if expected is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def _build(cls: type, values: dict[str, Any], keys: Tuple[str, ...] = ()) -> Any:
+    """Builds the frozen schema object `cls` from module variable values."""
+    type_hints = get_type_hints(cls)
+    kwargs = {}
+    for schema_field in fields(cls):
+        field_keys = keys + (schema_field.name,)
+        field_type = type_hints[schema_field.name]
+        if is_dataclass(field_type):
+            kwargs[schema_field.name] = _build(field_type, values, field_keys)
+        else:
+            kwargs[schema_field.name] = values[schema_field.metadata["attr"]]
+    return cls(**kwargs)
+
+
+def _with_values(obj: Any, values: dict[str, Any]) -> Any:
+    """Returns a copy of the frozen schema object `obj` updated with `values`."""
+    changes = {}
+    for schema_field in fields(obj):
+        current = getattr(obj, schema_field.name)
+        if is_dataclass(current):
+            updated = _with_values(current, values)
+            if updated is not current:
+                changes[schema_field.name] = updated
+        elif schema_field.metadata["attr"] in values:
+            changes[schema_field.name] = values[schema_field.metadata["attr"]]
+    return replace(obj, **changes) if changes else obj
+
+
+@dataclass(frozen=True)
+class LoadedConfig:
+    """A validated user config file.
+
+    Attributes:
+        settings (UserConfig): The validated configuration. Settings missing in the
+            file have their default value.
+        warnings (list[str]): Settings that were missing or unknown.
+    """
 
-    try:
-        section = user_config["preview"]
-    except KeyError:
-        _print_key_err_msg("preview")
-    else:
-        try:
-            preview_path = str(Path(section["path"]).expanduser().resolve())
-            setattr(module, "PREVIEW_PATH", preview_path)
-        except KeyError:
-            _print_key_err_msg("preview.path")
-        try:
-            setattr(module, "PREVIEW_FORMAT", section["format"])
-        except KeyError:
-            print("preview.format")
-        try:
-            setattr(module, "PREVIEW_INTERVAL", section["interval"])
-        except KeyError:
-            _print_key_err_msg("preview.interval")
-        try:
-            setattr(module, "SEND_PREVIEW_TO_EXTERNAL", section["send_to_external"])
-        except KeyError:
-            _print_key_err_msg("preview.send_to_external")
-        try:
-            setattr(module, "PREVIEW_URL", section["url"])
-        except KeyError:
-            _print_key_err_msg("preview.url")
+    settings: UserConfig
+    warnings: list[str]
 
-    try:
-        section = user_config["server_upload"]
-    except KeyError:
-        _print_key_err_msg("server_upload")
-    else:
-        for member, config_key in ({
-            "UPLOAD": "upload",
-            "SCHEME" : "scheme",
-            "HOST" : "host",
-            "PORT" : "port",
-            "USER" : "user",
-            "PASSWORD": "password",
-            "SERVER_SOURCE": "server_source",
-        }).items():
-            try:
-                setattr(module, f"SERVER_UPLOAD_{member}", section[config_key])
-            except KeyError:
-                _print_key_err_msg(f"server_upload.{config_key}")
+    def to_values(self) -> dict[str, Any]:
+        """Mapping of the names of the module variables to their configured values."""
+        return {entry.attr: entry.get(self.settings) for entry in _SCHEMA}
 
-    try:
-        section = user_config["video"]
-    except KeyError:
-        _print_key_err_msg("video")
-    else:
-        try:
-            video_dir = str(Path(section["dir"]).expanduser().resolve())
-            setattr(module, "VIDEO_DIR", video_dir)
-        except KeyError:
-            _print_key_err_msg("video.dir")
+
+_cache: Optional[Tuple[Tuple[str, int, int], LoadedConfig]] = None
+
+
+def load(config_file: str) -> LoadedConfig:
+    """Loads and validates the user config YAML file in a single pass.
+
+    The result is cached as long as the file's modification time and size do not
+    change.
+
+    Args:
+        config_file (str): The path to the user configuration YAML file.
+
+    Raises:
+        FileNotFoundError: If the user config file does not exist.
+        ConfigValidationError: If the user config file contains invalid values. All
+            invalid values are reported at once.
+
+    Returns:
+        LoadedConfig: The validated configuration.
+    """
+    global _cache
+
+    config_path = Path(config_file).expanduser().resolve()
+    stat = config_path.stat()
+    cache_key = (str(config_path), stat.st_mtime_ns, stat.st_size)
+    if _cache is not None and _cache[0] == cache_key:
+        return _cache[1]
+
+    with open(config_path, mode="rb") as f:
+        user_config = yaml.load(f, Loader=SafeLoader) or {}
+
+    errors: list[str] = []
+    warnings = [
+        f"Unknown setting '{key}' in user config"
+        for key in _find_unknown_keys(user_config)
+    ]
+    missing_sections: set[str] = set()
+    values = {entry.attr: entry.get(DEFAULTS) for entry in _SCHEMA}
+    for entry in _SCHEMA:
         try:
-            setattr(module, "VIDEO_FORMAT", section["format"])
+            value = _lookup(user_config, entry.keys)
         except KeyError:
-            _print_key_err_msg("video.format")
+            section = entry.keys[0]
+            if section in user_config:
+                warnings.append(f"Setting '{entry.key}' missing, using default")
+            elif section not in missing_sections:
+                missing_sections.add(section)
+                warnings.append(f"Section '{section}' missing, using defaults")
+            continue
         try:
-            setattr(
-                module,
-                "RESOLUTION_SAVED_VIDEO_FILE",
-                (section["resolution"]["width"], section["resolution"]["height"]),
+            if entry.convert is not None:
+                value = entry.convert(value)
+        except (KeyError, TypeError, ValueError):
+            errors.append(f"'{entry.key}' has an invalid format: {value!r}")
+            continue
+        if not _is_instance(value, entry.type):
+            errors.append(
+                f"'{entry.key}' must be of type {_type_name(entry.type)}: {value!r}"
             )
-        except KeyError:
-            print("KeyError in config file.")
-            _print_key_err_msg("video.resolution.width, video.resolution.height")
-
-        try:
-            section = section["encoder"]
-        except KeyError:
-            _print_key_err_msg("encoder")
+        elif entry.check is not None and not entry.check(value):
+            errors.append(f"'{entry.key}' must be {entry.requirement}: {value!r}")
         else:
-            try:
-                setattr(module, "H264_PROFILE", section["profile"])
-            except KeyError:
-                _print_key_err_msg("encoder.profile")
-            try:
-                setattr(module, "H264_LEVEL", str(section["level"]))
-            except KeyError:
-                _print_key_err_msg("encoder.level")
-            try:
-                setattr(module, "H264_BITRATE", section["bitrate"])
-            except KeyError:
-                _print_key_err_msg("encoder.bitrate")
-            try:
-                global H264_QUALITY
-                H264_QUALITY = section["quality"]
-                setattr(module, "H264_QUALITY", section["quality"])
-            except KeyError:
-                _print_key_err_msg("encoder.quality")
+            values[entry.attr] = value
+
+    if errors:
+        raise ConfigValidationError(str(config_path), errors)
+
+    loaded = LoadedConfig(_build(UserConfig, values), warnings)
+    _cache = (cache_key, loaded)
+    return loaded
+
+
+def _lookup(user_config: Any, keys: Tuple[str, ...]) -> Any:
+    value = user_config
+    for key in keys:
+        if not isinstance(value, dict):
+            raise KeyError(key)
+        value = value[key]
+    return value
+
+
+def _find_unknown_keys(user_config: Any, keys: Tuple[str, ...] = ()) -> list[str]:
+    if not isinstance(user_config, dict):
+        return []
+    known = {
+        entry.keys[: len(keys) + 1]
+        for entry in _SCHEMA
+        if entry.keys[: len(keys)] == keys
+    }
+    unknown = []
+    for key, value in user_config.items():
+        key_path = keys + (key,)
+        if key_path not in known:
+            unknown.append(".".join(str(part) for part in key_path))
+        elif key_path not in _LEAF_KEYS:
+            unknown.extend(_find_unknown_keys(value, key_path))
+    return unknown
+
+
+def _type_name(expected: Any) -> str:
+    if get_origin(expected) is Union:
+        return " or ".join(_type_name(arg) for arg in get_args(expected))
+    if expected is type(None):
+        return "null"
+    if get_origin(expected) is tuple:
+        return f"tuple[{', '.join(_type_name(arg) for arg in get_args(expected))}]"
+    if expected is float:
+        return "number"
+    return getattr(expected, "__name__", str(expected))
+
+
+def parse_user_config(config_file: str) -> list[str]:
+    """Parses the OTCamera user configuration YAML file.
 
-    try:
-        section = user_config["wifi"]
-    except KeyError:
-        _print_key_err_msg("wifi")
-    else:
-        try:
-            setattr(module, "WIFI_DELAY", section["delay"])
-        except KeyError:
-            _print_key_err_msg("wifi.delay")
+    The parsed values are applied to `settings` and the module variables of this
+    module. The path of the parsed file is remembered in `USER_CONFIG_FILE`, so that
+    changes to it can be picked up while OTCamera is running.
 
-    try:
-        section = user_config["leds"]
-    except KeyError:
-        _print_key_err_msg("leds")
-    else:
-        try:
-            setattr(module, "USE_LED", section["enable"])
-        except KeyError:
-            _print_key_err_msg("leds.enable")
+    Args:
+        config_file (str): The path to the user configuration YAML file.
+
+    Raises:
+        ConfigValidationError: If the user config file contains invalid values.
 
+    Returns:
+        list[str]: Warnings about missing or unknown settings.
+    """
     try:
-        section = user_config["buttons"]
-    except KeyError:
-        _print_key_err_msg("buttons")
-    else:
-        try:
-            setattr(module, "USE_BUTTONS", section["enable"])
-        except KeyError:
-            _print_key_err_msg("buttons.enable")
+        loaded = load(config_file)
+    except FileNotFoundError:
+        return [f"No user config found at '{config_file}', using defaults"]
+    apply(loaded.to_values())
+    apply({"USER_CONFIG_FILE": str(Path(config_file).expanduser().resolve())})
+    return loaded.warnings
+
+
+def load_user_config(config_file: str) -> Optional[dict[str, Any]]:
+    """Loads the OTCamera user configuration YAML file without applying it.
+
+    Args:
+        config_file (str): The path to the user configuration YAML file.
 
+    Raises:
+        ConfigValidationError: If the user config file contains invalid values.
+
+    Returns:
+        Optional[dict[str, Any]]: Mapping of the names of this module's variables to
+        their configured values. `None` if the file does not exist.
+    """
     try:
-        section = user_config["msteams"]
-    except KeyError:
-        _print_key_err_msg("msteams")
-    else:
-        try:
-            setattr(module, "USE_MS_TEAMS_WEBHOOK", section["enable"])
-        except KeyError:
-            _print_key_err_msg("msteams.enable")
-        try:
-            setattr(module, "MS_TEAMS_WEBHOOK_URL", section["url"])
-        except KeyError:
-            _print_key_err_msg("msteams.url")
+        return load(config_file).to_values()
+    except FileNotFoundError:
+        return None
+
+
+@dataclass(frozen=True)
+class ConfigChange:
+    """Changed configuration values grouped by how they can be applied.
+
+    Attributes:
+        live (dict[str, Any]): Values that can be applied while recording.
+        encoder (dict[str, Any]): Values that require the H264 encoder to be
+            restarted.
+        sensor (dict[str, Any]): Values that require the camera to be
+            re-initialised.
+        restart_required (dict[str, Any]): Values that only take effect after
+            restarting OTCamera.
+    """
 
+    live: dict[str, Any] = field(default_factory=dict)
+    encoder: dict[str, Any] = field(default_factory=dict)
+    sensor: dict[str, Any] = field(default_factory=dict)
+    restart_required: dict[str, Any] = field(default_factory=dict)
 
-def _print_key_err_msg(key_name: str) -> None:
-    """Print key error information to console."""
-    print(f"KeyError in config file for: '{key_name}'")
+    @property
+    def requires_pipeline_restart(self) -> bool:
+        """Whether the recording pipeline needs to be restarted to apply the change."""
+        return bool(self.encoder or self.sensor)
+
+    def __bool__(self) -> bool:
+        return bool(self.live or self.encoder or self.sensor or self.restart_required)
+
+
+def diff(values: dict[str, Any]) -> ConfigChange:
+    """Compares `values` with the current configuration.
+
+    Args:
+        values (dict[str, Any]): Configuration values as returned by
+            `load_user_config`.
+
+    Returns:
+        ConfigChange: The values that differ from the current configuration.
+    """
+    module = sys.modules[__name__]
+    change = ConfigChange()
+    for key, value in values.items():
+        entry = _SCHEMA_BY_ATTR.get(key)
+        current = getattr(module, key, None) if entry is None else entry.get(settings)
+        if current == value:
+            continue
+        if key in SENSOR_SETTINGS:
+            change.sensor[key] = value
+        elif key in ENCODER_SETTINGS:
+            change.encoder[key] = value
+        elif key in LIVE_SETTINGS:
+            change.live[key] = value
+        else:
+            change.restart_required[key] = value
+    return change
+
+
+def apply(values: dict[str, Any]) -> None:
+    """Applies configuration values to `settings` and the module variables.
+
+    `settings` is replaced by an updated copy, so that readers always see a
+    consistent configuration.
+
+    Args:
+        values (dict[str, Any]): Mapping of variable names to their new values.
+    """
+    global settings
+
+    module = sys.modules[__name__]
+    for key, value in values.items():
+        setattr(module, key, value)
+    settings = _with_values(settings, values)
 
 
 def read_text_file(text_file: Path) -> str:
@@ -285,7 +677,65 @@ def read_text_file(text_file: Path) -> str:
     return data
 
 
+SENSOR_SETTINGS = frozenset(
+    {
+        "FPS",
+        "RESOLUTION",
+        "EXPOSURE_MODE",
+        "DRC_STRENGTH",
+        "ROTATION",
+        "AWB_MODE",
+        "METER_MODE",
+    }
+)
+"""Settings that can only be changed by re-initialising the camera."""
+ENCODER_SETTINGS = frozenset(
+    {
+        "RESOLUTION_SAVED_VIDEO_FILE",
+        "H264_PROFILE",
+        "H264_LEVEL",
+        "H264_BITRATE",
+        "H264_QUALITY",
+        "USE_KEYFRAME_INDEX",
+        "USE_PROXY",
+        "PROXY_RESOLUTION",
+        "PROXY_BITRATE",
+    }
+)
+"""Settings that are applied by restarting the encoder at the next split."""
+LIVE_SETTINGS = frozenset(
+    {
+        "DEBUG_MODE_ON",
+        "START_HOUR",
+        "END_HOUR",
+        "INTERVAL_LENGTH",
+        "NUM_INTERVALS",
+        "MIN_FREE_SPACE",
+        "PREVIEW_INTERVAL",
+        "SEND_PREVIEW_TO_EXTERNAL",
+        "PREVIEW_URL",
+        "LIVE_PREVIEW_RESOLUTION",
+        "LIVE_PREVIEW_QUALITY",
+        "SERVER_UPLOAD_UPLOAD",
+        "SERVER_UPLOAD_SCHEME",
+        "SERVER_UPLOAD_HOST",
+        "SERVER_UPLOAD_PORT",
+        "SERVER_UPLOAD_USER",
+        "SERVER_UPLOAD_PASSWORD",
+        "SERVER_UPLOAD_SERVER_SOURCE",
+        "SERVER_UPLOAD_ARCHIVE",
+        "SERVER_UPLOAD_WINDOWS",
+        "SERVER_UPLOAD_REQUIRE_EXTERNAL_POWER",
+        "WIFI_DELAY",
+        "USE_MS_TEAMS_WEBHOOK",
+        "MS_TEAMS_WEBHOOK_URL",
+    }
+)
+"""Settings that are applied at the next split without interrupting the recording."""
+
 # general config
+USER_CONFIG_FILE: Optional[str] = None
+"""Path to the parsed user config file. `None` if no user config was parsed."""
 DEBUG_MODE_ON = False
 """Turn debug mode on to get additional log entries."""
 USE_RELAY = False
@@ -332,11 +782,15 @@ SEND_PREVIEW_TO_EXTERNAL = False
 """Send preview image to external server."""
 PREVIEW_URL = "http://localhost:5000/projects/0/sites/1/cameras/2/current_frame"
 """URL to send the preview image to."""
+LIVE_PREVIEW_RESOLUTION = (640, 480)
+"""Resolution of the live preview stream, encoded only while a client watches."""
+LIVE_PREVIEW_QUALITY = 50
+"""JPEG quality of the live preview stream between 1 and 100."""
 
 SERVER_UPLOAD_UPLOAD = False
 """Whether to upload videos to a cloud storage."""
 SERVER_UPLOAD_SCHEME = "ftp"
-"""Upload scheme, e.g. ftp, sftp, scp."""
+"""Upload scheme: ftp, ftps, sftp, scp, http or https."""
 SERVER_UPLOAD_HOST = "localhost"
 """Upload host."""
 SERVER_UPLOAD_PORT = 21
@@ -346,6 +800,13 @@ SERVER_UPLOAD_USER = "user"
 SERVER_UPLOAD_PASSWORD = "password"
 """Upload password."""
 SERVER_UPLOAD_SERVER_SOURCE = "/"
+SERVER_UPLOAD_ARCHIVE = True
+"""Whether to upload the full resolution videos. Proxies are uploaded in any case."""
+SERVER_UPLOAD_WINDOWS: Tuple[Tuple[int, int], ...] = ()
+"""Time windows to upload in as start and end in minutes after midnight, e.g.
+`((22 * 60, 6 * 60),)` for nights only. No windows to upload at any time."""
+SERVER_UPLOAD_REQUIRE_EXTERNAL_POWER = True
+"""Pause uploads while not on external power. Requires the buttons to be used."""
 
 # video config
 VIDEO_DIR = "~/videos/"
@@ -362,6 +823,14 @@ H264_BITRATE = 600000
 """Bitrate used in h264 encoder."""
 H264_QUALITY = 30
 """Quality used in h264 encoder."""
+USE_KEYFRAME_INDEX = True
+"""True to write the byte offsets of the keyframes of each video to an index file."""
+USE_PROXY = False
+"""True to record a low resolution proxy alongside each video for quick review."""
+PROXY_RESOLUTION = (320, 240)
+"""Resolution of the proxy videos."""
+PROXY_BITRATE = 60000
+"""Bitrate used in h264 encoder of the proxy videos."""
 
 # Wi-Fi config
 WIFI_DELAY = 900
@@ -375,6 +844,48 @@ USE_LED = False
 USE_BUTTONS = False
 """True if hardware buttons are connected."""
 
+# watchdog config
+USE_WATCHDOG = True
+"""True to restart the camera or OTCamera if the recording stalls."""
+WATCHDOG_STALL_TIMEOUT = 30
+"""Seconds without progress of the record loop or the video file until a stall."""
+
+# metrics config
+USE_METRICS = False
+"""True to export performance metrics in the Prometheus text format."""
+METRICS_TEXTFILE = None
+"""Text file to write the metrics to, e.g. for the node exporter. `None` to disable."""
+METRICS_INTERVAL = 15
+"""Interval in seconds between two writes of the metrics text file."""
+METRICS_HOST = "127.0.0.1"
+"""Address the metrics HTTP endpoint binds to."""
+METRICS_PORT = None
+"""Port of the metrics HTTP endpoint serving `/metrics`. `None` to disable."""
+
+# profiler config
+USE_PROFILER = False
+"""True to write a sampling profile of OTCamera to the video directory each day."""
+PROFILER_INTERVAL = 0.05
+"""Interval in seconds between two samples of the profiler."""
+
+# telemetry config
+USE_TELEMETRY = True
+"""True to sample the CPU load, temperature, memory and SD card latency."""
+TELEMETRY_INTERVAL = 10
+"""Interval in seconds between two samples of the system resources."""
+
+# webserver config
+USE_WEBSERVER = False
+"""True to serve the status website, the preview and the videos from OTCamera."""
+WEBSERVER_HOST = "0.0.0.0"
+"""Address the web server binds to."""
+WEBSERVER_PORT = 8080
+"""Port of the web server."""
+
+# usb offload config
+USE_USB_OFFLOAD = True
+"""True to copy the videos to a USB flash drive when it is plugged in."""
+
 # other config
 PREFIX = socket.gethostname()
 """prefix for videoname and annotation."""
@@ -404,13 +915,19 @@ TEMPLATE_HTML_PATH = str(Path(TEMPLATE_HTML_PATH).expanduser().resolve())
 INDEX_HTML_PATH = str(Path(INDEX_HTML_PATH).expanduser().resolve())
 OFFLINE_HTML_PATH = str(Path(OFFLINE_HTML_PATH).expanduser().resolve())
 
-OTCAMERA_VERSION = (
-    read_text_file(Path("~/otcamera_version.txt").expanduser().resolve())
-    if Path("~/otcamera_version.txt").expanduser().resolve().exists()
-    else None
-)
+_version_file = Path("~/otcamera_version.txt").expanduser()
+OTCAMERA_VERSION = read_text_file(_version_file) if _version_file.exists() else None
 """The OTCamera Version installed.
 
 Will look for a file located in `~/otcamera_version.txt`.
 If file is not found `OTCAMERA_VERSION` will be set to `None`
 """
+
+DEFAULTS: UserConfig = _build(UserConfig, globals())
+"""The default configuration used for settings missing in the user config."""
+settings: UserConfig = DEFAULTS
+"""The active configuration.
+
+Replaced as a whole whenever the configuration changes. Read it instead of the
+module variables in frequently called code.
+"""
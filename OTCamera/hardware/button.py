@@ -4,6 +4,9 @@ Initializes hardware buttons using gpiozero if configured in config.py.
 Defines all button callback functions.
 Also includes the basic logic behind button interactions.
 
+The callbacks are not run in gpiozero's threads but posted to the event dispatcher,
+which runs them in the record loop (see `OTCamera.helpers.events`).
+
 """
 # Copyright (C) 2023 OpenTrafficCam Contributors
 # <https://github.com/OpenTrafficCam>
@@ -28,10 +31,14 @@ from gpiozero import Button
 
 from OTCamera import config, status
 from OTCamera.hardware import led
-from OTCamera.helpers import log, rpi
+from OTCamera.helpers import events, log, rpi
+from OTCamera.helpers.events import Priority
 
 log.write("imported buttons", level=log.LogLevel.DEBUG)
 
+SWITCH_DEBOUNCE = 0.05
+"""Seconds a switch must be stable before its event is handled."""
+
 
 def its_record_time() -> bool:
     """Is it time to record or not?
@@ -47,20 +54,21 @@ def its_record_time() -> bool:
     record_time = (
         (hour_button.is_pressed)
         or (current_hour >= config.START_HOUR and current_hour < config.END_HOUR)
-    ) and (not status.SHUTDOWNACTIVE)
+    ) and (not status.store.state.shutdownactive)
     return record_time
 
 
 def _on_hour_button_switched() -> None:
-    """Sets `status.hour_button_pressed` if `hour.button` is pressed or released.
+    """Sets `hour_button_pressed` of the status if `hour.button` is pressed or
+    released.
 
     Used to determine if user want's to record 24/7 or time based.
     """
     if hour_button.is_pressed:
-        status.hour_button_pressed = True
+        status.store.update(hour_button_pressed=True)
         log.write("Hour Switch pressed")
     elif not hour_button.is_pressed:
-        status.hour_button_pressed = False
+        status.store.update(hour_button_pressed=False)
         log.write("Hour Switch released")
 
 
@@ -70,27 +78,27 @@ def _on_low_battery_button_held() -> None:
     Adafruit's PowerBoost 1000C has two inputs: USB and LiPo-cell.
     If LiPo-cell voltage is below threshold, the 1000C Low Voltage PIN is pulled up.
     The 1000C PIN is connected to GPIO 18 through OTCamera pcb.
-    Additionally sets `status.battery_is_low` to `True`.
+    Additionally sets `battery_is_low` of the status to `True`.
     """
-    status.battery_is_low = True
+    status.store.update(battery_is_low=True)
     log.write("Battery level is low!", log.LogLevel.WARNING)
     rpi.shutdown()
 
 
 def _on_external_power_button_pressed() -> None:
-    status.external_power_connected = True
+    status.store.update(external_power_connected=True)
     log.write("External power connected", log.LogLevel.INFO)
 
 
 def _on_external_power_button_released() -> None:
-    status.external_power_connected = False
+    status.store.update(external_power_connected=False)
     log.write("External power disconnected!", log.LogLevel.WARNING)
 
 
 def _on_power_button_pressed() -> None:
-    status.power_button_pressed = True
-    status.power_button_pressed_time = None
-    status.noblink = False
+    status.store.update(
+        power_button_pressed=True, power_button_pressed_time=None, noblink=False
+    )
     log.write("Shutdown cancelled. Button pressed again.", log.LogLevel.INFO, False)
     led.power_blink()
 
@@ -102,20 +110,21 @@ def _on_power_button_released() -> None:
     If it's still released the Pi will shutdown.
     If `power_button` is pressed within the 5 seconds the shutdown will be canceled.
     """
-    status.power_button_pressed = False
-    status.power_button_pressed_time = dt.now()
+    status.store.update(
+        power_button_pressed=False, power_button_pressed_time=dt.now(), noblink=True
+    )
     log.write("Power button released", level=log.LogLevel.DEBUG)
     log.write("Shutdown by button initialized")
-    status.noblink = True
     led.power_pre_off()
 
 
 def _on_wifi_button_pressed() -> None:
-    """If `wifi_button` is pressed `status.wifi_button_pressed` will be set `True`.
+    """If `wifi_button` is pressed `wifi_button_pressed` of the status will be set
+    `True`.
 
     This callback function won't do anything else. See `_on_wifi_button_held`.
     """
-    status.wifi_button_pressed = True
+    status.store.update(wifi_button_pressed=True)
     log.write("Wi-Fi button pressed")
 
 
@@ -125,8 +134,7 @@ def _on_wifi_button_held() -> None:
     The threshold to distinguish between "pressed" and "hold" is set during
     initialization (`hold_time=2`).
     """
-    status.wifi_button_pressed = True
-    status.wifi_button_pressed_time = None
+    status.store.update(wifi_button_pressed=True, wifi_button_pressed_time=None)
     log.write("Wi-Fi button held", level=log.LogLevel.DEBUG)
     rpi.wifi_switch_on()
 
@@ -141,8 +149,7 @@ def _on_wifi_button_released() -> None:
     If `wifi_button` is released for whole delay Wi-Fi will be turned off.
     """
     log.write("Wi-Fi button released", level=log.LogLevel.DEBUG)
-    status.wifi_button_pressed = False
-    status.wifi_button_pressed_time = dt.now()
+    status.store.update(wifi_button_pressed=False, wifi_button_pressed_time=dt.now())
 
     led.wifi_pre_off()
     log.write(f"Turning off Wi-Fi AP in {config.WIFI_DELAY} s")
@@ -166,22 +173,25 @@ def handle_power_button_off_state():
     """Switches off the system after a 5 second delay."""
     shutdown_delay = 5
 
-    if status.power_button_pressed_time + timedelta(seconds=shutdown_delay) < dt.now():
+    pressed_time = status.store.state.power_button_pressed_time
+    if pressed_time is None:
+        return
+    if pressed_time + timedelta(seconds=shutdown_delay) < dt.now():
         if config.DEBUG_MODE_ON:
             log.write("Mock shutting down RPI in debug mode.", log.LogLevel.DEBUG)
         else:
             rpi.shutdown()
-        status.power_button_pressed_time = None
+        status.store.update(power_button_pressed_time=None)
 
 
 def handle_wifi_button_off_state():
     """Switches off the WiFi after config.WIFI_DELAY seconds."""
-    if (
-        status.wifi_button_pressed_time + timedelta(seconds=config.WIFI_DELAY)
-        < dt.now()
-    ):
+    pressed_time = status.store.state.wifi_button_pressed_time
+    if pressed_time is None:
+        return
+    if pressed_time + timedelta(seconds=config.WIFI_DELAY) < dt.now():
         rpi.wifi_switch_off()
-        status.wifi_button_pressed_time = None
+        status.store.update(wifi_button_pressed_time=None)
 
 
 if config.USE_BUTTONS:
@@ -205,23 +215,53 @@ if config.USE_BUTTONS:
     hour_button = Button(HOURPIN, pull_up=True, hold_time=2, hold_repeat=False)
     wifi_button = Button(WIFIPIN, pull_up=True, hold_time=2, hold_repeat=False)
 
-    # Register callbacks
-    low_battery_button.when_held = _on_low_battery_button_held
-    external_power_button.when_released = _on_external_power_button_released
-    external_power_button.when_pressed = _on_external_power_button_pressed
-    power_button.when_pressed = _on_power_button_pressed
-    power_button.when_released = _on_power_button_released
-    wifi_button.when_pressed = _on_wifi_button_pressed
-    wifi_button.when_held = _on_wifi_button_held
-    wifi_button.when_released = _on_wifi_button_released
-    hour_button.when_pressed = _on_hour_button_switched
-    hour_button.when_released = _on_hour_button_switched
+    # Register callbacks. Each button is a source of events, so only the latest
+    # event of a button is handled. A low battery preempts all other events.
+    # Holding the Wi-Fi button is a source of its own, so a release posted before
+    # the record loop dispatched does not replace turning on Wi-Fi.
+    dispatcher = events.dispatcher
+    dispatcher.register("low_battery_button", Priority.CRITICAL)
+    dispatcher.register("power_button", Priority.HIGH, SWITCH_DEBOUNCE)
+    dispatcher.register("external_power_button", Priority.NORMAL, SWITCH_DEBOUNCE)
+    dispatcher.register("wifi_button", Priority.NORMAL, SWITCH_DEBOUNCE)
+    dispatcher.register("wifi_button_held", Priority.NORMAL, SWITCH_DEBOUNCE)
+    dispatcher.register("hour_button", Priority.NORMAL, SWITCH_DEBOUNCE)
+
+    low_battery_button.when_held = dispatcher.poster(
+        "low_battery_button", _on_low_battery_button_held
+    )
+    external_power_button.when_released = dispatcher.poster(
+        "external_power_button", _on_external_power_button_released
+    )
+    external_power_button.when_pressed = dispatcher.poster(
+        "external_power_button", _on_external_power_button_pressed
+    )
+    power_button.when_pressed = dispatcher.poster(
+        "power_button", _on_power_button_pressed
+    )
+    power_button.when_released = dispatcher.poster(
+        "power_button", _on_power_button_released
+    )
+    wifi_button.when_pressed = dispatcher.poster("wifi_button", _on_wifi_button_pressed)
+    wifi_button.when_held = dispatcher.poster(
+        "wifi_button_held", _on_wifi_button_held
+    )
+    wifi_button.when_released = dispatcher.poster(
+        "wifi_button", _on_wifi_button_released
+    )
+    hour_button.when_pressed = dispatcher.poster(
+        "hour_button", _on_hour_button_switched
+    )
+    hour_button.when_released = dispatcher.poster(
+        "hour_button", _on_hour_button_switched
+    )
 
     # Set button statuses in status module
-    status.power_button_pressed = power_button.is_pressed
-    status.hour_button_pressed = hour_button.is_pressed
-    status.wifi_button_pressed = wifi_button.is_pressed
-    status.hour_button_pressed = hour_button.is_pressed
+    status.store.update(
+        power_button_pressed=power_button.is_pressed,
+        hour_button_pressed=hour_button.is_pressed,
+        wifi_button_pressed=wifi_button.is_pressed,
+    )
 
     log.write("Buttons initialized", log.LogLevel.DEBUG)
 
@@ -234,7 +274,6 @@ if config.USE_BUTTONS:
         _on_low_battery_button_held()
 
     if external_power_button.is_pressed:
-        status.external_power_connected = external_power_button.is_pressed
         _on_external_power_button_pressed()
 
 
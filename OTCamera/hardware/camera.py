@@ -23,23 +23,61 @@ import base64
 from datetime import datetime as dt
 from pathlib import Path
 from time import sleep
-from typing import Tuple, Union
+from typing import Any, Optional, Tuple, Union
 
 import picamerax as picamera
-import requests
-import urllib3
 from picamerax import Color
 
 from OTCamera import config, status
 from OTCamera.hardware import led
-from OTCamera.helpers import log, name
-from OTCamera.helpers.filesystem import delete_old_files
-from OTCamera.plugin_ftp_server.connect import FtpsServerConnect
-from OTCamera.plugin_ftp_server.upload import FtpUpload
+from OTCamera.helpers import log, metrics, name, startup
+from OTCamera.helpers.config_watcher import ConfigWatcher
+from OTCamera.helpers.filesystem import delete_old_files, video_dir_stats
+from OTCamera.helpers.keyframe_index import IndexedOutput
+from OTCamera.helpers.live_preview import MjpegOutput
+from OTCamera.helpers.segment_journal import (
+    JOURNAL_FILENAME,
+    SegmentEntry,
+    SegmentJournal,
+    recover,
+)
+from OTCamera.helpers.transfer_scheduler import TransferScheduler
+from OTCamera.helpers.watchdog import Watchdog
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 log.write("imported camera", level=log.LogLevel.DEBUG)
 
+_SENSOR_ATTRIBUTES = {
+    "FPS": "framerate",
+    "RESOLUTION": "resolution",
+    "EXPOSURE_MODE": "exposure_mode",
+    "AWB_MODE": "awb_mode",
+    "DRC_STRENGTH": "drc_strength",
+    "ROTATION": "rotation",
+    "METER_MODE": "meter_mode",
+}
+"""Maps sensor settings in `config` to the `Camera` attributes holding them."""
+
+RECORDING_SPLITTER_PORT = 1
+"""Splitter port of the encoder recording the video files."""
+PROXY_SPLITTER_PORT = 2
+"""Splitter port of the encoder recording the low resolution proxy."""
+LIVE_PREVIEW_SPLITTER_PORT = 3
+"""Splitter port of the encoder streaming the live preview."""
+
+
+def _next_interval(state: status.Status) -> dict[str, Any]:
+    """The status changes after an interval has been recorded."""
+    current_interval = state.current_interval + 1
+    num_intervals = config.settings.recording.num_intervals
+    more_intervals = state.more_intervals
+    if num_intervals > 0:
+        more_intervals = current_interval < num_intervals
+    return {
+        "interval_finished": False,
+        "current_interval": current_interval,
+        "more_intervals": more_intervals,
+    }
+
 
 def read_preview() -> str:
     with open(name.preview(), "rb") as file:
@@ -66,11 +104,19 @@ class Singleton(object):
     def init(self, *args, **kwds):
         pass
 
+    @classmethod
+    def instance(cls):
+        """Returns the instance of the concrete class or `None` if not created yet."""
+        return cls.__dict__.get("__it__")
+
 
 class Camera(Singleton):
     """The camera class providing functionality such as starting or stopping a
     recording, capturing a preview image, or closing the camera
 
+    The attributes default to their current value in `config` when the camera is
+    initialised.
+
     Attributes:
         framerate (int, optional): The frame rate. Defaults to config.FPS.
         resolution (Tuple[int, int], optional): The resolution.
@@ -86,29 +132,127 @@ class Camera(Singleton):
 
     def init(
         self,
-        framerate: int = config.FPS,
-        resolution: Tuple[int, int] = config.RESOLUTION,
+        framerate: Optional[int] = None,
+        resolution: Optional[Tuple[int, int]] = None,
         annotate_background: Color = Color("black"),
-        exposure_mode: str = config.EXPOSURE_MODE,
-        awb_mode: str = config.AWB_MODE,
-        drc_strength: str = config.DRC_STRENGTH,
-        rotation: int = config.ROTATION,
-        meter_mode: str = config.METER_MODE,
+        exposure_mode: Optional[str] = None,
+        awb_mode: Optional[str] = None,
+        drc_strength: Optional[str] = None,
+        rotation: Optional[int] = None,
+        meter_mode: Optional[str] = None,
     ) -> None:
         log.write("Initializing Camera", level=log.LogLevel.DEBUG)
 
-        self.framerate = framerate
-        self.resolution = resolution
+        self.framerate = config.FPS if framerate is None else framerate
+        self.resolution = config.RESOLUTION if resolution is None else resolution
         self.annotate_background = annotate_background
-        self.exposure_mode = exposure_mode
-        self.awb_mode = awb_mode
-        self.drc_strength = drc_strength
-        self.rotation = rotation
-        self.meter_mode = meter_mode
+        self.exposure_mode = (
+            config.EXPOSURE_MODE if exposure_mode is None else exposure_mode
+        )
+        self.awb_mode = config.AWB_MODE if awb_mode is None else awb_mode
+        self.drc_strength = (
+            config.DRC_STRENGTH if drc_strength is None else drc_strength
+        )
+        self.rotation = config.ROTATION if rotation is None else rotation
+        self.meter_mode = config.METER_MODE if meter_mode is None else meter_mode
+        self._config_watcher: Optional[ConfigWatcher] = None
+        self._watchdog: Optional[Watchdog] = None
+        self._transfer_scheduler: Optional[TransferScheduler] = None
+        self._journal = SegmentJournal(Path(config.VIDEO_DIR) / JOURNAL_FILENAME)
+        self._interrupted_segment = self._journal.read()
+        self._finished_segments: list[str] = []
+        # Other splitter ports may be recording, so `PiCamera.recording` does not
+        # tell whether the video files are recorded.
+        self._recording = False
+        self._proxy_recording = False
+        self._output: Optional[IndexedOutput] = None
+        self._live_preview_output: Optional[MjpegOutput] = None
         self._picam = self._create_picam()
         self._current_video_file: str = name.video()
         log.write("Camera initialized", log.LogLevel.DEBUG)
 
+    def watch_config(self, config_watcher: ConfigWatcher) -> None:
+        """Apply changes of the user config file at the next split.
+
+        Args:
+            config_watcher (ConfigWatcher): The watcher providing the changes.
+        """
+        self._config_watcher = config_watcher
+
+    def attach_watchdog(self, watchdog: Watchdog) -> None:
+        """Let `watchdog` monitor the growth of the recorded video files.
+
+        Args:
+            watchdog (Watchdog): The watchdog to attach.
+        """
+        self._watchdog = watchdog
+        watchdog.watch_segment(self.current_segment)
+
+    def attach_transfer_scheduler(self, transfer_scheduler: TransferScheduler) -> None:
+        """Queue the finished video files at `transfer_scheduler` for upload.
+
+        Args:
+            transfer_scheduler (TransferScheduler): The scheduler uploading the videos.
+        """
+        self._transfer_scheduler = transfer_scheduler
+
+    def current_segment(self) -> Optional[str]:
+        """The video file currently recorded or `None` if not recording."""
+        if self._picam.closed or not self._recording:
+            return None
+        return self._current_video_file
+
+    def frame_info(self) -> Optional[Tuple[int, int]]:
+        """Index and timestamp in microseconds of the last frame recorded.
+
+        Returns `None` if not recording or the frame is not known yet.
+        """
+        if self._picam.closed or not self._recording:
+            return None
+        frame = self._recording_frame()
+        if frame is None or frame.timestamp is None:
+            return None
+        return frame.index, frame.timestamp
+
+    def _recording_frame(self) -> Any:
+        """The `PiVideoFrame` last written by the encoder recording the video files.
+
+        `PiCamera.frame` returns the frame of an arbitrary encoder, e.g. of the
+        proxy or the live preview.
+        """
+        encoder = self._picam._encoders.get(RECORDING_SPLITTER_PORT)
+        return getattr(encoder, "frame", None)
+
+    def recover_interrupted_segment(self) -> None:
+        """Recover the segment that was being recorded when OTCamera crashed.
+
+        The segment is trimmed to its last complete NAL unit and handled like any
+        other finished segment at the next split. Should be called after the
+        recording started to keep the gap in the recording short.
+        """
+        entry = self._interrupted_segment
+        self._interrupted_segment = None
+        if entry is None or entry.path == self._current_video_file:
+            return
+        self._recover_segment(entry)
+
+    def _recover_segment(self, entry: SegmentEntry) -> None:
+        """Trim an interrupted segment and its proxy to their last complete NAL unit.
+
+        The recovered segment is handled like any other finished segment.
+
+        Args:
+            entry (SegmentEntry): The interrupted segment.
+        """
+        recovered = recover(entry)
+        proxy = Path(name.proxy(entry.path))
+        if proxy.exists():
+            recover(SegmentEntry(str(proxy), entry.start_time))
+        if recovered is None:
+            video_dir_stats.invalidate()
+        else:
+            self._finished_segments.append(str(recovered))
+
     def start_recording(self):
         """Start a recording a video.
 
@@ -124,38 +268,117 @@ class Camera(Singleton):
         # PiCamera error
         # https://picamera.readthedocs.io/en/release-1.13/api_exc.html?highlight=exception
 
-        if not self._picam.recording and not status.shutdownactive:
+        if not self._recording and not status.store.state.shutdownactive:
             delete_old_files()
-            self._picam.annotate_text = name.annotate()
-            self._current_video_file = name.video()
-            self._picam.start_recording(
-                output=self._current_video_file,
-                format=config.VIDEO_FORMAT,
-                resize=config.RESOLUTION_SAVED_VIDEO_FILE,
-                profile=config.H264_PROFILE,
-                level=config.H264_LEVEL,
-                bitrate=config.H264_BITRATE,
-                quality=config.H264_QUALITY,
-            )
+            self._start_picam_recording()
+            startup.timer.mark("recording")
             log.write(
-                f"Picam recording: {self._picam.recording}",
+                f"Picam recording: {self._recording}",
                 level=log.LogLevel.DEBUG,
             )
             log.write("started recording")
             led.rec_on()
-            status.recording = True
-            status.html_updated_after_recording = False
+            status.store.update(recording=True)
             self._wait_recording(2)
             self.capture()
 
+    def _start_picam_recording(self) -> None:
+        """Start recording to a new video file using the current encoder settings."""
+        video_config = config.settings.video
+        self._picam.annotate_text = name.annotate()
+        self._current_video_file = name.video()
+        self._picam.start_recording(
+            output=self._open_output(self._current_video_file),
+            format=video_config.format,
+            resize=video_config.resolution,
+            profile=video_config.encoder.profile,
+            level=video_config.encoder.level,
+            bitrate=video_config.encoder.bitrate,
+            quality=video_config.encoder.quality,
+        )
+        self._recording = True
+        self._journal.start(self._current_video_file)
+        video_dir_stats.file_created(self._current_video_file)
+        if video_config.proxy.enable:
+            self._picam.start_recording(
+                output=name.proxy(self._current_video_file),
+                format=video_config.format,
+                resize=video_config.proxy.resolution,
+                splitter_port=PROXY_SPLITTER_PORT,
+                profile="baseline",
+                bitrate=video_config.proxy.bitrate,
+            )
+            self._proxy_recording = True
+
+    def _stop_picam_recording(self) -> None:
+        """Stop recording the video file and its proxy."""
+        if self._proxy_recording:
+            self._picam.stop_recording(splitter_port=PROXY_SPLITTER_PORT)
+            self._proxy_recording = False
+        self._recording = False
+        self._picam.stop_recording(splitter_port=RECORDING_SPLITTER_PORT)
+        self._close_output()
+
+    def _open_output(self, video_file: str) -> Union[str, IndexedOutput]:
+        """The output to record `video_file` to.
+
+        Indexes the keyframes of the video if configured. Otherwise picamera writes
+        the file itself.
+        """
+        if not config.settings.video.keyframe_index:
+            self._output = None
+            return video_file
+        self._output = IndexedOutput(video_file, self._recording_frame)
+        return self._output
+
+    def _close_output(self) -> None:
+        """Close the output of the last video, as picamera only flushes it."""
+        output, self._output = self._output, None
+        if output is not None:
+            output.close()
+
+    def start_live_preview(self, output: MjpegOutput) -> None:
+        """Start encoding the live preview stream to `output`.
+
+        The stream is encoded on its own splitter port independently of the
+        recording and restarted along with the camera. Must be called in the record
+        loop like all other camera operations, see `LivePreview`.
+
+        Args:
+            output (MjpegOutput): The output receiving the MJPEG stream.
+        """
+        self._live_preview_output = output
+        self._start_live_preview_encoder()
+
+    def stop_live_preview(self) -> None:
+        """Stop encoding the live preview stream."""
+        self._live_preview_output = None
+        if self._picam.closed:
+            return
+        try:
+            self._picam.stop_recording(splitter_port=LIVE_PREVIEW_SPLITTER_PORT)
+        except picamera.PiCameraNotRecording:
+            pass
+
+    def _start_live_preview_encoder(self) -> None:
+        live_config = config.settings.preview.live
+        self._picam.start_recording(
+            output=self._live_preview_output,
+            format="mjpeg",
+            resize=live_config.resolution,
+            splitter_port=LIVE_PREVIEW_SPLITTER_PORT,
+            quality=live_config.quality,
+        )
+
+    @metrics.timed("otcamera_capture_seconds", "Duration of capturing a preview.")
     def capture(self):
         """Capture a preview image if camera is recording."""
-        if self._picam.recording:
+        if self._recording:
             self._picam.annotate_text = name.annotate()
             self._picam.capture(
                 name.preview(),
-                format=config.PREVIEW_FORMAT,
-                resize=config.RESOLUTION_SAVED_VIDEO_FILE,
+                format=config.settings.preview.format,
+                resize=config.settings.video.resolution,
                 use_video_port=True,
             )
             self._try_send_preview()
@@ -167,9 +390,18 @@ class Camera(Singleton):
             )
 
     @staticmethod
+    @metrics.timed(
+        "otcamera_send_preview_seconds",
+        "Duration of sending a preview to the external server.",
+    )
     def _try_send_preview() -> None:
         """Try to send preview image to an external server."""
         if config.SEND_PREVIEW_TO_EXTERNAL:
+            # Imported on first use to keep them off the start up path.
+            import requests
+            import urllib3
+
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
             try:
                 image = read_preview()
                 response = requests.post(
@@ -199,46 +431,110 @@ class Camera(Singleton):
         Args:
             timeout (Union[int, float], optional): Timeout in seconds. Defaults to 0.
         """
-        if self._picam.recording:
-            self._picam.wait_recording(timeout)
+        if self._recording:
+            self._picam.wait_recording(timeout, splitter_port=RECORDING_SPLITTER_PORT)
         else:
             sleep(timeout)
 
+    @metrics.timed("otcamera_split_seconds", "Duration of splitting the recording.")
     def _split(self):
-        """Splits recording and deletes old video files if no disk space available."""
+        """Splits recording and deletes old video files if no disk space available.
+
+        Pending changes of the user config are applied before splitting. If the
+        changes affect the encoder or the camera sensor, the recording is restarted
+        instead of split.
+        """
         current_video_file = self._current_video_file
-        new_video_file = name.video()
-        self._picam.split_recording(new_video_file)
-        self._current_video_file = new_video_file
+        change = self._take_config_change()
+        if change is not None and change.requires_pipeline_restart:
+            self._restart_pipeline(change)
+        else:
+            if change is not None:
+                self._apply_live_config(change)
+            new_video_file = name.video()
+            finished_output = self._output
+            self._picam.split_recording(self._open_output(new_video_file))
+            if finished_output is not None:
+                finished_output.close()
+            if self._proxy_recording:
+                self._picam.split_recording(
+                    name.proxy(new_video_file), splitter_port=PROXY_SPLITTER_PORT
+                )
+            self._current_video_file = new_video_file
+            self._journal.start(new_video_file)
+            video_dir_stats.file_created(new_video_file)
         log.write("splitted recording")
-        self._try_upload_to_cloud(current_video_file)
+        self._finished_segments.append(current_video_file)
+        self._queue_finished_segments()
         delete_old_files()
 
-    def _try_upload_to_cloud(self, video_name: str) -> None:
-        """Try to upload video file to cloud storage."""
-        if config.SERVER_UPLOAD_UPLOAD:
-            client = None
-            try:
-                log.write("uploading video to cloud", level=log.LogLevel.DEBUG)
-                client = FtpsServerConnect().connect(
-                    config.SERVER_UPLOAD_HOST,
-                    config.SERVER_UPLOAD_PORT,
-                    config.SERVER_UPLOAD_USER,
-                    config.SERVER_UPLOAD_PASSWORD,
-                )
-                uploader = FtpUpload()
-                source = Path(video_name)
-                dest = Path(config.SERVER_UPLOAD_SERVER_SOURCE) / source.name
-                log.write(
-                    f"Video file to upload has size: {source.stat().st_size}",
-                    level=log.LogLevel.DEBUG,
-                )
-                uploader.upload(client, source=source, dest=dest)
-            except Exception as e:
-                log.write(f"Error uploading video to cloud: {e}")
-            finally:
-                if client:
-                    client.close()
+    def apply_pending_config(self) -> None:
+        """Apply pending changes of the user config while not recording.
+
+        While recording, changes are applied at the next split instead.
+        """
+        if self._recording:
+            return
+        change = self._take_config_change()
+        if change is None:
+            return
+        self._apply_live_config(change)
+        config.apply(change.encoder)
+        if change.sensor:
+            self._apply_sensor_config(change)
+            self.restart()
+
+    def _take_config_change(self) -> Optional[config.ConfigChange]:
+        if self._config_watcher is None:
+            return None
+        return self._config_watcher.take_change()
+
+    def _apply_live_config(self, change: config.ConfigChange) -> None:
+        config.apply(change.live)
+        if change.live:
+            log.write(f"Applied config changes: {', '.join(change.live)}")
+
+    def _apply_sensor_config(self, change: config.ConfigChange) -> None:
+        config.apply(change.sensor)
+        for key, value in change.sensor.items():
+            setattr(self, _SENSOR_ATTRIBUTES[key], value)
+        log.write(f"Applied camera config changes: {', '.join(change.sensor)}")
+
+    def _restart_pipeline(self, change: config.ConfigChange) -> None:
+        """Restart the recording to apply encoder or sensor config changes.
+
+        The camera is only re-initialised if sensor settings changed. Otherwise only
+        the encoder is restarted.
+
+        Args:
+            change (config.ConfigChange): The config changes to apply.
+        """
+        self._stop_picam_recording()
+        self._apply_live_config(change)
+        config.apply(change.encoder)
+        if change.encoder:
+            log.write(f"Applied encoder config changes: {', '.join(change.encoder)}")
+        if change.sensor:
+            self._apply_sensor_config(change)
+            self.restart()
+        self._start_picam_recording()
+        log.write("restarted recording")
+
+    def _queue_finished_segments(self) -> None:
+        """Queue the finished video files for upload to cloud storage.
+
+        Proxies are queued in any case, the full resolution videos only if
+        configured.
+        """
+        segments, self._finished_segments = self._finished_segments, []
+        if not config.SERVER_UPLOAD_UPLOAD or self._transfer_scheduler is None:
+            return
+        for segment in segments:
+            proxy = name.proxy(segment)
+            if Path(proxy).exists():
+                self._transfer_scheduler.enqueue(proxy)
+            if config.SERVER_UPLOAD_ARCHIVE:
+                self._transfer_scheduler.enqueue(segment)
 
     def split_if_interval_ends(self) -> None:
         """Splits the videofile if the configured intervals ends.
@@ -253,16 +549,14 @@ class Camera(Singleton):
         if self._is_new_interval():
             log.write("new interval", level=log.LogLevel.DEBUG)
             self._split()
-            status.interval_finished = False
-            status.current_interval += 1
-            if config.NUM_INTERVALS > 0:
-                status.more_intervals = status.current_interval < config.NUM_INTERVALS
-            if not status.more_intervals:
+            new_status = status.store.transition(_next_interval)
+            if not new_status.more_intervals:
                 log.write("last interval", level=log.LogLevel.DEBUG)
         elif self._is_after_new_interval_minute():
-            status.interval_finished = True
+            status.store.update(interval_finished=True)
             log.write("reset new interval", level=log.LogLevel.DEBUG)
         self._wait_recording(0.5)
+        self._journal.update()
         self._picam.annotate_text = name.annotate()
 
     def _is_interval_minute(self) -> bool:
@@ -274,7 +568,8 @@ class Camera(Singleton):
             bool: `True` if the interval minute has been reached. Otherwise `False`.
         """
         current_minute = dt.now().minute
-        interval_minute = (current_minute % config.INTERVAL_LENGTH) == 0
+        interval_length = config.settings.recording.interval_length
+        interval_minute = (current_minute % interval_length) == 0
         return interval_minute
 
     def _is_after_new_interval_minute(self) -> bool:
@@ -285,7 +580,7 @@ class Camera(Singleton):
             `False`.
         """
         after_new_interval = not (
-            self._is_interval_minute() or status.interval_finished
+            self._is_interval_minute() or status.store.state.interval_finished
         )
         return after_new_interval
 
@@ -295,10 +590,11 @@ class Camera(Singleton):
         Returns:
             bool: `True` if new time interval started. Otherwise `False`.
         """
+        state = status.store.state
         new_interval = (
             self._is_interval_minute()
-            and status.interval_finished
-            and status.more_intervals
+            and state.interval_finished
+            and state.more_intervals
         )
         return new_interval
 
@@ -309,12 +605,15 @@ class Camera(Singleton):
         LED ist switched of (if configured).
 
         """
-        if self._picam.recording:
-            self._picam.stop_recording()
+        if self._recording:
+            self._stop_picam_recording()
+            self._journal.clear()
             led.rec_off()
             log.write("stopped recording")
-            log.write("recorded {n} videos".format(n=status.current_interval))
-            status.recording = False
+            log.write(
+                "recorded {n} videos".format(n=status.store.state.current_interval)
+            )
+            status.store.update(recording=False)
 
     def close(self):
         """Closes `picamera.PiCamera` instance.
@@ -334,12 +633,24 @@ class Camera(Singleton):
         """
         Restarts the PiCamera instance by closing it and re-initialising it.
 
-        The initialisation is being done with the current set of parameters.
+        The initialisation is being done with the current set of parameters. A
+        segment still recorded, e.g. if the watchdog restarts a stalled camera, is
+        recovered and queued for upload like a finished segment.
         """
         log.write("restarting camera")
+        interrupted = self._journal.read() if self._recording else None
         self.close()
+        self._recording = False
+        self._proxy_recording = False
+        self._close_output()
+        if interrupted is not None:
+            self._journal.clear()
+            self._recover_segment(interrupted)
+            self._queue_finished_segments()
 
         self._picam = self._create_picam()
+        if self._live_preview_output is not None:
+            self._start_live_preview_encoder()
 
     def _create_picam(self) -> picamera.PiCamera:
         """Creates PiCamera instance and initializes it with the camera settings passed
@@ -59,9 +59,10 @@ def power_on():
 def power_blink():
     """Blink power LED once."""
     if config.USE_LED:
-        if not status.noblink:
+        state = status.store.state
+        if not state.noblink:
             power.off()
-            if status.external_power_connected:
+            if state.external_power_connected:
                 number_of_blinks_running = 2
             else:
                 number_of_blinks_running = 1
@@ -98,6 +99,21 @@ def wifi_pre_off():
         wifi.blink(on_time=0.1, off_time=0.9, n=None, background=True)
 
 
+def wifi_alarm():
+    """Very rapidly blink Wi-Fi LED, e.g. if the USB offload failed."""
+    if config.USE_LED:
+        wifi.off()
+        wifi.blink(on_time=0.1, off_time=0.1, n=None, background=True)
+
+
+def wifi_restore():
+    """Show the Wi-Fi state on the Wi-Fi LED again after it signalled something else."""
+    if status.store.state.wifi_on:
+        wifi_on()
+    elif config.USE_LED:
+        wifi.off()
+
+
 if config.USE_LED:
 
     log.write("Initializing LEDs", level=log.LogLevel.DEBUG)
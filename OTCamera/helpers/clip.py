@@ -0,0 +1,341 @@
+"""OTCamera helper to cut a clip of a time range out of the recorded videos.
+
+The videos covering the time range are found by the timestamps in their filenames.
+Each video is cut at keyframes without re-encoding: the clip starts at the last
+keyframe at or before the start of the range and ends before the first keyframe at
+or after its end. The byte ranges of all videos are concatenated into one H264 file.
+
+The keyframes are read from the keyframe index recorded with each video. Videos
+without an index are scanned for their keyframes instead. The videos are memory
+mapped, so only the pages of the clip are read from the SD card.
+
+Cut a clip on the command line with
+
+    python -m OTCamera.helpers.clip 14:03 14:07 clip.h264 --date 2023-05-18
+
+The videos are taken from the video directory of the user config, which can be
+chosen with `--config`.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import bisect
+import mmap
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Optional, Union
+
+from OTCamera import config
+from OTCamera.helpers import log, name
+from OTCamera.helpers.keyframe_index import Keyframe, keyframe_before, read_index
+
+CHUNK_SIZE = 8 * 1024 * 1024
+"""Number of bytes written to the clip at once."""
+USER_CONFIG = "~/user_config.yaml"
+"""The user config read by default, the same as OTCamera's."""
+
+_START_CODE = b"\x00\x00\x01"
+# Types of H264 NAL units
+_NAL_SLICE = 1
+_NAL_IDR_SLICE = 5
+_NAL_SPS = 7
+
+
+@dataclass(frozen=True)
+class Segment:
+    """A recorded video.
+
+    Attributes:
+        video_file (Path): Path of the video.
+        start (datetime): Start of the recording according to the filename.
+    """
+
+    video_file: Path
+    start: datetime
+
+
+@dataclass(frozen=True)
+class ClipPart:
+    """The bytes of a video belonging to a clip.
+
+    Attributes:
+        video_file (Path): Path of the video.
+        begin (int): Byte offset of the first keyframe of the clip in the video.
+        end (int): Byte offset after the last frame of the clip in the video.
+        start (datetime): Time of the first keyframe of the clip in the video.
+    """
+
+    video_file: Path
+    begin: int
+    end: int
+    start: datetime
+
+    @property
+    def size(self) -> int:
+        return self.end - self.begin
+
+
+def find_segments(
+    video_dir: Union[str, Path], start: datetime, end: datetime
+) -> list[Segment]:
+    """The videos in `video_dir` overlapping the time range, sorted by time.
+
+    A video is assumed to last until the next video starts. Proxies are ignored.
+
+    Args:
+        video_dir (Union[str, Path]): Directory of the videos.
+        start (datetime): Start of the time range.
+        end (datetime): End of the time range.
+
+    Returns:
+        list[Segment]: The videos overlapping the time range.
+    """
+    segments = sorted(
+        (
+            Segment(video_file, recorded)
+            for video_file in Path(video_dir).glob("*.h264")
+            if not name.is_proxy(video_file)
+            and (recorded := name.get_datetime_from_filename(video_file)) is not None
+        ),
+        key=lambda segment: (segment.start, segment.video_file.name),
+    )
+    return [
+        segment
+        for segment, following in zip(segments, segments[1:] + [None])
+        if segment.start < end and (following is None or following.start > start)
+    ]
+
+
+def read_keyframes(video_file: Union[str, Path]) -> list[Keyframe]:
+    """The keyframes of a video with timestamps relative to the first keyframe.
+
+    Uses the keyframe index of the video. Videos without an index are scanned.
+    """
+    index_file = Path(name.keyframe_index(video_file))
+    if index_file.exists():
+        keyframes = read_index(index_file)
+    else:
+        log.write(f"Scanning '{video_file}' without index", log.LogLevel.DEBUG)
+        with open(video_file, "rb") as video, _map(video) as data:
+            keyframes = scan_keyframes(data, _fps(video_file))
+    if not keyframes:
+        return []
+    first = keyframes[0].timestamp
+    return [
+        Keyframe(keyframe.offset, keyframe.timestamp - first) for keyframe in keyframes
+    ]
+
+
+def scan_keyframes(data: Union[bytes, mmap.mmap], fps: int) -> list[Keyframe]:
+    """Find the keyframes of an H264 byte stream.
+
+    The timestamps are derived from the number of frames preceding each keyframe.
+    picamera writes the SPS header inline before each keyframe, which is where the
+    keyframe can be decoded from.
+
+    Args:
+        data (Union[bytes, mmap.mmap]): The H264 byte stream.
+        fps (int): Frame rate of the video.
+
+    Returns:
+        list[Keyframe]: The byte offset of the SPS header preceding each keyframe and
+            the keyframe's timestamp in microseconds.
+    """
+    keyframes: list[Keyframe] = []
+    header_offset: Optional[int] = None
+    frames = 0
+    position = data.find(_START_CODE)
+    while 0 <= position < len(data) - 4:
+        # Four byte start codes begin with an additional zero byte
+        nal_offset = (
+            position - 1 if position > 0 and data[position - 1] == 0 else position
+        )
+        nal_type = data[position + 3] & 0x1F
+        if nal_type == _NAL_SPS:
+            if header_offset is None:
+                header_offset = nal_offset
+        elif nal_type in (_NAL_SLICE, _NAL_IDR_SLICE):
+            # Only the first slice of a frame starts at macroblock 0, which is
+            # encoded as a single set bit
+            if data[position + 4] & 0x80:
+                if nal_type == _NAL_IDR_SLICE and header_offset is not None:
+                    keyframes.append(Keyframe(header_offset, frames * 1_000_000 // fps))
+                frames += 1
+            header_offset = None
+        position = data.find(_START_CODE, position + 3)
+    return keyframes
+
+
+def plan_clip(
+    segments: list[Segment], start: datetime, end: datetime
+) -> list[ClipPart]:
+    """The byte ranges of the videos making up the clip.
+
+    Args:
+        segments (list[Segment]): The videos overlapping the time range.
+        start (datetime): Start of the time range.
+        end (datetime): End of the time range.
+
+    Returns:
+        list[ClipPart]: The non-empty byte range of each video in the clip.
+    """
+    parts: list[ClipPart] = []
+    for segment in segments:
+        size = segment.video_file.stat().st_size
+        keyframes = read_keyframes(segment.video_file) if size else []
+        if not keyframes:
+            continue
+        first = keyframe_before(keyframes, _micros(start - segment.start))
+        if first is None:
+            first = keyframes[0]
+        following = bisect.bisect_left(
+            [keyframe.timestamp for keyframe in keyframes],
+            _micros(end - segment.start),
+        )
+        last = keyframes[following].offset if following < len(keyframes) else size
+        if last > first.offset:
+            parts.append(
+                ClipPart(
+                    segment.video_file,
+                    first.offset,
+                    last,
+                    segment.start + timedelta(microseconds=first.timestamp),
+                )
+            )
+    return parts
+
+
+def extract_clip(
+    start: datetime,
+    end: datetime,
+    output: Union[str, Path],
+    video_dir: Optional[Union[str, Path]] = None,
+) -> list[ClipPart]:
+    """Write the recorded frames from `start` to `end` into a single H264 file.
+
+    Args:
+        start (datetime): Start of the clip.
+        end (datetime): End of the clip.
+        output (Union[str, Path]): Path of the clip to write.
+        video_dir (Optional[Union[str, Path]], optional): Directory of the videos.
+            Defaults to the video directory of the user config.
+
+    Returns:
+        list[ClipPart]: The byte ranges of the videos written to the clip.
+
+    Raises:
+        ValueError: If `end` is not after `start` or no video covers the time range.
+    """
+    if end <= start:
+        raise ValueError(f"The end {end} of the clip is not after its start {start}")
+    if video_dir is None:
+        video_dir = config.settings.video.dir
+    parts = plan_clip(find_segments(video_dir, start, end), start, end)
+    if not parts:
+        raise ValueError(f"No video in '{video_dir}' covers {start} to {end}")
+    with open(output, "wb") as clip:
+        for part in parts:
+            _write_part(part, clip)
+    log.write(
+        f"Cut {sum(part.size for part in parts)} bytes of {len(parts)} videos "
+        f"into '{output}'",
+        log.LogLevel.DEBUG,
+    )
+    return parts
+
+
+def _write_part(part: ClipPart, clip) -> None:
+    """Write the bytes of a video to the clip without copying them in user space."""
+    with open(part.video_file, "rb") as video, _map(video) as data:
+        with memoryview(data) as view:
+            for position in range(part.begin, part.end, CHUNK_SIZE):
+                clip.write(view[position : min(position + CHUNK_SIZE, part.end)])
+
+
+def _map(video) -> mmap.mmap:
+    """Map a video read-only into memory and tell the kernel it is read ahead."""
+    data = mmap.mmap(video.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(data, "madvise"):
+        data.madvise(mmap.MADV_SEQUENTIAL)
+    return data
+
+
+def _fps(video_file: Union[str, Path]) -> int:
+    fps = name.get_fps_from_filename(Path(video_file).name)
+    return fps if fps else config.settings.camera.fps
+
+
+def _micros(delta: timedelta) -> int:
+    return delta // timedelta(microseconds=1)
+
+
+def _parse_time(value: str, day: date) -> datetime:
+    """Parse a date and time or a time on `day`, e.g. "2023-05-18 14:03" or "14:03"."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.combine(day, time.fromisoformat(value))
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    """Cut a clip from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Cut a clip of a time range out of the recorded videos."
+    )
+    parser.add_argument("start", help='start of the clip, e.g. "14:03"')
+    parser.add_argument("end", help='end of the clip, e.g. "14:07"')
+    parser.add_argument("output", type=Path, help="path of the clip to write")
+    parser.add_argument(
+        "--date",
+        type=date.fromisoformat,
+        default=date.today(),
+        help="day of start and end given as time only. Defaults to today.",
+    )
+    parser.add_argument(
+        "--video-dir",
+        type=Path,
+        default=None,
+        help="directory of the videos. Defaults to the configured video directory.",
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        default=USER_CONFIG,
+        help=f"path of the user config. Defaults to '{USER_CONFIG}'.",
+    )
+    parsed = parser.parse_args(args)
+    try:
+        for warning in config.parse_user_config(parsed.config):
+            print(warning, file=sys.stderr)
+    except config.ConfigValidationError as cause:
+        parser.exit(1, f"{cause}\n")
+    try:
+        start = _parse_time(parsed.start, parsed.date)
+        end = _parse_time(parsed.end, parsed.date)
+        parts = extract_clip(start, end, parsed.output, parsed.video_dir)
+    except (OSError, ValueError) as cause:
+        parser.exit(1, f"{cause}\n")
+    for part in parts:
+        print(f"{part.video_file.name}: {part.size} bytes from {part.start}")
+    print(f"Wrote '{parsed.output}' ({os.path.getsize(parsed.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""OTCamera helper to watch the user config file for changes.
+
+Uses inotify to get notified when the user config file is written. Falls back to
+polling the file's modification time if inotify is not available.
+
+The watcher thread only flags that the file changed. Parsing and applying the new
+configuration is done by the caller, e.g. at the next split of the recording.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from OTCamera import config
+from OTCamera.helpers import log
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_EVENT_HEADER = struct.Struct("iIII")
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+POLL_INTERVAL = 2.0
+"""Seconds between two checks when falling back to polling."""
+
+
+class ConfigWatcher:
+    """Watches the user config file and provides the changes made to it.
+
+    Editors usually replace a file instead of writing it in place. Therefore the
+    directory containing the config file is watched and events are filtered by the
+    config file's name.
+
+    Args:
+        config_file (Union[str, Path]): Path to the user config file.
+        poll_interval (float, optional): Seconds between two checks if inotify is
+            not available. Defaults to `POLL_INTERVAL`.
+    """
+
+    def __init__(
+        self, config_file: Union[str, Path], poll_interval: float = POLL_INTERVAL
+    ) -> None:
+        self.config_file = Path(config_file).expanduser().resolve()
+        self.poll_interval = poll_interval
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start watching the config file in a background thread."""
+        if self._thread is not None:
+            return
+        inotify_fd = self._init_inotify()
+        if inotify_fd is None:
+            log.write(
+                "inotify not available, polling config file for changes",
+                log.LogLevel.DEBUG,
+            )
+            target, args = self._poll, ()
+        else:
+            target, args = self._watch, (inotify_fd,)
+        self._thread = threading.Thread(
+            target=target, args=args, name="config-watcher", daemon=True
+        )
+        self._thread.start()
+        log.write(f"Watching '{self.config_file}' for changes", log.LogLevel.DEBUG)
+
+    def stop(self) -> None:
+        """Stop watching the config file."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def take_change(self) -> Optional[config.ConfigChange]:
+        """Get the changes made to the config file since the last call.
+
+        Reads and parses the config file only if it has been changed.
+
+        Returns:
+            Optional[config.ConfigChange]: The changed values or `None` if nothing
+            changed.
+        """
+        if not self._changed.is_set():
+            return None
+        self._changed.clear()
+
+        try:
+            values = config.load_user_config(str(self.config_file))
+        except Exception as cause:
+            log.write(
+                f"Unable to reload config file '{self.config_file}': {cause}",
+                log.LogLevel.ERROR,
+            )
+            return None
+        if values is None:
+            return None
+
+        change = config.diff(values)
+        if not change:
+            return None
+        if change.restart_required:
+            log.write(
+                "Config changes require a restart of OTCamera and are ignored: "
+                f"{', '.join(change.restart_required)}",
+                log.LogLevel.WARNING,
+            )
+        return change
+
+    def _init_inotify(self) -> Optional[int]:
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            return None
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            fd = libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        directory = str(self.config_file.parent).encode()
+        if libc.inotify_add_watch(fd, directory, _WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _watch(self, inotify_fd: int) -> None:
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([inotify_fd], [], [], 1.0)
+                if not readable:
+                    continue
+                if self._config_file_in_events(os.read(inotify_fd, 4096)):
+                    log.write("Config file changed", log.LogLevel.DEBUG)
+                    self._changed.set()
+        finally:
+            os.close(inotify_fd)
+
+    def _config_file_in_events(self, buffer: bytes) -> bool:
+        offset = 0
+        found = False
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            _, _, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset : offset + length].rstrip(b"\0").decode()
+            offset += length
+            found = found or name == self.config_file.name
+        return found
+
+    def _poll(self) -> None:
+        last_mtime = self._get_mtime()
+        while not self._stop.wait(self.poll_interval):
+            mtime = self._get_mtime()
+            if mtime != last_mtime:
+                last_mtime = mtime
+                log.write("Config file changed", log.LogLevel.DEBUG)
+                self._changed.set()
+
+    def _get_mtime(self) -> Optional[int]:
+        try:
+            return self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,201 @@
+"""OTCamera helper to handle hardware events in a well-defined context.
+
+gpiozero calls button callbacks from its own threads, at any time, e.g. while the
+camera splits the recording. The callbacks therefore only post an event to the
+dispatcher. The record loop dispatches the pending events between its camera
+operations, so the handlers never run concurrently with each other or the loop.
+
+Each source, e.g. a button, has at most one pending event. A newer event of the
+same source replaces the pending one, which coalesces bursts and bounds the queue
+by the number of sources. An event is only due once its source was quiet for its
+debounce time. Due events are handled by priority, so a low battery preempts all
+other pending events, and else in the order they were last posted. Edges that must
+not be coalesced with the state of a switch, e.g. holding a button, are posted to
+their own source.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from dataclasses import dataclass
+from enum import IntEnum
+from time import monotonic
+from typing import Callable, Optional
+
+from OTCamera.helpers import log, metrics
+
+Handler = Callable[[], None]
+"""Handles an event in the context of the dispatching thread."""
+
+_COALESCED = metrics.REGISTRY.counter(
+    "otcamera_events_coalesced_total",
+    "Number of events replaced by a newer event of the same source.",
+)
+_LATENCY = metrics.REGISTRY.histogram(
+    "otcamera_event_latency_seconds",
+    "Time from posting an event until its handler has run.",
+)
+
+
+class Priority(IntEnum):
+    """Order of handling due events. Lower values are handled first."""
+
+    CRITICAL = 0
+    HIGH = 1
+    NORMAL = 2
+
+
+@dataclass(frozen=True)
+class Source:
+    """A source of events.
+
+    Attributes:
+        name (str): Name of the source.
+        priority (Priority): Priority of the events of the source.
+        debounce (float): Seconds the source must be quiet before its event is due.
+    """
+
+    name: str
+    priority: Priority
+    debounce: float
+
+
+@dataclass(frozen=True)
+class _Event:
+    source: Source
+    handler: Handler
+    posted: float
+    last_posted: float
+    due: float
+
+
+class EventDispatcher:
+    """Queues events of any thread and handles them in the dispatching thread."""
+
+    def __init__(self) -> None:
+        self._sources: dict[str, Source] = {}
+        self._pending: dict[str, _Event] = {}
+        self._posted = threading.Condition(threading.Lock())
+
+    def register(
+        self, name: str, priority: Priority = Priority.NORMAL, debounce: float = 0
+    ) -> None:
+        """Register the event source `name`.
+
+        Args:
+            name (str): Name of the source.
+            priority (Priority, optional): Priority of its events.
+                Defaults to Priority.NORMAL.
+            debounce (float, optional): Seconds the source must be quiet before its
+                event is due. Defaults to 0.
+        """
+        with self._posted:
+            self._sources[name] = Source(name, priority, debounce)
+
+    def post(self, name: str, handler: Handler) -> None:
+        """Queue `handler` as the event of source `name`.
+
+        Replaces a pending event of the same source. Never blocks, so it is safe to
+        call from gpiozero's callback threads.
+
+        Raises:
+            ValueError: If the source is not registered.
+        """
+        now = monotonic()
+        with self._posted:
+            source = self._sources.get(name)
+            if source is None:
+                raise ValueError(f"Unknown event source: {name}")
+            previous = self._pending.get(name)
+            if previous is not None:
+                _COALESCED.inc()
+            self._pending[name] = _Event(
+                source,
+                handler,
+                previous.posted if previous is not None else now,
+                now,
+                now + source.debounce,
+            )
+            self._posted.notify_all()
+
+    def poster(self, name: str, handler: Handler) -> Handler:
+        """A callback posting `handler` as the event of source `name`."""
+
+        def post() -> None:
+            self.post(name, handler)
+
+        return post
+
+    def wait(self, timeout: float) -> bool:
+        """Block until an event is due or `timeout` seconds passed.
+
+        Returns:
+            bool: Whether an event is due.
+        """
+        deadline = monotonic() + timeout
+        with self._posted:
+            while True:
+                now = monotonic()
+                due = self._next_due()
+                if due is not None and due <= now:
+                    return True
+                remaining = deadline - now
+                if remaining <= 0:
+                    return False
+                if due is not None:
+                    remaining = min(remaining, due - now)
+                self._posted.wait(remaining)
+
+    def dispatch(self) -> int:
+        """Handle the due events by priority in the calling thread.
+
+        Events becoming due while handling are handled as well, with a critical event
+        preempting the events still pending.
+
+        Returns:
+            int: The number of handled events.
+        """
+        handled = 0
+        while (event := self._take_due()) is not None:
+            try:
+                event.handler()
+            except Exception as cause:
+                log.write(
+                    f"Handling event of {event.source.name} failed: {cause}",
+                    log.LogLevel.EXCEPTION,
+                )
+            _LATENCY.observe(monotonic() - event.posted)
+            handled += 1
+        return handled
+
+    def _next_due(self) -> Optional[float]:
+        return min((event.due for event in self._pending.values()), default=None)
+
+    def _take_due(self) -> Optional[_Event]:
+        now = monotonic()
+        with self._posted:
+            due = [event for event in self._pending.values() if event.due <= now]
+            if not due:
+                return None
+            event = min(
+                due, key=lambda event: (event.source.priority, event.last_posted)
+            )
+            del self._pending[event.source.name]
+            return event
+
+
+dispatcher = EventDispatcher()
+"""Dispatches the hardware events in the record loop."""
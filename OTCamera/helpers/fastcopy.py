@@ -0,0 +1,334 @@
+"""OTCamera helper to copy large files quickly.
+
+Used to offload videos from the SD card to a USB flash drive. Depending on what the
+kernel supports for the pair of file systems, a file is copied with
+
+1. `os.copy_file_range`, which copies inside the kernel,
+2. `os.sendfile`, which also avoids copying the data to user space, or
+3. a reader and a writer thread passing large buffers to each other, which lets
+   reading from the SD card overlap with writing to the USB flash drive.
+
+Each file is synced to disk once after it has been copied completely.
+
+`copy_resumable` copies to a partial file first and renames it when complete. If the
+copy is interrupted, e.g. because the USB flash drive has been unplugged, the next
+copy verifies the partial file and resumes at its end.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import errno
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Union
+
+from OTCamera.helpers import log
+
+CHUNK_SIZE = 8 * 1024 * 1024
+"""Default number of bytes copied at once."""
+NUM_BUFFERS = 2
+"""Number of buffers passed between the reader and the writer thread."""
+PROGRESS_LOG_INTERVAL = 10.0
+"""Minimum number of seconds between two log messages about the progress."""
+PART_SUFFIX = ".part"
+"""Suffix of a file that is still being copied."""
+VERIFY_SIZE = 1024 * 1024
+"""Number of bytes at the end of a partial file compared before resuming."""
+
+# Errors signalling that the kernel cannot copy between the two files.
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF}
+
+ProgressCallback = Callable[[int], None]
+"""Called with the number of bytes copied since the last call."""
+
+
+class CopyProgress:
+    """Tracks the progress and throughput of copying several files.
+
+    Args:
+        total_bytes (int): Number of bytes to copy in total.
+        log_interval (float, optional): Minimum number of seconds between two log
+            messages. Defaults to `PROGRESS_LOG_INTERVAL`.
+        clock (Callable[[], float], optional): The clock to use.
+            Defaults to `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        total_bytes: int,
+        log_interval: float = PROGRESS_LOG_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.total_bytes = total_bytes
+        self.bytes_copied = 0
+        self.log_interval = log_interval
+        self._clock = clock
+        self._start = clock()
+        self._last_log = self._start
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the start of the copy."""
+        return self._clock() - self._start
+
+    @property
+    def fraction(self) -> float:
+        """Fraction of the bytes copied between 0 and 1."""
+        if self.total_bytes <= 0:
+            return 1.0
+        return min(self.bytes_copied / self.total_bytes, 1.0)
+
+    @property
+    def throughput(self) -> float:
+        """Average number of bytes copied per second."""
+        elapsed = self.elapsed
+        return self.bytes_copied / elapsed if elapsed > 0 else 0.0
+
+    def add(self, num_bytes: int) -> None:
+        """Count bytes copied and log the progress from time to time.
+
+        Can be passed as `progress` to `copy_file`.
+        """
+        self.bytes_copied += num_bytes
+        now = self._clock()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            log.write(self.summary())
+
+    def summary(self) -> str:
+        """The progress in words, e.g. "Copied 1.0 of 4.0 GB (25%) at 30.0 MB/s"."""
+        return (
+            f"Copied {self.bytes_copied / 1e9:.1f} of {self.total_bytes / 1e9:.1f} GB "
+            f"({self.fraction:.0%}) at {self.throughput / 1e6:.1f} MB/s"
+        )
+
+
+def copy_file(
+    src: Union[str, Path],
+    dst: Union[str, Path],
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    start: int = 0,
+) -> int:
+    """Copy a file including its metadata like `shutil.copy2` but faster.
+
+    Args:
+        src (Union[str, Path]): The file to copy.
+        dst (Union[str, Path]): The destination file. Overwritten if it exists.
+        chunk_size (int, optional): Number of bytes copied at once.
+            Defaults to `CHUNK_SIZE`.
+        progress (Optional[ProgressCallback], optional): Called after each chunk with
+            the number of bytes copied. Defaults to None.
+        start (int, optional): Offset to start copying at. The first `start` bytes of
+            `dst` are kept. Defaults to 0.
+
+    Returns:
+        int: The number of bytes copied.
+    """
+    report = progress if progress is not None else _ignore_progress
+    with open(src, "rb") as src_file, open(dst, "r+b" if start else "wb") as dst_file:
+        dst_file.truncate(start)
+        size = os.fstat(src_file.fileno()).st_size
+        end = _copy_in_kernel(src_file, dst_file, start, size, chunk_size, report)
+        if end < size:
+            end += _copy_threaded(src_file, dst_file, chunk_size, report)
+        dst_file.flush()
+        os.fsync(dst_file.fileno())
+    shutil.copystat(src, dst)
+    return end - start
+
+
+def resume_offset(
+    src: Union[str, Path], partial: Union[str, Path], verify_size: int = VERIFY_SIZE
+) -> int:
+    """The offset to resume copying `src` to the partial copy `partial` at.
+
+    The last `verify_size` bytes of the partial copy are compared with the source.
+
+    Returns:
+        int: The size of the partial copy if it matches the source, otherwise 0.
+    """
+    try:
+        with open(src, "rb") as src_file, open(partial, "rb") as partial_file:
+            size = partial_file.seek(0, os.SEEK_END)
+            if size > os.fstat(src_file.fileno()).st_size:
+                return 0
+            verify_start = max(size - verify_size, 0)
+            src_file.seek(verify_start)
+            partial_file.seek(verify_start)
+            length = size - verify_start
+            if src_file.read(length) != partial_file.read(length):
+                return 0
+            return size
+    except FileNotFoundError:
+        return 0
+
+
+def copy_resumable(
+    src: Union[str, Path],
+    dst: Union[str, Path],
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Copy a file via a partial file that is resumed if the copy was interrupted.
+
+    Args:
+        src (Union[str, Path]): The file to copy.
+        dst (Union[str, Path]): The destination file. Overwritten if it exists.
+        chunk_size (int, optional): Number of bytes copied at once.
+            Defaults to `CHUNK_SIZE`.
+        progress (Optional[ProgressCallback], optional): Called after each chunk with
+            the number of bytes copied. The bytes of a resumed partial file are
+            reported at the start. Defaults to None.
+
+    Returns:
+        int: The number of bytes copied, excluding the bytes resumed.
+    """
+    dst = Path(dst)
+    partial = dst.with_name(dst.name + PART_SUFFIX)
+    start = resume_offset(src, partial)
+    if start:
+        log.write(f"Resuming copy of '{src}' at byte {start}")
+        if progress is not None:
+            progress(start)
+    copied = copy_file(src, partial, chunk_size, progress, start)
+    os.replace(partial, dst)
+    _fsync_dir(dst.parent)
+    return copied
+
+
+def _fsync_dir(directory: Path) -> None:
+    """Persist a rename. Not all file systems support syncing a directory."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _ignore_progress(num_bytes: int) -> None:
+    pass
+
+
+def _copy_in_kernel(
+    src_file: BinaryIO,
+    dst_file: BinaryIO,
+    start: int,
+    size: int,
+    chunk_size: int,
+    progress: ProgressCallback,
+) -> int:
+    """Copy with `copy_file_range` or `sendfile` as long as the kernel supports it.
+
+    Returns:
+        int: The offset up to which the file has been copied. Might be less than
+        `size` if the kernel does not support copying between the files. The file
+        positions are left at this offset.
+    """
+    src_fd = src_file.fileno()
+    dst_fd = dst_file.fileno()
+    copied = start
+    for syscall in (_copy_file_range, _sendfile):
+        if syscall is None:
+            continue
+        try:
+            while copied < size:
+                sent = syscall(src_fd, dst_fd, min(chunk_size, size - copied), copied)
+                if sent == 0:
+                    break
+                copied += sent
+                progress(sent)
+            break
+        except OSError as cause:
+            if cause.errno not in _UNSUPPORTED:
+                raise
+    src_file.seek(copied)
+    dst_file.seek(copied)
+    return copied
+
+
+def _copy_file_range_syscall(src_fd: int, dst_fd: int, count: int, offset: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile_syscall(src_fd: int, dst_fd: int, count: int, offset: int) -> int:
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+_copy_file_range = _copy_file_range_syscall if hasattr(os, "copy_file_range") else None
+_sendfile = _sendfile_syscall if hasattr(os, "sendfile") else None
+
+
+def _copy_threaded(
+    src_file: BinaryIO,
+    dst_file: BinaryIO,
+    chunk_size: int,
+    progress: ProgressCallback,
+) -> int:
+    """Copy from the current positions with a reader and a writer thread.
+
+    The reader thread fills one buffer while the calling thread writes the other.
+    """
+    free: queue.Queue[bytearray] = queue.Queue()
+    for _ in range(NUM_BUFFERS):
+        free.put(bytearray(chunk_size))
+    filled: queue.Queue[tuple[Optional[bytearray], int]] = queue.Queue()
+    errors: list[BaseException] = []
+    stop = threading.Event()
+
+    def read() -> None:
+        try:
+            while not stop.is_set():
+                buffer = free.get()
+                length = src_file.readinto(buffer)
+                if not length:
+                    break
+                filled.put((buffer, length))
+        except BaseException as cause:
+            errors.append(cause)
+        finally:
+            filled.put((None, 0))
+
+    reader = threading.Thread(target=read, name="fastcopy-reader", daemon=True)
+    reader.start()
+    copied = 0
+    try:
+        while True:
+            buffer, length = filled.get()
+            if buffer is None:
+                break
+            dst_file.write(memoryview(buffer)[:length])
+            copied += length
+            progress(length)
+            free.put(buffer)
+    finally:
+        stop.set()
+        # Unblock the reader if it waits for a free buffer
+        free.put(bytearray(0))
+        reader.join()
+    if errors:
+        raise errors[0]
+    return copied
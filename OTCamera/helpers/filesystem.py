@@ -19,33 +19,62 @@ Check if enough filespace is available and delete old files until it's enough.
 # program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import os
+import threading
+import time
 from pathlib import Path
-from typing import Union
+from typing import Callable, Optional, Union
 
 import psutil
 
 from OTCamera import config
-from OTCamera.helpers import log
+from OTCamera.helpers import log, metrics, name
 from OTCamera.helpers.errors import NoMoreFilesToDeleteError
+from OTCamera.helpers.offload_state import offload_state
 
 log.write("imported filesystem", level=log.LogLevel.DEBUG)
 
+_UNOFFLOADED_DELETIONS = metrics.REGISTRY.counter(
+    "otcamera_unoffloaded_deletions_total",
+    "Videos deleted to free up space before they were offloaded.",
+)
 
+ALARM_MARGIN = 1.0
+"""Free space in GB above the minimum free space at which the loss of footage that
+has not been offloaded is alarmed."""
+DISK_USAGE_TTL = 10.0
+"""Number of seconds the free disk space is cached."""
+RESCAN_INTERVAL = 600.0
+"""Number of seconds after which the video directory is scanned again to pick up
+changes made by others, e.g. videos deleted via FTP."""
+
+
+@metrics.timed(
+    "otcamera_delete_old_files_seconds",
+    "Duration of deleting old files to free up disk space.",
+)
 def delete_old_files(
-    video_dir: Union[str, Path] = config.VIDEO_DIR,
-    min_free_space: int = config.MIN_FREE_SPACE,
+    video_dir: Optional[Union[str, Path]] = None,
+    min_free_space: Optional[int] = None,
 ) -> None:
-    """Delete old files until enough space available.
+    """Delete old videos until enough space available.
 
     Checks if enough space (`config.MINFREESPACE`) is a availabe to save video files.
-    If not, deletes the oldest files in `video_dir` one after another until enough
-    space is available on disk.
+    If not, deletes the oldest videos in `video_dir` one after another until enough
+    space is available on disk. Other files like logs are never deleted.
+
+    Videos that have been uploaded or copied to a USB flash drive are deleted first.
+    Deleting a video that has not been offloaded yet is reported as an error. The
+    proxy and the keyframe index of a video are deleted together with the video.
+
+    An alarm is raised before that happens, as soon as the free space is within
+    `ALARM_MARGIN` of the minimum and no offloaded videos are left to delete.
 
     Args:
         video_dir (Union[str, Path], optional): Path to video directory.
         Defaults to `config.VIDEO_DIR`.
         min_free_space(int, optional): free space in GB on sd card before old videos
-        get deleted.
+        get deleted. Defaults to `config.MIN_FREE_SPACE`.
 
     Raises:
         NoMoreFilesToDeleteError: If no more files in `video_dir` can be deleted to
@@ -53,15 +82,17 @@ def delete_old_files(
         This implies that there is no space left
 
     """
+    if video_dir is None:
+        video_dir = config.VIDEO_DIR
+    if min_free_space is None:
+        min_free_space = config.MIN_FREE_SPACE
     absolute_video_dirpath = Path(video_dir).expanduser().resolve()
     log.write("delete old file", level=log.LogLevel.DEBUG)
     min_free_space = min_free_space * 1024 * 1024 * 1024
 
     while not _enough_space(absolute_video_dirpath, min_free_space):
-        video_paths = [
-            f for f in absolute_video_dirpath.iterdir() if f.suffix != ".log"
-        ]
-        if len(video_paths) <= 1:
+        videos = _deletable_videos(absolute_video_dirpath)
+        if not videos:
             log.write(
                 (
                     "No more video files to be deleted "
@@ -75,12 +106,86 @@ def delete_old_files(
                     "Please make space to resume recording."
                 )
             )
-        oldest_video = min(video_paths, key=(lambda path: path.stat().st_ctime))
-        oldest_video.unlink()
+        oldest_video = _select_video_to_delete(videos)
+        _delete_video(oldest_video)
         log.breakline()
         log.write(f"Deleted {oldest_video}")
         free_space = psutil.disk_usage(absolute_video_dirpath).free
         log.write(f"free space: {free_space}", level=log.LogLevel.INFO)
+    _check_footage_at_risk(absolute_video_dirpath, min_free_space)
+
+
+def _check_footage_at_risk(video_dir: Path, min_free_space: int) -> None:
+    """Alarm if footage that has not been offloaded will be deleted soon.
+
+    Sets `footage_at_risk` of the status, which is exported as metric, and logs when
+    the alarm is raised or cleared.
+
+    Args:
+        video_dir (Path): The video directory.
+        min_free_space (int): Free space in bytes before videos get deleted.
+    """
+    from OTCamera import status
+
+    alarm_space = min_free_space + ALARM_MARGIN * 1024 * 1024 * 1024
+    at_risk = psutil.disk_usage(video_dir).free < alarm_space and not any(
+        offload_state.is_offloaded(video) for video in _deletable_videos(video_dir)
+    )
+    was_at_risk = status.store.state.footage_at_risk
+    if at_risk and not was_at_risk:
+        log.write(
+            "SD card almost full and no offloaded videos left. Videos that have "
+            "neither been uploaded nor copied to a USB flash drive will be deleted "
+            "soon!",
+            log.LogLevel.ERROR,
+        )
+    elif was_at_risk and not at_risk:
+        log.write("Enough free space or offloaded videos to delete again")
+    status.store.update(footage_at_risk=at_risk)
+
+
+def _deletable_videos(video_dir: Path) -> list[Path]:
+    """The videos in `video_dir` except the newest one, which might be recorded."""
+    videos = [
+        f
+        for f in video_dir.iterdir()
+        if f.suffix == f".{config.VIDEO_FORMAT}" and not name.is_proxy(f)
+    ]
+    # Names contain the start time and order videos created within the same tick
+    return sorted(videos, key=lambda path: (path.stat().st_ctime, path.name))[:-1]
+
+
+def _select_video_to_delete(videos: list[Path]) -> Path:
+    """Select the oldest offloaded video or else the oldest video.
+
+    Args:
+        videos (list[Path]): The deletable videos sorted from oldest to newest.
+    """
+    for video in videos:
+        if offload_state.is_offloaded(video):
+            return video
+    oldest_video = videos[0]
+    _UNOFFLOADED_DELETIONS.inc()
+    log.write(
+        f"SD card full and no offloaded videos left. Deleting '{oldest_video.name}', "
+        "which has neither been uploaded nor copied to a USB flash drive!",
+        log.LogLevel.ERROR,
+    )
+    return oldest_video
+
+
+def _delete_video(video: Path) -> None:
+    """Delete a video, its proxy and its keyframe index, if any."""
+    video.unlink()
+    video_dir_stats.file_deleted(video)
+    offload_state.forget(video)
+    for path in (name.proxy(video), name.keyframe_index(video)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        video_dir_stats.file_deleted(path)
+        offload_state.forget(path)
 
 
 def _enough_space(directory: Path, min_free_space: int) -> bool:
@@ -97,3 +202,121 @@ def resolve_path(path: Union[str, Path]) -> Path:
 def calc_free_diskspace(directory: Union[str, Path]) -> int:
     resolved_path = resolve_path(directory)
     return psutil.disk_usage(resolved_path).free
+
+
+class VideoDirStats:
+    """Keeps the number of videos and the free disk space of a directory up to date.
+
+    The video directory is scanned once. Afterwards, the videos are tracked by the
+    events `file_created` and `file_deleted`. Thus, querying the number of videos does
+    not scan the directory. The free disk space is cached for `disk_usage_ttl`
+    seconds.
+
+    Args:
+        video_dir (Optional[Union[str, Path]], optional): Path to the video directory.
+            Defaults to `config.VIDEO_DIR` at the time of the query.
+        filetype (Optional[str], optional): The filetype of a video file. Defaults to
+            `config.VIDEO_FORMAT` at the time of the query.
+        disk_usage_ttl (float, optional): Seconds the free disk space is cached.
+            Defaults to `DISK_USAGE_TTL`.
+        rescan_interval (float, optional): Seconds after which the directory is
+            scanned again. Defaults to `RESCAN_INTERVAL`.
+        clock (Callable[[], float], optional): The clock to use.
+            Defaults to `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        video_dir: Optional[Union[str, Path]] = None,
+        filetype: Optional[str] = None,
+        disk_usage_ttl: float = DISK_USAGE_TTL,
+        rescan_interval: float = RESCAN_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._video_dir = video_dir
+        self._filetype = filetype
+        self.disk_usage_ttl = disk_usage_ttl
+        self.rescan_interval = rescan_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._scanned_dir: Optional[Path] = None
+        self._scanned_at = 0.0
+        self._videos: set[str] = set()
+        self._free_diskspace = 0
+        self._disk_usage_at: Optional[float] = None
+
+    @property
+    def video_dir(self) -> Path:
+        return resolve_path(
+            config.VIDEO_DIR if self._video_dir is None else self._video_dir
+        )
+
+    @property
+    def filetype(self) -> str:
+        return config.VIDEO_FORMAT if self._filetype is None else self._filetype
+
+    def num_videos(self) -> int:
+        """The number of videos in the video directory.
+
+        Raises:
+            NotADirectoryError: If the video directory does not exist.
+        """
+        video_dir = self.video_dir
+        with self._lock:
+            if (
+                video_dir != self._scanned_dir
+                or self._clock() - self._scanned_at >= self.rescan_interval
+            ):
+                self._scan(video_dir)
+            return len(self._videos)
+
+    def free_diskspace(self) -> int:
+        """The free disk space of the video directory in bytes."""
+        now = self._clock()
+        with self._lock:
+            if (
+                self._disk_usage_at is None
+                or now - self._disk_usage_at >= self.disk_usage_ttl
+            ):
+                self._free_diskspace = calc_free_diskspace(self.video_dir)
+                self._disk_usage_at = now
+            return self._free_diskspace
+
+    def file_created(self, path: Union[str, Path]) -> None:
+        """Track a file created in the video directory."""
+        path = Path(path)
+        with self._lock:
+            if self._is_video(path.name):
+                self._videos.add(path.name)
+            self._disk_usage_at = None
+
+    def file_deleted(self, path: Union[str, Path]) -> None:
+        """Track a file deleted from the video directory."""
+        with self._lock:
+            self._videos.discard(Path(path).name)
+            self._disk_usage_at = None
+
+    def invalidate(self) -> None:
+        """Scan the video directory and query the disk space again on next access."""
+        with self._lock:
+            self._scanned_dir = None
+            self._disk_usage_at = None
+
+    def _scan(self, video_dir: Path) -> None:
+        if not video_dir.is_dir():
+            raise NotADirectoryError(f"'{video_dir}' is not a directory!")
+        with os.scandir(video_dir) as entries:
+            self._videos = {
+                entry.name for entry in entries if self._is_video(entry.name)
+            }
+        self._scanned_dir = video_dir
+        self._scanned_at = self._clock()
+
+    def _is_video(self, filename: str) -> bool:
+        return self.filetype in os.path.splitext(filename)[1] and not name.is_proxy(
+            filename
+        )
+
+
+video_dir_stats = VideoDirStats()
+"""The statistics of the video directory used by OTCamera."""
@@ -0,0 +1,184 @@
+"""OTCamera helper to detect USB flash drives being plugged in and removed.
+
+Listens to the uevents the kernel sends on a netlink socket whenever a device is added
+or removed. Thus, no process has to poll for the device node and udev is not required.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import socket
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from OTCamera.helpers import log
+
+NETLINK_KOBJECT_UEVENT = 15
+"""Netlink protocol of the kernel uevents."""
+_KERNEL_GROUP = 1
+_RECEIVE_SIZE = 8192
+_POLL_INTERVAL = 1.0
+
+ADD = "add"
+REMOVE = "remove"
+
+DeviceCallback = Callable[[str], None]
+"""Called with the path of the device node, e.g. "/dev/sda1"."""
+
+
+@dataclass(frozen=True)
+class UEvent:
+    """A uevent of the kernel.
+
+    Attributes:
+        action (str): E.g. "add" or "remove".
+        subsystem (str): E.g. "block" or "usb".
+        devname (Optional[str]): Name of the device node below /dev, e.g. "sda1".
+    """
+
+    action: str
+    subsystem: str
+    devname: Optional[str] = None
+
+    @staticmethod
+    def parse(data: bytes) -> Optional["UEvent"]:
+        """Parse a uevent sent by the kernel.
+
+        The message starts with a header like "add@/devices/..." followed by
+        NUL separated "KEY=value" pairs. Messages of udev start with "libudev" and are
+        ignored.
+
+        Returns:
+            Optional[UEvent]: The event or `None` if the message is not a uevent.
+        """
+        header, *fields = data.split(b"\0")
+        if b"@" not in header:
+            return None
+        values = {}
+        for field in fields:
+            key, separator, value = field.partition(b"=")
+            if separator:
+                values[key.decode(errors="replace")] = value.decode(errors="replace")
+        if "ACTION" not in values or "SUBSYSTEM" not in values:
+            return None
+        return UEvent(values["ACTION"], values["SUBSYSTEM"], values.get("DEVNAME"))
+
+
+class HotplugListener:
+    """Calls back when a block device is added or removed.
+
+    Args:
+        device (Union[str, Path]): Path to the device node to watch, e.g. "/dev/sda1".
+        on_add (DeviceCallback): Called when the device has been added. Also called
+            on start if the device already exists.
+        on_remove (Optional[DeviceCallback], optional): Called when the device has been
+            removed. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        device: Union[str, Path],
+        on_add: DeviceCallback,
+        on_remove: Optional[DeviceCallback] = None,
+    ) -> None:
+        self.device = Path(device)
+        self._on_add = on_add
+        self._on_remove = on_remove
+        self._socket: Optional[socket.socket] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, uevent_socket: Optional[socket.socket] = None) -> bool:
+        """Start listening in a background thread.
+
+        Args:
+            uevent_socket (Optional[socket.socket], optional): The socket receiving the
+                uevents. Defaults to a netlink socket bound to the kernel uevents.
+
+        Returns:
+            bool: Whether listening started.
+        """
+        if self._thread is not None:
+            return True
+        try:
+            self._socket = uevent_socket or _open_uevent_socket()
+        except OSError as cause:
+            log.write(
+                f"Unable to listen for USB flash drives: {cause}", log.LogLevel.WARNING
+            )
+            return False
+        self._socket.settimeout(_POLL_INTERVAL)
+        self._thread = threading.Thread(target=self._run, name="hotplug", daemon=True)
+        self._thread.start()
+        if self.device.exists():
+            self._on_add(str(self.device))
+        return True
+
+    def stop(self) -> None:
+        """Stop listening."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=_POLL_INTERVAL + 1)
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def handle(self, event: UEvent) -> None:
+        """Call back if the event concerns the watched device."""
+        if event.subsystem != "block" or event.devname != self.device.name:
+            return
+        if event.action == ADD:
+            log.write(f"USB flash drive '{self.device}' plugged in")
+            self._on_add(str(self.device))
+        elif event.action == REMOVE:
+            log.write(f"USB flash drive '{self.device}' removed")
+            if self._on_remove is not None:
+                self._on_remove(str(self.device))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                data = self._socket.recv(_RECEIVE_SIZE)
+            except socket.timeout:
+                continue
+            except OSError as cause:
+                if not self._stop.is_set():
+                    log.write(f"Hotplug listener failed: {cause}", log.LogLevel.ERROR)
+                return
+            event = UEvent.parse(data)
+            if event is None:
+                continue
+            try:
+                self.handle(event)
+            except Exception as cause:
+                log.write(
+                    f"Unable to handle {event.action} of '{self.device}': {cause}",
+                    log.LogLevel.EXCEPTION,
+                )
+
+
+def _open_uevent_socket() -> socket.socket:
+    uevent_socket = socket.socket(
+        socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT
+    )
+    try:
+        uevent_socket.bind((0, _KERNEL_GROUP))
+    except OSError:
+        uevent_socket.close()
+        raise
+    return uevent_socket
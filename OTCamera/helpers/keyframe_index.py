@@ -0,0 +1,167 @@
+"""OTCamera helper to index the keyframes of the videos while recording.
+
+For each video, the byte offset of every IDR frame and its timestamp are written to an
+index file next to the video. A player or clip tool can seek to a keyframe without
+parsing the whole H264 stream.
+
+The index is a flat array of little-endian unsigned 64-bit integers, two per keyframe:
+the byte offset of the SPS header preceding the keyframe and the keyframe's timestamp
+in microseconds. The entries are sorted by both. It can be loaded with
+
+    numpy.fromfile(path, dtype=INDEX_DTYPE).reshape(-1, 2)
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bisect
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from OTCamera.helpers import log, name
+
+INDEX_DTYPE = "<u8"
+"""numpy dtype of the values in the index file."""
+
+_ENTRY = struct.Struct("<QQ")
+# Values of picamerax.PiVideoFrameType
+_KEY_FRAME = 1
+_SPS_HEADER = 2
+
+
+@dataclass(frozen=True)
+class Keyframe:
+    """An entry of the keyframe index.
+
+    Attributes:
+        offset (int): Byte offset in the video to start decoding at.
+        timestamp (int): Timestamp of the keyframe in microseconds.
+    """
+
+    offset: int
+    timestamp: int
+
+
+class IndexedOutput:
+    """Writes a video recorded by picamera and indexes its keyframes.
+
+    Passed to `PiCamera.start_recording` or `split_recording` instead of a filename.
+    picamera updates the frame meta-data before writing each buffer of the encoder
+    to the output, so each write can be attributed to its frame.
+
+    Args:
+        video_file (Union[str, Path]): Path of the video to write.
+        frame (Callable[[], Any]): Returns the `PiVideoFrame` currently written.
+        index_file (Optional[Union[str, Path]], optional): Path of the index.
+            Defaults to `name.keyframe_index(video_file)`.
+    """
+
+    def __init__(
+        self,
+        video_file: Union[str, Path],
+        frame: Callable[[], Any],
+        index_file: Optional[Union[str, Path]] = None,
+    ) -> None:
+        self.video_file = str(video_file)
+        self.index_file = (
+            name.keyframe_index(video_file) if index_file is None else str(index_file)
+        )
+        self._frame = frame
+        self._video = open(self.video_file, "wb")
+        self._index = open(self.index_file, "wb")
+        self._written = 0
+        self._header_offset: Optional[int] = None
+
+    def write(self, buf: bytes) -> int:
+        self._index_frame()
+        written = self._video.write(buf)
+        self._written += written
+        return written
+
+    def flush(self) -> None:
+        self._video.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        self._video.close()
+        self._index.close()
+
+    def _index_frame(self) -> None:
+        try:
+            frame = self._frame()
+        except Exception:
+            return
+        if frame is None:
+            return
+        if frame.frame_type == _SPS_HEADER:
+            if self._header_offset is None:
+                self._header_offset = self._written
+        elif frame.frame_type == _KEY_FRAME:
+            if frame.complete and self._header_offset is not None:
+                if frame.timestamp is not None:
+                    self._index.write(_ENTRY.pack(self._header_offset, frame.timestamp))
+                self._header_offset = None
+        else:
+            self._header_offset = None
+
+
+def read_index(index_file: Union[str, Path]) -> list[Keyframe]:
+    """Read a keyframe index.
+
+    An incomplete last entry, e.g. after a power loss, is ignored.
+    """
+    data = Path(index_file).read_bytes()
+    usable = len(data) - len(data) % _ENTRY.size
+    if usable != len(data):
+        log.write(f"Ignoring incomplete entry in '{index_file}'", log.LogLevel.DEBUG)
+    return [Keyframe(*entry) for entry in _ENTRY.iter_unpack(data[:usable])]
+
+
+def truncate_index(index_file: Union[str, Path], size: int) -> None:
+    """Drop the entries of keyframes at or beyond the end of a truncated video.
+
+    Args:
+        index_file (Union[str, Path]): Path of the index.
+        size (int): New size of the video in bytes.
+    """
+    index_file = Path(index_file)
+    if not index_file.exists():
+        return
+    keyframes = [
+        keyframe for keyframe in read_index(index_file) if keyframe.offset < size
+    ]
+    index_file.write_bytes(
+        b"".join(
+            _ENTRY.pack(keyframe.offset, keyframe.timestamp) for keyframe in keyframes
+        )
+    )
+
+
+def keyframe_before(keyframes: list[Keyframe], timestamp: int) -> Optional[Keyframe]:
+    """The last keyframe at or before `timestamp`.
+
+    Args:
+        keyframes (list[Keyframe]): The sorted index of a video.
+        timestamp (int): Timestamp in microseconds.
+
+    Returns:
+        Optional[Keyframe]: The keyframe or `None` if all keyframes are later.
+    """
+    position = bisect.bisect_right(
+        [keyframe.timestamp for keyframe in keyframes], timestamp
+    )
+    return keyframes[position - 1] if position else None
@@ -0,0 +1,143 @@
+"""OTCamera helper to stream a live preview while aiming the camera.
+
+The camera encodes a low resolution MJPEG stream on a separate splitter port. The
+encoder only runs while at least one client watches the stream, so there is no
+encoding cost otherwise. Each JPEG frame is passed to all subscribed clients, which
+are responsible for dropping stale frames if they cannot keep up.
+
+The encoder is started and stopped by the record loop via the event dispatcher, so
+the camera is never controlled concurrently with splitting or restarting the
+recording. Subscribing and unsubscribing never block.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from typing import Callable, Optional
+
+from OTCamera.helpers import events, log, metrics
+
+_JPEG_END = b"\xff\xd9"
+
+FrameCallback = Callable[[bytes], None]
+"""Called with each JPEG frame. Must not block the encoder."""
+
+EVENT_SOURCE = "live_preview"
+"""Event source of starting and stopping the encoder."""
+
+_CLIENTS = metrics.REGISTRY.gauge(
+    "otcamera_live_preview_clients", "Number of clients watching the live preview."
+)
+
+
+class MjpegOutput:
+    """Splits the MJPEG stream written by picamera into JPEG frames.
+
+    A frame may be written in several buffers. It is complete once a buffer ends
+    with the JPEG end of image marker, which cannot occur inside the image data.
+
+    Args:
+        publish (FrameCallback): Called with each complete frame.
+    """
+
+    def __init__(self, publish: FrameCallback) -> None:
+        self._publish = publish
+        self._buffers: list[bytes] = []
+
+    def write(self, buf: bytes) -> int:
+        self._buffers.append(bytes(buf))
+        if buf[-2:] == _JPEG_END:
+            frame = b"".join(self._buffers)
+            self._buffers.clear()
+            self._publish(frame)
+        return len(buf)
+
+    def flush(self) -> None:
+        self._buffers.clear()
+
+
+class LivePreview:
+    """Runs the live preview encoder while at least one client is subscribed.
+
+    Args:
+        start (Callable[[MjpegOutput], None]): Starts the encoder writing to the
+            output.
+        stop (Callable[[], None]): Stops the encoder.
+        dispatcher (Optional[events.EventDispatcher], optional): Runs `start` and
+            `stop`. Defaults to the dispatcher of the record loop.
+    """
+
+    def __init__(
+        self,
+        start: Callable[[MjpegOutput], None],
+        stop: Callable[[], None],
+        dispatcher: Optional[events.EventDispatcher] = None,
+    ) -> None:
+        self._start = start
+        self._stop = stop
+        self._dispatcher = events.dispatcher if dispatcher is None else dispatcher
+        self._dispatcher.register(EVENT_SOURCE)
+        self._subscribers: list[FrameCallback] = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._output = MjpegOutput(self._publish)
+
+    @property
+    def active(self) -> bool:
+        """Whether the encoder is running."""
+        return self._running
+
+    def subscribe(self, callback: FrameCallback) -> None:
+        """Pass each frame to `callback`, starting the encoder for the first client."""
+        with self._lock:
+            self._subscribers.append(callback)
+            _CLIENTS.set(len(self._subscribers))
+        self._dispatcher.post(EVENT_SOURCE, self._apply)
+
+    def unsubscribe(self, callback: FrameCallback) -> None:
+        """Stop passing frames to `callback`, stopping the encoder after the last."""
+        with self._lock:
+            if callback not in self._subscribers:
+                return
+            self._subscribers.remove(callback)
+            _CLIENTS.set(len(self._subscribers))
+        self._dispatcher.post(EVENT_SOURCE, self._apply)
+
+    def _apply(self) -> None:
+        """Start or stop the encoder depending on whether clients are subscribed."""
+        with self._lock:
+            wanted = bool(self._subscribers)
+        if wanted == self._running:
+            return
+        try:
+            if wanted:
+                self._start(self._output)
+            else:
+                self._stop()
+        except Exception as cause:
+            action = "start" if wanted else "stop"
+            log.write(f"Unable to {action} live preview: {cause}", log.LogLevel.WARNING)
+            return
+        self._running = wanted
+        log.write(
+            f"Live preview {'started' if wanted else 'stopped'}", log.LogLevel.DEBUG
+        )
+
+    def _publish(self, frame: bytes) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(frame)
@@ -3,6 +3,8 @@
 Open a logfile, based on the name.log and write a message to it. Also prints all
 messages.
 
+Use log.init() once the user config has been parsed to open the logfile and write a
+breakline. The logfile is opened on the first message otherwise.
 Use log.write(msg) to write any message, log.breakline() to write a single line of #
 or log.otc() to log and print a OpenTrafficCam logo.
 
@@ -25,16 +27,9 @@ or log.otc() to log and print a OpenTrafficCam logo.
 import json
 import traceback
 from enum import Enum
+from typing import Optional, TextIO
 
-import requests
-from art import text2art
-
-from OTCamera.config import (
-    DEBUG_MODE_ON,
-    MS_TEAMS_MAX_FAILED_SEND_ATTEMPTS,
-    MS_TEAMS_WEBHOOK_URL,
-    USE_MS_TEAMS_WEBHOOK,
-)
+from OTCamera import config
 from OTCamera.helpers import name
 
 
@@ -62,22 +57,23 @@ def write(msg: str, level: LogLevel = LogLevel.INFO, reboot: bool = True):
     global disable_ms_teams_on_failed_attempts
 
     if level == LogLevel.DEBUG:
-        if not DEBUG_MODE_ON:
+        if not config.settings.debug_mode.enable:
             return
     current_time = name._current_dt()
     msg = f"{current_time} {level}: {msg}"
     _write(msg, reboot)
 
-    if failed_attempts >= MS_TEAMS_MAX_FAILED_SEND_ATTEMPTS:
+    if failed_attempts >= config.MS_TEAMS_MAX_FAILED_SEND_ATTEMPTS:
         disable_ms_teams_on_failed_attempts = True
 
+    ms_teams_config = config.settings.msteams
     if (
-        USE_MS_TEAMS_WEBHOOK
+        ms_teams_config.enable
         and level != LogLevel.DEBUG
-        and MS_TEAMS_WEBHOOK_URL
+        and ms_teams_config.url
         and not disable_ms_teams_on_failed_attempts
     ):
-        _send_msg_to_ms_teams(msg, MS_TEAMS_WEBHOOK_URL, current_time)
+        _send_msg_to_ms_teams(msg, ms_teams_config.url, current_time)
     if level == LogLevel.EXCEPTION:
         _write(_get_stack_trace(), reboot)
 
@@ -89,6 +85,8 @@ def _send_msg_to_ms_teams(msg: str, teams_url: str, time: str) -> None:
 
     global failed_attempts
 
+    import requests
+
     try:
         response = requests.post(
             teams_url, headers=headers, data=json.dumps(payload), timeout=10
@@ -134,20 +132,58 @@ def breakline(reboot=True):
 
 def otc():
     """Generate a ASCII logo and write it to the logfile."""
+    from art import text2art
+
     otclogo = text2art("OpenTrafficCam")
     _write(otclogo)
 
 
+def init() -> None:
+    """Open the logfile and write a breakline to it.
+
+    The logfile is located in the configured video directory. Thus, `init` must be
+    called after the user config has been parsed.
+    """
+    global _closed
+    _closed = False
+    _get_logfile()
+    breakline()
+
+
 def _write(msg, reboot=True):
     print(msg)
+    logf = _get_logfile()
+    if logf is None:
+        return
     logf.write(msg + "\n")
     logf.flush()
 
 
+def _get_logfile() -> Optional[TextIO]:
+    """Returns the logfile and opens it if it is not open yet.
+
+    Returns `None` once the logfile has been closed by `closefile`, so that messages
+    logged during shutdown are only printed and do not create a new logfile.
+    """
+    global _logf
+    if _closed:
+        return None
+    if _logf is None or _logf.closed:
+        _check_log_path()
+        _logf = open(name.log(), "a")
+    return _logf
+
+
 def closefile():
-    """Flush and close the logfile."""
-    logf.flush()
-    logf.close()
+    """Flush and close the logfile.
+
+    Subsequent messages are only printed to stdout until `init` is called again.
+    """
+    global _closed
+    _closed = True
+    if _logf is not None and not _logf.closed:
+        _logf.flush()
+        _logf.close()
 
 
 def _check_log_path():
@@ -157,9 +193,7 @@ def _check_log_path():
         logpath.mkdir(parents=True)
 
 
-_check_log_path()
-logf = open(name.log(), "a")
-otc()
-breakline()
+_logf: Optional[TextIO] = None
+_closed: bool = False
 failed_attempts: int = 0
 disable_ms_teams_on_failed_attempts: bool = False
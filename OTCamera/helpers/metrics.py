@@ -0,0 +1,352 @@
+"""OTCamera helper to collect performance metrics.
+
+Provides counters, gauges and histograms with fixed buckets. All metrics are
+registered in `REGISTRY` and can be exported in the Prometheus text format, either to a
+text file read by the node exporter's textfile collector or on a local HTTP endpoint.
+
+Use the `timed` decorator to measure the duration of a function:
+
+    @metrics.timed("otcamera_split_seconds", "Duration of splitting the recording.")
+    def _split(self):
+        ...
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import functools
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Optional, Sequence, TypeVar, Union
+
+from OTCamera.helpers import log
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+"""Upper bounds in seconds of the histogram buckets used for durations."""
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""Content type of the Prometheus text format."""
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """A value that only increases, e.g. the number of failed uploads.
+
+    Args:
+        name (str): Name of the metric.
+        help (str): Description of the metric.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the counter by `amount`."""
+        with self._lock:
+            self._value += amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name} {_format_value(self._value)}"]
+
+
+class Gauge(Counter):
+    """A value that can go up and down, e.g. the free disk space.
+
+    Args:
+        name (str): Name of the metric.
+        help (str): Description of the metric.
+    """
+
+    type = "gauge"
+
+    def set(self, value: float) -> None:
+        """Set the gauge to `value`."""
+        self._value = value
+
+    def dec(self, amount: float = 1) -> None:
+        """Decrease the gauge by `amount`."""
+        self.inc(-amount)
+
+
+class Histogram:
+    """Counts observations in buckets with fixed upper bounds.
+
+    The bucket counts are stored in a preallocated array. Thus, observing a value
+    does not allocate memory.
+
+    Args:
+        name (str): Name of the metric.
+        help (str): Description of the metric.
+        buckets (Sequence[float], optional): Sorted upper bounds of the buckets.
+            Defaults to `DEFAULT_BUCKETS`.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # The last bucket counts the observations above the largest upper bound.
+        self._counts = array("Q", bytes(8 * (len(self.buckets) + 1)))
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def observe(self, value: float) -> None:
+        """Count `value` in its bucket."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            counts = self._counts.tolist()
+            total = self._sum
+        samples = []
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            samples.append(
+                f'{self.name}_bucket{{le="{_format_value(upper_bound)}"}} {cumulative}'
+            )
+        samples.append(f"{self.name}_sum {_format_value(total)}")
+        samples.append(f"{self.name}_count {cumulative}")
+        return samples
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class Registry:
+    """Holds all metrics by their name."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        """Get the counter `name` and create it if it does not exist yet."""
+        return self._get_or_create(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        """Get the gauge `name` and create it if it does not exist yet."""
+        return self._get_or_create(Gauge, name, help)
+
+    def histogram(
+        self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Get the histogram `name` and create it if it does not exist yet."""
+        return self._get_or_create(Histogram, name, help, buckets)
+
+    def _get_or_create(self, cls: type, name: str, *args) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric '{name}' is already a {metric.type}")
+            return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Union[str, Path]) -> None:
+        """Write all metrics to a text file.
+
+        The file is replaced atomically, so that readers never see a partial file.
+
+        Args:
+            path (Union[str, Path]): Path to the text file.
+        """
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as textfile:
+            textfile.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
+"""The registry used by OTCamera."""
+
+
+def timed(name: str, help: str = "") -> Callable[[_F], _F]:
+    """Decorator observing the duration of each call in the histogram `name`.
+
+    Args:
+        name (str): Name of the histogram in `REGISTRY`.
+        help (str, optional): Description of the histogram. Defaults to "".
+    """
+    histogram = REGISTRY.histogram(name, help)
+
+    def decorator(func: _F) -> _F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class MetricsExporter:
+    """Exports the metrics of a registry.
+
+    Args:
+        textfile (Optional[Union[str, Path]], optional): Text file to write the
+            metrics to every `interval` seconds. Defaults to None.
+        host (str, optional): Address the HTTP endpoint binds to.
+            Defaults to "127.0.0.1".
+        port (Optional[int], optional): Port of the HTTP endpoint serving the metrics
+            at `/metrics`. Defaults to None.
+        interval (float, optional): Seconds between two writes of the text file.
+            Defaults to 15.
+        registry (Registry, optional): The registry to export.
+            Defaults to `REGISTRY`.
+    """
+
+    def __init__(
+        self,
+        textfile: Optional[Union[str, Path]] = None,
+        host: str = "127.0.0.1",
+        port: Optional[int] = None,
+        interval: float = 15,
+        registry: Registry = REGISTRY,
+    ) -> None:
+        self.textfile = None if textfile is None else Path(textfile).expanduser()
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.registry = registry
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start exporting the metrics in background threads."""
+        if self.textfile is not None:
+            threading.Thread(
+                target=self._write_periodically, name="metrics-textfile", daemon=True
+            ).start()
+        if self.port is not None:
+            self._server = ThreadingHTTPServer(
+                (self.host, self.port), _handler_for(self.registry)
+            )
+            self._server.daemon_threads = True
+            threading.Thread(
+                target=self._server.serve_forever, name="metrics-http", daemon=True
+            ).start()
+            log.write(
+                f"Serving metrics on http://{self.host}:{self.server_port}/metrics",
+                log.LogLevel.DEBUG,
+            )
+
+    @property
+    def server_port(self) -> Optional[int]:
+        """The port the HTTP endpoint is bound to."""
+        if self._server is None:
+            return None
+        return self._server.server_address[1]
+
+    def stop(self) -> None:
+        """Stop exporting the metrics."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _write_periodically(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.write_textfile(self.textfile)
+            except OSError as cause:
+                log.write(f"Unable to write metrics: {cause}", log.LogLevel.WARNING)
+
+
+def _handler_for(registry: Registry) -> type:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return MetricsHandler
@@ -26,6 +26,11 @@ from typing import Union
 
 from OTCamera import config
 
+PROXY_SUFFIX = "_proxy"
+"""Appended to the name of a video to name its low resolution proxy."""
+KEYFRAME_INDEX_SUFFIX = ".idx"
+"""Suffix of the keyframe index of a video."""
+
 
 def video() -> str:
     """Filename of Video.
@@ -36,10 +41,39 @@ def video() -> str:
     Returns:
         str: filename for video
     """
-    filename = (
-        Path(config.VIDEO_DIR) / f"{config.PREFIX}_FR{config.FPS}_{_current_dt()}.h264"
+    return str(_filepath("h264"))
+
+
+def proxy(video_file: Union[str, Path]) -> str:
+    """Filename of the low resolution proxy recorded alongside a video.
+
+    Args:
+        video_file (Union[str, Path]): Path of the full resolution video.
+
+    Returns:
+        str: path of the proxy next to the video
+    """
+    video_file = Path(video_file)
+    return str(
+        video_file.with_name(f"{video_file.stem}{PROXY_SUFFIX}{video_file.suffix}")
     )
-    return str(filename.expanduser().resolve())
+
+
+def keyframe_index(video_file: Union[str, Path]) -> str:
+    """Filename of the keyframe index of a video.
+
+    Args:
+        video_file (Union[str, Path]): Path of the video.
+
+    Returns:
+        str: path of the index next to the video
+    """
+    return str(Path(video_file).with_suffix(KEYFRAME_INDEX_SUFFIX))
+
+
+def is_proxy(video_file: Union[str, Path]) -> bool:
+    """Whether a video file is a low resolution proxy."""
+    return Path(video_file).stem.endswith(PROXY_SUFFIX)
 
 
 def log() -> Path:
@@ -50,10 +84,19 @@ def log() -> Path:
     Returns:
         Path: filename for log
     """
-    filename = (
-        Path(config.VIDEO_DIR) / f"{config.PREFIX}_FR{config.FPS}_{_current_dt()}.log"
+    return _filepath("log")
+
+
+def _filepath(suffix: str) -> Path:
+    """Path of a new file in the video directory.
+
+    The video directory is already resolved when the config is loaded.
+    """
+    settings = config.settings
+    return (
+        Path(settings.video.dir)
+        / f"{config.PREFIX}_FR{settings.camera.fps}_{_current_dt()}.{suffix}"
     )
-    return Path(filename).expanduser().resolve()
 
 
 def annotate() -> str:
@@ -88,8 +131,7 @@ def preview() -> str:
     Returns:
         str: filename for preview
     """
-    filename = config.PREVIEW_PATH
-    return str(Path(filename).expanduser().resolve())
+    return config.settings.preview.path
 
 
 def get_datetime_from_filename(filename: Union[str, Path]) -> dt:
@@ -0,0 +1,114 @@
+"""OTCamera helper to remember which videos have been offloaded.
+
+A video is offloaded once it has been uploaded to the server or copied to a USB flash
+drive. Offloaded videos are deleted first when the SD card runs full.
+
+The state is kept in a JSON file in the video directory. It is replaced atomically
+after each change.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from OTCamera import config
+from OTCamera.helpers import log
+
+STATE_FILENAME = ".offload_state.json"
+"""Name of the offload state file in the video directory."""
+UPLOAD = "upload"
+"""Destination of videos uploaded to the server."""
+USB = "usb"
+"""Destination of videos copied to a USB flash drive."""
+
+
+class OffloadState:
+    """Records the destinations each video has been offloaded to.
+
+    Videos are identified by their filename.
+
+    Args:
+        state_file (Optional[Union[str, Path]], optional): Path to the state file.
+            Defaults to `STATE_FILENAME` in `config.VIDEO_DIR` at the time of the first
+            access.
+    """
+
+    def __init__(self, state_file: Optional[Union[str, Path]] = None) -> None:
+        self._state_file = None if state_file is None else Path(state_file)
+        self._destinations: Optional[dict[str, list[str]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state_file(self) -> Path:
+        if self._state_file is None:
+            return Path(config.VIDEO_DIR, STATE_FILENAME)
+        return self._state_file
+
+    def mark(self, video_file: Union[str, Path], destination: str) -> None:
+        """Record that a video has been offloaded to `destination`."""
+        filename = Path(video_file).name
+        with self._lock:
+            destinations = self._load().setdefault(filename, [])
+            if destination not in destinations:
+                destinations.append(destination)
+                self._write()
+
+    def destinations(self, video_file: Union[str, Path]) -> set[str]:
+        """The destinations a video has been offloaded to."""
+        with self._lock:
+            return set(self._load().get(Path(video_file).name, []))
+
+    def is_offloaded(self, video_file: Union[str, Path]) -> bool:
+        """Whether a video has been offloaded to any destination."""
+        return bool(self.destinations(video_file))
+
+    def forget(self, video_file: Union[str, Path]) -> None:
+        """Remove a deleted video from the state."""
+        with self._lock:
+            if self._load().pop(Path(video_file).name, None) is not None:
+                self._write()
+
+    def _load(self) -> dict[str, list[str]]:
+        if self._destinations is None:
+            try:
+                with open(self.state_file, "r") as state:
+                    self._destinations = json.load(state)
+            except FileNotFoundError:
+                self._destinations = {}
+            except (OSError, ValueError) as cause:
+                log.write(
+                    f"Unable to read offload state '{self.state_file}': {cause}",
+                    log.LogLevel.WARNING,
+                )
+                self._destinations = {}
+        return self._destinations
+
+    def _write(self) -> None:
+        tmp_file = self.state_file.with_name(self.state_file.name + ".tmp")
+        try:
+            with open(tmp_file, "w") as state:
+                json.dump(self._destinations, state)
+            os.replace(tmp_file, self.state_file)
+        except OSError as cause:
+            log.write(f"Unable to write offload state: {cause}", log.LogLevel.ERROR)
+
+
+offload_state = OffloadState()
+"""The offload state of the videos recorded by OTCamera."""
@@ -0,0 +1,200 @@
+"""OTCamera helper to run privileged actions.
+
+Instead of spawning a shell running `sudo` for each action, a single helper process is
+started with `sudo` on first use. It reads one request per line from its standard
+input, runs the requested action and answers with its return code.
+
+The helper only runs the actions defined in `ACTIONS`. The arguments are validated and
+passed without a shell.
+
+This module must only import the standard library at module level, because the helper
+process runs it as a script outside of the OTCamera package.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import re
+import subprocess
+import sys
+import threading
+from typing import IO, Callable, Optional, Sequence
+
+_SERVICE = re.compile(r"[\w@.-]+\.service")
+
+
+def _service(arg: str) -> bool:
+    return bool(_SERVICE.fullmatch(arg))
+
+
+def _absolute_path(arg: str) -> bool:
+    return arg.startswith("/") and "\0" not in arg
+
+
+ACTIONS: dict[str, tuple[list[str], list[Callable[[str], bool]]]] = {
+    "start_service": (["systemctl", "start"], [_service]),
+    "stop_service": (["systemctl", "stop"], [_service]),
+    "mount": (["mount"], [_absolute_path]),
+    "umount": (["umount"], [_absolute_path]),
+    "lazy_umount": (["umount", "--lazy"], [_absolute_path]),
+    "shutdown": (["shutdown", "-h", "now"], []),
+    "reboot": (["reboot"], []),
+}
+"""Command and argument validators of each action."""
+
+HELPER_COMMAND = ["sudo", "-n", sys.executable, __file__, "--serve"]
+"""Command starting the helper process."""
+
+
+class InvalidActionError(ValueError):
+    pass
+
+
+def build_command(action: str, args: Sequence[str]) -> list[str]:
+    """Build the command line of an action.
+
+    Args:
+        action (str): One of `ACTIONS`.
+        args (Sequence[str]): Arguments of the action.
+
+    Raises:
+        InvalidActionError: If the action is unknown or an argument is invalid.
+
+    Returns:
+        list[str]: The command line.
+    """
+    if action not in ACTIONS:
+        raise InvalidActionError(f"Unknown action '{action}'")
+    command, validators = ACTIONS[action]
+    if len(args) != len(validators):
+        raise InvalidActionError(
+            f"Action '{action}' expects {len(validators)} arguments, got {len(args)}"
+        )
+    for arg, valid in zip(args, validators):
+        if not valid(arg):
+            raise InvalidActionError(f"Invalid argument '{arg}' for '{action}'")
+    return command + list(args)
+
+
+def serve(requests: IO[str], responses: IO[str]) -> None:
+    """Run the actions requested until `requests` is closed.
+
+    Args:
+        requests (IO[str]): One JSON object per line with the keys "action" and
+            "args".
+        responses (IO[str]): One JSON object per line with the key "returncode".
+    """
+    for line in requests:
+        try:
+            request = json.loads(line)
+            command = build_command(request["action"], request.get("args", []))
+            returncode = subprocess.call(
+                command, stdin=subprocess.DEVNULL, stdout=sys.stderr
+            )
+        except (ValueError, KeyError, TypeError, OSError) as cause:
+            print(f"Rejected request {line.strip()!r}: {cause}", file=sys.stderr)
+            returncode = -1
+        responses.write(json.dumps({"returncode": returncode}) + "\n")
+        responses.flush()
+
+
+class PrivilegedHelper:
+    """Client of the helper process running privileged actions.
+
+    The helper process is started on first use and restarted if it died.
+
+    Args:
+        command (Sequence[str], optional): Command starting the helper process.
+            Defaults to `HELPER_COMMAND`.
+    """
+
+    def __init__(self, command: Sequence[str] = HELPER_COMMAND) -> None:
+        self.command = list(command)
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def run(self, action: str, *args: str) -> int:
+        """Run a privileged action.
+
+        Args:
+            action (str): One of `ACTIONS`.
+            *args (str): Arguments of the action.
+
+        Raises:
+            InvalidActionError: If the action is unknown or an argument is invalid.
+
+        Returns:
+            int: The return code of the action. -1 if the helper is not available.
+        """
+        from OTCamera.helpers import log
+
+        build_command(action, args)
+        request = json.dumps({"action": action, "args": list(args)}) + "\n"
+        with self._lock:
+            try:
+                process = self._start()
+                process.stdin.write(request)
+                process.stdin.flush()
+                response = process.stdout.readline()
+                if not response:
+                    raise OSError("Privileged helper exited")
+                return json.loads(response)["returncode"]
+            except (OSError, ValueError) as cause:
+                log.write(
+                    f"Unable to run privileged action '{action}': {cause}",
+                    log.LogLevel.ERROR,
+                )
+                self._close()
+                return -1
+
+    def close(self) -> None:
+        """Stop the helper process."""
+        with self._lock:
+            self._close()
+
+    def _start(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+        return self._process
+
+    def _close(self) -> None:
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+        self._process = None
+
+
+helper = PrivilegedHelper()
+"""The helper used by OTCamera."""
+
+
+def run(action: str, *args: str) -> int:
+    """Run a privileged action using `helper`. See `PrivilegedHelper.run`."""
+    return helper.run(action, *args)
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["--serve"]:
+    serve(sys.stdin, sys.stdout)
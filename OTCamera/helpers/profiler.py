@@ -0,0 +1,196 @@
+"""OTCamera helper to profile OTCamera in the field.
+
+A background thread periodically samples the stacks of all other threads using
+`sys._current_frames()`. Identical stacks are counted and written to a file in the
+folded stack format, which can be turned into a flame graph, e.g. with
+`flamegraph.pl` or speedscope.
+
+One file is written per day to the video directory. Samples of a day are merged with
+the file written before a restart. Only the profiles of the last `KEEP_DAYS` days are
+kept, as the video directory is not cleaned up otherwise.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Callable, Optional, Union
+
+from OTCamera.helpers import log
+
+SAMPLE_INTERVAL = 0.05
+"""Default number of seconds between two samples."""
+FLUSH_INTERVAL = 60.0
+"""Number of seconds between two writes of the profile."""
+MAX_DEPTH = 64
+"""Maximum number of frames per stack. Deeper frames are dropped."""
+KEEP_DAYS = 7
+"""Default number of daily profiles to keep."""
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads and counts them.
+
+    Args:
+        output_dir (Union[str, Path]): Directory to write the profiles to.
+        prefix (str): Prefix of the profile file names.
+        interval (float, optional): Seconds between two samples.
+            Defaults to `SAMPLE_INTERVAL`.
+        flush_interval (float, optional): Seconds between two writes of the profile.
+            Defaults to `FLUSH_INTERVAL`.
+        today (Callable[[], date], optional): Returns the current date.
+            Defaults to `date.today`.
+        keep_days (int, optional): Number of daily profiles to keep, including the
+            current day. Defaults to `KEEP_DAYS`.
+    """
+
+    def __init__(
+        self,
+        output_dir: Union[str, Path],
+        prefix: str,
+        interval: float = SAMPLE_INTERVAL,
+        flush_interval: float = FLUSH_INTERVAL,
+        today: Callable[[], date] = date.today,
+        keep_days: int = KEEP_DAYS,
+    ) -> None:
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self._today = today
+        self.keep_days = keep_days
+        self._day = today()
+        self._counts: Counter[str] = self._read(self.profile_file(self._day))
+        self._prune()
+        self._stack_names: dict[tuple[str, tuple[CodeType, ...]], str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def profile_file(self, day: date) -> Path:
+        """Path to the profile of `day`."""
+        return self.output_dir / f"{self.prefix}_profile_{day.isoformat()}.folded"
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        log.write(
+            f"Profiling every {self.interval} s to '{self.output_dir}'",
+            log.LogLevel.DEBUG,
+        )
+
+    def stop(self) -> None:
+        """Stop sampling and write the profile."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        self.flush()
+
+    def sample(self) -> None:
+        """Take one sample of the stacks of all threads except the profiler."""
+        own_ident = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            thread_name = thread_names.get(ident, str(ident))
+            self._counts[self._stack_name(thread_name, frame)] += 1
+
+    def flush(self) -> None:
+        """Write the profile of the current day.
+
+        Starts a new profile if the day changed since the last flush.
+        """
+        try:
+            self._write(self.profile_file(self._day))
+        except OSError as cause:
+            log.write(f"Unable to write profile: {cause}", log.LogLevel.WARNING)
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._counts = self._read(self.profile_file(today))
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete the profiles older than `keep_days` days."""
+        oldest_kept = self.profile_file(self._day - timedelta(days=self.keep_days - 1))
+        for profile_file in self.output_dir.glob(f"{self.prefix}_profile_*.folded"):
+            # ISO dates in the names sort chronologically
+            if profile_file.name < oldest_kept.name:
+                try:
+                    profile_file.unlink()
+                except OSError as cause:
+                    log.write(
+                        f"Unable to delete profile '{profile_file}': {cause}",
+                        log.LogLevel.WARNING,
+                    )
+
+    def _stack_name(self, thread_name: str, frame: Optional[FrameType]) -> str:
+        codes = []
+        while frame is not None and len(codes) < MAX_DEPTH:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        key = (thread_name, tuple(codes))
+        name = self._stack_names.get(key)
+        if name is None:
+            frames = [
+                f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                for code in reversed(codes)
+            ]
+            name = ";".join([thread_name] + frames)
+            self._stack_names[key] = name
+        return name
+
+    def _write(self, profile_file: Path) -> None:
+        if not self._counts:
+            return
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = profile_file.with_name(profile_file.name + ".tmp")
+        with open(tmp_file, "w") as profile:
+            for stack, count in self._counts.items():
+                profile.write(f"{stack} {count}\n")
+        os.replace(tmp_file, profile_file)
+
+    @staticmethod
+    def _read(profile_file: Path) -> Counter[str]:
+        counts: Counter[str] = Counter()
+        try:
+            with open(profile_file, "r") as profile:
+                for line in profile:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    if stack and count.isdigit():
+                        counts[stack] += int(count)
+        except FileNotFoundError:
+            pass
+        return counts
+
+    def _run(self) -> None:
+        samples_per_flush = max(int(self.flush_interval / self.interval), 1)
+        num_samples = 0
+        while not self._stop.wait(self.interval):
+            self.sample()
+            num_samples += 1
+            if num_samples >= samples_per_flush:
+                self.flush()
+                num_samples = 0
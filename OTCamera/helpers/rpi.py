@@ -19,15 +19,23 @@ Contains all functions to control the Raspberry Pi itself.
 # program.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from subprocess import call
-
 from OTCamera import config, status
 from OTCamera.hardware import led
 from OTCamera.hardware.camera import Camera
-from OTCamera.helpers import log
+from OTCamera.helpers import log, privileged
+from OTCamera.helpers.sysprobe import probe
 
 log.write("imported rpi", level=log.LogLevel.DEBUG)
-camera = Camera()
+
+RELAY_SERVICE = "sshrelay.service"
+"""The systemd service connecting to the SSH relay server."""
+
+
+def _stop_camera() -> None:
+    """Stop the recording if the camera has been initialised."""
+    camera = Camera.instance()
+    if camera is not None:
+        camera.stop_recording()
 
 
 def shutdown():
@@ -39,17 +47,17 @@ def shutdown():
     Writes messages to the logfile.
 
     """
-    status.shutdownactive = True
+    status.store.update(shutdownactive=True)
     led.power_on()
     if config.USE_RELAY:
-        call("sudo systemctl stop sshrelay.service", shell=True)
+        privileged.run("stop_service", RELAY_SERVICE)
         log.write("Stopped SSH relay server connection")
-    camera.stop_recording()
+    _stop_camera()
     log.breakline()
     log.write("Shutdown")
     log.breakline()
     log.closefile()
-    call("sudo shutdown -h now", shell=True)
+    privileged.run("shutdown")
 
 
 def reboot():
@@ -59,8 +67,7 @@ def reboot():
     Tries to close the camera object and writes to logfile.
 
     """
-    status.shutdownactive = True
-    status.noblink = True
+    status.store.update(shutdownactive=True, noblink=True)
     led.power.blink(
         on_time=0.1,
         off_time=0.1,
@@ -72,21 +79,21 @@ def reboot():
     log.write("Reboot")
     log.breakline()
     log.closefile()
-    camera.stop_recording()
+    _stop_camera()
     if not config.DEBUG_MODE_ON:
-        call("sudo reboot", shell=True)
+        privileged.run("reboot")
 
 
 def wifi_switch_on():
     """Turn on Wi-Fi"""
-    if not status.wifi_on:
+    if not status.store.state.wifi_on:
         if not config.DEBUG_MODE_ON:
-            call("rfkill unblock wlan", shell=True)
+            probe.set_radio_blocked("wlan", False)
 
         if config.USE_RELAY:
-            call("sudo systemctl start sshrelay.service", shell=True)
+            privileged.run("start_service", RELAY_SERVICE)
             log.write("Started SSH relay server connection")
-        status.wifi_on = True
+        status.store.update(wifi_on=True)
         log.write("Wi-Fi on")
 
     led.wifi_on()
@@ -94,13 +101,13 @@ def wifi_switch_on():
 
 def wifi_switch_off():
     """Turn off Wi-Fi"""
-    if status.wifi_on:
+    if status.store.state.wifi_on:
         if not config.DEBUG_MODE_ON:
-            call("rfkill block wlan", shell=True)
+            probe.set_radio_blocked("wlan", True)
         if config.USE_RELAY:
-            call("sudo systemctl stop sshrelay.service", shell=True)
+            privileged.run("stop_service", RELAY_SERVICE)
             log.write("Stopped SSH relay server connection")
-        status.wifi_on = False
+        status.store.update(wifi_on=False)
         log.write("Wi-Fi off")
 
     led.wifi_off()
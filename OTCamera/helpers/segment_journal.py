@@ -0,0 +1,237 @@
+"""OTCamera helper to recover the video segment interrupted by a crash.
+
+While recording, the segment currently written is recorded in a journal file in the
+video directory. If OTCamera is stopped regularly, the journal is removed. If the
+journal still exists on start up, OTCamera crashed while writing the segment.
+
+The interrupted segment is an H.264 byte stream that ends somewhere in the middle of a
+NAL unit. `recover` trims it to the last complete NAL unit so that it can be used like
+any other segment.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime as dt
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from OTCamera.helpers import log, name
+from OTCamera.helpers.keyframe_index import truncate_index
+
+JOURNAL_FILENAME = ".segment_journal.json"
+"""Name of the journal file in the video directory."""
+UPDATE_INTERVAL = 10.0
+"""Minimum number of seconds between two updates of the byte offset."""
+
+_NAL_START_CODE = b"\x00\x00\x01"
+_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class SegmentEntry:
+    """The segment recorded in the journal.
+
+    Attributes:
+        path (str): Path to the video file of the segment.
+        start_time (str): Start of the segment in ISO format.
+        offset (int): Number of bytes written to the segment at the last update.
+    """
+
+    path: str
+    start_time: str
+    offset: int = 0
+
+
+class SegmentJournal:
+    """Records the segment currently written to disk.
+
+    The journal file is replaced atomically. Thus, it either contains the previous or
+    the current state, even if OTCamera crashes while writing it.
+
+    Args:
+        journal_file (Union[str, Path]): Path to the journal file.
+        update_interval (float, optional): Minimum number of seconds between two
+            updates of the byte offset. Defaults to `UPDATE_INTERVAL`.
+        clock (Callable[[], float], optional): Clock used to throttle updates.
+            Defaults to `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        journal_file: Union[str, Path],
+        update_interval: float = UPDATE_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.journal_file = Path(journal_file)
+        self.update_interval = update_interval
+        self._clock = clock
+        self._entry: Optional[SegmentEntry] = None
+        self._last_update = 0.0
+
+    def read(self) -> Optional[SegmentEntry]:
+        """Read the segment recorded in the journal file.
+
+        Returns:
+            Optional[SegmentEntry]: The recorded segment or `None` if the journal does
+            not exist or is unreadable.
+        """
+        try:
+            with open(self.journal_file, "r") as journal:
+                return SegmentEntry(**json.load(journal))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as cause:
+            log.write(
+                f"Unable to read segment journal '{self.journal_file}': {cause}",
+                log.LogLevel.WARNING,
+            )
+            return None
+
+    def start(self, video_file: Union[str, Path]) -> None:
+        """Record that writing `video_file` started.
+
+        Args:
+            video_file (Union[str, Path]): The video file of the new segment.
+        """
+        entry = SegmentEntry(
+            path=str(video_file), start_time=dt.now().isoformat(timespec="seconds")
+        )
+        self._write(entry)
+
+    def update(self) -> None:
+        """Record the number of bytes written to the current segment.
+
+        Does nothing if the last update is less than `update_interval` seconds ago.
+        """
+        if self._entry is None:
+            return
+        if self._clock() - self._last_update < self.update_interval:
+            return
+        try:
+            offset = os.stat(self._entry.path).st_size
+        except FileNotFoundError:
+            return
+        if offset != self._entry.offset:
+            self._write(SegmentEntry(self._entry.path, self._entry.start_time, offset))
+
+    def clear(self) -> None:
+        """Remove the journal file after the segment has been completed."""
+        self._entry = None
+        try:
+            self.journal_file.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _write(self, entry: SegmentEntry) -> None:
+        tmp_file = self.journal_file.with_name(self.journal_file.name + ".tmp")
+        try:
+            with open(tmp_file, "w") as journal:
+                json.dump(asdict(entry), journal)
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(tmp_file, self.journal_file)
+        except OSError as cause:
+            log.write(f"Unable to write segment journal: {cause}", log.LogLevel.ERROR)
+            return
+        self._entry = entry
+        self._last_update = self._clock()
+
+
+def find_last_nal_start(video_file: Union[str, Path]) -> Optional[int]:
+    """Find the start of the last NAL unit in an H.264 byte stream.
+
+    The file is read backwards in chunks. Thus, only the tail of the file is read.
+
+    Args:
+        video_file (Union[str, Path]): Path to the H.264 byte stream.
+
+    Returns:
+        Optional[int]: Offset of the start code of the last NAL unit including a
+        leading zero byte of a four byte start code. `None` if there is no start code.
+    """
+    overlap = len(_NAL_START_CODE) - 1
+    with open(video_file, "rb") as stream:
+        end = stream.seek(0, os.SEEK_END)
+        while end > overlap:
+            start = max(end - _CHUNK_SIZE, 0)
+            stream.seek(start)
+            chunk = stream.read(end - start)
+            index = chunk.rfind(_NAL_START_CODE)
+            if index >= 0:
+                position = start + index
+                if position > 0 and _read_byte(stream, position - 1) == 0:
+                    position -= 1
+                return position
+            end = start + overlap
+            if start == 0:
+                break
+    return None
+
+
+def _read_byte(stream, position: int) -> int:
+    stream.seek(position)
+    return stream.read(1)[0]
+
+
+def recover(entry: SegmentEntry) -> Optional[Path]:
+    """Trim an interrupted segment to its last complete NAL unit.
+
+    The last NAL unit might be incomplete and is removed together with the keyframe
+    index entries pointing at or beyond it. A segment without any complete NAL unit
+    is deleted along with its index.
+
+    Args:
+        entry (SegmentEntry): The interrupted segment.
+
+    Returns:
+        Optional[Path]: The recovered video file or `None` if nothing is left.
+    """
+    video_file = Path(entry.path)
+    if not video_file.exists():
+        log.write(
+            f"Interrupted segment '{video_file}' does not exist", log.LogLevel.WARNING
+        )
+        return None
+
+    size = video_file.stat().st_size
+    if size < entry.offset:
+        log.write(
+            f"Interrupted segment '{video_file}' is smaller than journaled "
+            f"({size} < {entry.offset} bytes)",
+            log.LogLevel.WARNING,
+        )
+    last_nal_start = find_last_nal_start(video_file)
+    if not last_nal_start:
+        video_file.unlink()
+        Path(name.keyframe_index(video_file)).unlink(missing_ok=True)
+        log.write(
+            f"Deleted interrupted segment '{video_file}' without complete frames",
+            log.LogLevel.WARNING,
+        )
+        return None
+
+    os.truncate(video_file, last_nal_start)
+    truncate_index(name.keyframe_index(video_file), last_nal_start)
+    log.write(
+        f"Recovered interrupted segment '{video_file}' started at "
+        f"{entry.start_time}, trimmed {size - last_nal_start} bytes",
+        log.LogLevel.WARNING,
+    )
+    return video_file
@@ -0,0 +1,117 @@
+"""OTCamera helper to measure the start up time.
+
+Every restart of OTCamera, e.g. after a crash, delays the recording. To find out where
+the time is spent the start up is divided into phases. Call `timer.mark(phase)` at the
+end of each phase and `timer.log_summary()` once OTCamera is up and running.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+from typing import Callable, Optional
+
+
+def _process_start_time() -> Optional[float]:
+    """Returns the start of the current process as `time.monotonic` value.
+
+    Includes the time the interpreter needed to start. Only available on Linux.
+
+    Returns:
+        Optional[float]: The start time or `None` if it is not available.
+    """
+    try:
+        with open("/proc/self/stat") as stat_file:
+            # The process name might contain spaces and is enclosed in parentheses.
+            stat = stat_file.read().rsplit(")", 1)[1].split()
+        start_since_boot = int(stat[19]) / os.sysconf("SC_CLK_TCK")
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start_since_boot
+    except (OSError, IndexError, ValueError, AttributeError):
+        return None
+    return time.monotonic() - max(age, 0.0)
+
+
+class StartupTimer:
+    """Measures the time spent in each phase of the start up.
+
+    Args:
+        start (float, optional): The start of the first phase as `clock` value.
+            Defaults to the start of the current process if available, otherwise to
+            the time the timer is created.
+        clock (Callable[[], float], optional): The clock to use.
+            Defaults to `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        start: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        self._start = clock() if start is None else start
+        self._last = self._start
+        self._phases: list[tuple[str, float]] = []
+        self._summary_logged = False
+
+    @property
+    def phases(self) -> list[tuple[str, float]]:
+        """The finished phases and their duration in seconds."""
+        return list(self._phases)
+
+    @property
+    def total(self) -> float:
+        """Seconds from the start until the end of the last phase."""
+        return self._last - self._start
+
+    def mark(self, phase: str) -> float:
+        """Ends a phase of the start up.
+
+        Marks set after the summary has been logged are ignored. Thus, code that is
+        also executed after the start up may call `mark` as well.
+
+        Args:
+            phase (str): The name of the phase that ends now.
+
+        Returns:
+            float: The duration of the phase in seconds.
+        """
+        if self._summary_logged:
+            return 0.0
+        now = self._clock()
+        duration = now - self._last
+        self._last = now
+        self._phases.append((phase, duration))
+        return duration
+
+    def summary(self) -> str:
+        """Returns the duration of all phases as a single line."""
+        phases = ", ".join(
+            f"{phase} {duration:.2f} s" for phase, duration in self._phases
+        )
+        return f"Startup took {self.total:.2f} s ({phases})"
+
+    def log_summary(self) -> None:
+        """Writes the summary to the log. Only the first call writes the summary."""
+        if self._summary_logged:
+            return
+        from OTCamera.helpers import log
+
+        log.write(self.summary())
+        self._summary_logged = True
+
+
+timer = StartupTimer(start=_process_start_time())
+"""Measures the start up of the current process."""
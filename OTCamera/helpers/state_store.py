@@ -0,0 +1,137 @@
+"""OTCamera helper to share state between threads.
+
+The state is an immutable dataclass. A change replaces it atomically with an updated
+copy, so reading the state is a lock-free snapshot that stays consistent while other
+threads change it. Listeners are notified after each change, but only if a value
+they subscribed to actually changed.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import dataclasses
+import threading
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+from OTCamera.helpers import log
+
+State = TypeVar("State")
+
+Listener = Callable[[State, State], None]
+"""Called with the previous and the new state after a change."""
+
+
+class StateStore(Generic[State]):
+    """Holds a frozen dataclass and notifies listeners about changes.
+
+    Changes and notifications are serialized. Listeners are called in the thread
+    making the change and must return quickly. They may change the state again.
+
+    Args:
+        initial (State): The initial state, an instance of a frozen dataclass.
+    """
+
+    def __init__(self, initial: State) -> None:
+        self._state = initial
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._version = 0
+        self._listeners: list[tuple[Listener, frozenset[str]]] = []
+
+    @property
+    def state(self) -> State:
+        """A snapshot of the current state."""
+        return self._state
+
+    def update(self, **changes: Any) -> State:
+        """Change some values of the state at once.
+
+        Returns:
+            State: The new state.
+        """
+        return self.transition(lambda state: changes)
+
+    def transition(self, compute: Callable[[State], dict[str, Any]]) -> State:
+        """Change the state based on its current values atomically.
+
+        Args:
+            compute (Callable[[State], dict[str, Any]]): Returns the values to change
+                given the current state. No other change happens in between.
+
+        Returns:
+            State: The new state.
+        """
+        with self._lock:
+            old = self._state
+            new = dataclasses.replace(old, **compute(old))
+            changed = {
+                field.name
+                for field in dataclasses.fields(new)
+                if getattr(old, field.name) != getattr(new, field.name)
+            }
+            if not changed:
+                return old
+            self._state = new
+            self._version += 1
+            self._changed.notify_all()
+            for listener, fields in list(self._listeners):
+                if not fields or fields & changed:
+                    self._notify(listener, old, new)
+            return new
+
+    def subscribe(self, listener: Listener, *fields: str) -> Callable[[], None]:
+        """Call `listener` after each change of one of `fields`.
+
+        Args:
+            listener (Listener): Called with the previous and the new state.
+            *fields (str): Names of the values to watch. All values if none.
+
+        Returns:
+            Callable[[], None]: Unsubscribes the listener.
+
+        Raises:
+            ValueError: If a field does not exist.
+        """
+        names = {field.name for field in dataclasses.fields(self._state)}
+        unknown = set(fields) - names
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        entry = (listener, frozenset(fields))
+        with self._lock:
+            self._listeners.append(entry)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if entry in self._listeners:
+                    self._listeners.remove(entry)
+
+        return unsubscribe
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        """Block until the state changes or `timeout` seconds passed.
+
+        Returns:
+            bool: Whether the state changed.
+        """
+        with self._lock:
+            version = self._version
+            return self._changed.wait_for(lambda: self._version != version, timeout)
+
+    @staticmethod
+    def _notify(listener: Listener, old: State, new: State) -> None:
+        try:
+            listener(old, new)
+        except Exception as cause:
+            log.write(f"State listener failed: {cause}", log.LogLevel.EXCEPTION)
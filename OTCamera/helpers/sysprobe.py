@@ -0,0 +1,176 @@
+"""OTCamera helper to probe and control the state of the system.
+
+Reads the state of network interfaces and radios directly from sysfs instead of
+spawning `ip` or `rfkill` in a shell. The results are cached for a short time, because
+the same state is often queried several times per iteration of the record loop.
+
+Radios are blocked and unblocked by writing an event to `/dev/rfkill`, just like the
+`rfkill` command does.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional, Union
+
+from OTCamera.helpers import log
+
+CACHE_TTL = 2.0
+"""Default number of seconds a probed state is cached."""
+
+RFKILL_TYPES = {
+    "all": 0,
+    "wlan": 1,
+    "bluetooth": 2,
+    "uwb": 3,
+    "wimax": 4,
+    "wwan": 5,
+    "gps": 6,
+    "fm": 7,
+    "nfc": 8,
+}
+"""Radio types of the rfkill interface, see linux/rfkill.h."""
+
+_RFKILL_OP_CHANGE_ALL = 3
+# struct rfkill_event { __u32 idx; __u8 type; __u8 op; __u8 soft; __u8 hard; }
+_RFKILL_EVENT = struct.Struct("=IBBBB")
+
+
+class SystemProbe:
+    """Reads the state of the system from sysfs and caches it.
+
+    Args:
+        sysfs (Union[str, Path], optional): Root of sysfs. Defaults to "/sys".
+        rfkill_device (Union[str, Path], optional): The rfkill control device.
+            Defaults to "/dev/rfkill".
+        ttl (float, optional): Seconds a probed state is cached.
+            Defaults to `CACHE_TTL`.
+        clock (Callable[[], float], optional): The clock to use.
+            Defaults to `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        sysfs: Union[str, Path] = "/sys",
+        rfkill_device: Union[str, Path] = "/dev/rfkill",
+        ttl: float = CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.sysfs = Path(sysfs)
+        self.rfkill_device = Path(rfkill_device)
+        self.ttl = ttl
+        self._clock = clock
+        self._cache: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Forget all cached states."""
+        with self._lock:
+            self._cache.clear()
+
+    def operstate(self, interface: str) -> Optional[str]:
+        """The operational state of a network interface, e.g. "up" or "down".
+
+        Args:
+            interface (str): Name of the network interface, e.g. "wlan0".
+
+        Returns:
+            Optional[str]: The state or `None` if the interface does not exist.
+        """
+        return self._cached(("operstate", interface), self._read_operstate, interface)
+
+    def is_interface_up(self, interface: str) -> bool:
+        """Whether the network interface exists and is up."""
+        return self.operstate(interface) == "up"
+
+    def radio_blocked(self, radio_type: str = "wlan") -> Optional[bool]:
+        """Whether all radios of a type are blocked by software or hardware.
+
+        Args:
+            radio_type (str, optional): One of `RFKILL_TYPES`. Defaults to "wlan".
+
+        Returns:
+            Optional[bool]: `None` if there is no radio of the type.
+        """
+        return self._cached(
+            ("radio_blocked", radio_type), self._read_radio_blocked, radio_type
+        )
+
+    def set_radio_blocked(self, radio_type: str, blocked: bool) -> bool:
+        """Block or unblock all radios of a type.
+
+        Args:
+            radio_type (str): One of `RFKILL_TYPES`.
+            blocked (bool): `True` to block, `False` to unblock.
+
+        Returns:
+            bool: Whether the request has been passed to the kernel.
+        """
+        event = _RFKILL_EVENT.pack(
+            0, RFKILL_TYPES[radio_type], _RFKILL_OP_CHANGE_ALL, int(blocked), 0
+        )
+        try:
+            with open(self.rfkill_device, "wb", buffering=0) as rfkill:
+                rfkill.write(event)
+        except OSError as cause:
+            log.write(
+                f"Unable to {'block' if blocked else 'unblock'} {radio_type}: {cause}",
+                log.LogLevel.ERROR,
+            )
+            return False
+        finally:
+            self.invalidate()
+        return True
+
+    def _cached(self, key: Hashable, read: Callable[..., Any], *args) -> Any:
+        now = self._clock()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                return entry[1]
+        value = read(*args)
+        with self._lock:
+            self._cache[key] = (now, value)
+        return value
+
+    def _read_operstate(self, interface: str) -> Optional[str]:
+        return _read_text(self.sysfs / "class/net" / interface / "operstate")
+
+    def _read_radio_blocked(self, radio_type: str) -> Optional[bool]:
+        blocked = None
+        for radio in sorted((self.sysfs / "class/rfkill").glob("rfkill*")):
+            if _read_text(radio / "type") != radio_type:
+                continue
+            radio_blocked = "1" in (
+                _read_text(radio / "soft"),
+                _read_text(radio / "hard"),
+            )
+            blocked = radio_blocked if blocked is None else blocked and radio_blocked
+        return blocked
+
+
+def _read_text(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+probe = SystemProbe()
+"""The system probe used by OTCamera."""
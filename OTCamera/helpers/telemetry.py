@@ -0,0 +1,271 @@
+"""OTCamera helper to collect system resource telemetry.
+
+Samples the CPU load, the SoC temperature, the throttling state reported by the
+firmware, the available memory, the write latency of the SD card and the frames
+dropped by the camera. The samples are kept in a ring buffer and exported as metrics.
+
+All values are read from procfs and sysfs. Both roots can be changed to read from
+fake directory trees in tests.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+from OTCamera.helpers import log, metrics
+
+SAMPLE_INTERVAL = 10.0
+"""Default number of seconds between two samples."""
+HISTORY_SIZE = 360
+"""Default number of samples kept in the ring buffer."""
+
+THROTTLED_FLAGS = {
+    0: "under-voltage",
+    1: "frequency capped",
+    2: "throttled",
+    3: "soft temperature limit",
+}
+"""Meaning of the bits of `get_throttled`. The same bits shifted by 16 are set if the
+condition occurred since boot."""
+
+_THERMAL_ZONE = "class/thermal/thermal_zone0/temp"
+_GET_THROTTLED = "devices/platform/soc/soc:firmware/get_throttled"
+_BLOCK_STAT = "block/{device}/stat"
+# Fields of the block device stat file, see Documentation/block/stat.rst
+_WRITES_COMPLETED = 4
+_WRITE_TICKS = 7
+
+FrameInfo = Tuple[int, int]
+"""Index and timestamp in microseconds of the last frame of the camera."""
+
+
+@dataclass(frozen=True)
+class TelemetrySample:
+    """System resources at a point in time. Unavailable values are `None`.
+
+    Attributes:
+        time (float): Time of the sample in seconds since the epoch.
+        load (Optional[float]): Average CPU load of the last minute.
+        soc_temperature (Optional[float]): SoC temperature in degree Celsius.
+        throttled (Optional[int]): Throttling state as reported by
+            `vcgencmd get_throttled`.
+        memory_total (Optional[int]): Total memory in bytes.
+        memory_available (Optional[int]): Available memory in bytes.
+        sd_write_latency (Optional[float]): Average duration in seconds of the
+            writes to the SD card completed since the previous sample.
+        frame_drops (int): Frames dropped by the camera since the previous sample.
+    """
+
+    time: float
+    load: Optional[float]
+    soc_temperature: Optional[float]
+    throttled: Optional[int]
+    memory_total: Optional[int]
+    memory_available: Optional[int]
+    sd_write_latency: Optional[float]
+    frame_drops: int
+
+
+def describe_throttled(throttled: Optional[int]) -> str:
+    """Describes the throttling state in words, e.g. "under-voltage (0x50005)"."""
+    if throttled is None:
+        return "n/a"
+    current = [desc for bit, desc in THROTTLED_FLAGS.items() if throttled & 1 << bit]
+    occurred = [
+        desc for bit, desc in THROTTLED_FLAGS.items() if throttled & 1 << (bit + 16)
+    ]
+    if not current and not occurred:
+        return "OK"
+    description = ", ".join(current) if current else "OK"
+    if occurred:
+        description += f", since boot: {', '.join(occurred)}"
+    return f"{description} ({throttled:#x})"
+
+
+class TelemetryCollector:
+    """Samples the system resources periodically.
+
+    Args:
+        frame_info (Callable[[], Optional[FrameInfo]], optional): Returns the index
+            and timestamp of the last frame recorded or `None` if not recording.
+            Defaults to no frame information.
+        fps (Callable[[], int], optional): Returns the configured frame rate.
+            Defaults to 0, which disables counting dropped frames.
+        interval (float, optional): Seconds between two samples.
+            Defaults to `SAMPLE_INTERVAL`.
+        history_size (int, optional): Number of samples kept.
+            Defaults to `HISTORY_SIZE`.
+        procfs (Union[str, Path], optional): Root of procfs. Defaults to "/proc".
+        sysfs (Union[str, Path], optional): Root of sysfs. Defaults to "/sys".
+        block_device (str, optional): Block device of the SD card.
+            Defaults to "mmcblk0".
+    """
+
+    def __init__(
+        self,
+        frame_info: Callable[[], Optional[FrameInfo]] = lambda: None,
+        fps: Callable[[], int] = lambda: 0,
+        interval: float = SAMPLE_INTERVAL,
+        history_size: int = HISTORY_SIZE,
+        procfs: Union[str, Path] = "/proc",
+        sysfs: Union[str, Path] = "/sys",
+        block_device: str = "mmcblk0",
+    ) -> None:
+        self._frame_info = frame_info
+        self._fps = fps
+        self.interval = interval
+        self.procfs = Path(procfs)
+        self.sysfs = Path(sysfs)
+        self._block_stat = self.sysfs / _BLOCK_STAT.format(device=block_device)
+        self.history: deque[TelemetrySample] = deque(maxlen=history_size)
+        self._last_writes: Optional[Tuple[int, int]] = None
+        self._last_frame: Optional[FrameInfo] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._gauges = {
+            "load": metrics.REGISTRY.gauge(
+                "otcamera_load1", "Average CPU load of the last minute."
+            ),
+            "soc_temperature": metrics.REGISTRY.gauge(
+                "otcamera_soc_temperature_celsius", "SoC temperature."
+            ),
+            "throttled": metrics.REGISTRY.gauge(
+                "otcamera_throttled", "Throttling state as of vcgencmd get_throttled."
+            ),
+            "memory_available": metrics.REGISTRY.gauge(
+                "otcamera_memory_available_bytes", "Available memory."
+            ),
+            "sd_write_latency": metrics.REGISTRY.gauge(
+                "otcamera_sd_write_latency_seconds",
+                "Average duration of the writes to the SD card.",
+            ),
+        }
+        self._frame_drops = metrics.REGISTRY.counter(
+            "otcamera_frame_drops_total", "Frames dropped by the camera."
+        )
+
+    def latest(self) -> Optional[TelemetrySample]:
+        """The most recent sample or `None` if nothing has been sampled yet."""
+        try:
+            return self.history[-1]
+        except IndexError:
+            return None
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def sample(self) -> TelemetrySample:
+        """Sample the system resources once and add the sample to the history."""
+        memory_total, memory_available = self._read_meminfo()
+        sample = TelemetrySample(
+            time=time.time(),
+            load=self._read_load(),
+            soc_temperature=self._read_soc_temperature(),
+            throttled=self._read_throttled(),
+            memory_total=memory_total,
+            memory_available=memory_available,
+            sd_write_latency=self._read_sd_write_latency(),
+            frame_drops=self._count_frame_drops(),
+        )
+        self.history.append(sample)
+        for attr, gauge in self._gauges.items():
+            value = getattr(sample, attr)
+            if value is not None:
+                gauge.set(value)
+        self._frame_drops.inc(sample.frame_drops)
+        return sample
+
+    def _read_load(self) -> Optional[float]:
+        content = _read_text(self.procfs / "loadavg")
+        return None if content is None else float(content.split()[0])
+
+    def _read_soc_temperature(self) -> Optional[float]:
+        content = _read_text(self.sysfs / _THERMAL_ZONE)
+        return None if content is None else int(content) / 1000
+
+    def _read_throttled(self) -> Optional[int]:
+        content = _read_text(self.sysfs / _GET_THROTTLED)
+        return None if content is None else int(content, 16)
+
+    def _read_meminfo(self) -> Tuple[Optional[int], Optional[int]]:
+        content = _read_text(self.procfs / "meminfo")
+        if content is None:
+            return None, None
+        meminfo = {}
+        for line in content.splitlines():
+            key, _, value = line.partition(":")
+            meminfo[key] = int(value.split()[0]) * 1024
+        return meminfo.get("MemTotal"), meminfo.get("MemAvailable")
+
+    def _read_sd_write_latency(self) -> Optional[float]:
+        content = _read_text(self._block_stat)
+        if content is None:
+            return None
+        fields = content.split()
+        writes = (int(fields[_WRITES_COMPLETED]), int(fields[_WRITE_TICKS]))
+        last_writes, self._last_writes = self._last_writes, writes
+        if last_writes is None or writes[0] <= last_writes[0]:
+            return None
+        return (writes[1] - last_writes[1]) / (writes[0] - last_writes[0]) / 1000
+
+    def _count_frame_drops(self) -> int:
+        """Infers the dropped frames from the frame index and timestamp.
+
+        The number of frames expected between two samples is derived from the time
+        passed according to the frame timestamps.
+        """
+        frame = self._frame_info()
+        last_frame, self._last_frame = self._last_frame, frame
+        fps = self._fps()
+        if frame is None or last_frame is None or fps <= 0:
+            return 0
+        index_delta = frame[0] - last_frame[0]
+        time_delta = frame[1] - last_frame[1]
+        if index_delta < 0 or time_delta <= 0:
+            # The recording has been restarted
+            return 0
+        expected = round(time_delta * fps / 1_000_000)
+        return max(expected - index_delta, 0)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as cause:
+                log.write(f"Unable to sample telemetry: {cause}", log.LogLevel.ERROR)
+
+
+def _read_text(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
@@ -0,0 +1,275 @@
+"""OTCamera helper to upload finished videos when it does not harm the recording.
+
+Videos are queued when a segment is finished and uploaded by a background thread with
+the lowest CPU and I/O priority. Transfers only run within the configured upload
+windows, e.g. at night, and only while on external power. A running transfer is
+paused as soon as this is no longer the case and resumed at the byte reached once it
+is allowed again.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from OTCamera import config, status
+from OTCamera.helpers import log, metrics, name
+from OTCamera.helpers.offload_state import UPLOAD, offload_state
+from OTCamera.helpers.usb_offload import set_background_priority
+
+POLL_INTERVAL = 60.0
+"""Seconds between two checks whether queued videos may be transferred."""
+
+Transfer = Callable[[list[Path], Callable[[int], None]], Iterable[Path]]
+"""Uploads videos, calling back with the bytes sent, and yields each video uploaded."""
+
+_UPLOAD_ERRORS = metrics.REGISTRY.counter(
+    "otcamera_upload_errors_total", "Number of failed video uploads."
+)
+_UPLOAD_THROUGHPUT = metrics.REGISTRY.gauge(
+    "otcamera_upload_throughput_bytes_per_second",
+    "Throughput of the last video upload.",
+)
+_UPLOADS_PAUSED = metrics.REGISTRY.gauge(
+    "otcamera_uploads_paused", "1 while uploads wait for an upload window or power."
+)
+
+
+def in_windows(windows: Sequence[Tuple[int, int]], now: datetime) -> bool:
+    """Whether `now` lies within one of the time windows.
+
+    Args:
+        windows (Sequence[Tuple[int, int]]): Start and end of each window in minutes
+            after midnight. A window ending before it starts spans midnight. No
+            windows means always.
+        now (datetime): The time to check.
+    """
+    if not windows:
+        return True
+    minute = now.hour * 60 + now.minute
+    for start, end in windows:
+        if start <= end:
+            if start <= minute < end:
+                return True
+        elif minute >= start or minute < end:
+            return True
+    return False
+
+
+def transfer_allowed(now: Optional[datetime] = None) -> bool:
+    """Whether videos may be uploaded according to the user config.
+
+    The power supply is only known if the buttons are connected. Otherwise,
+    external power is assumed.
+    """
+    if not in_windows(config.SERVER_UPLOAD_WINDOWS, now or datetime.now()):
+        return False
+    if config.SERVER_UPLOAD_REQUIRE_EXTERNAL_POWER and config.USE_BUTTONS:
+        return status.store.state.external_power_connected
+    return True
+
+
+def upload_to_server(
+    videos: list[Path], progress: Callable[[int], None]
+) -> Iterator[Path]:
+    """Sync the videos to the server configured in the user config.
+
+    Yields:
+        Path: Each video uploaded or already complete on the server.
+    """
+    from OTCamera.plugin_upload.factory import create_transport
+
+    log.write("uploading video to cloud", level=log.LogLevel.DEBUG)
+    with create_transport(
+        config.SERVER_UPLOAD_SCHEME,
+        config.SERVER_UPLOAD_HOST,
+        config.SERVER_UPLOAD_PORT,
+        config.SERVER_UPLOAD_USER,
+        config.SERVER_UPLOAD_PASSWORD,
+    ) as transport:
+        for result in transport.sync(
+            videos, PurePosixPath(config.SERVER_UPLOAD_SERVER_SOURCE), progress
+        ):
+            if result.bytes_sent:
+                _UPLOAD_THROUGHPUT.set(result.throughput)
+            offload_state.mark(result.source, UPLOAD)
+            yield result.source
+
+
+class TransferScheduler:
+    """Uploads queued videos in a background thread while transfers are allowed.
+
+    Videos that fail to upload stay queued and are retried at the next check.
+
+    Args:
+        transfer (Transfer, optional): Uploads the videos.
+            Defaults to `upload_to_server`.
+        allowed (Callable[[], bool], optional): Whether transfers may run.
+            Defaults to `transfer_allowed`.
+        poll_interval (float, optional): Seconds between two checks whether queued
+            videos may be transferred. Defaults to `POLL_INTERVAL`.
+    """
+
+    def __init__(
+        self,
+        transfer: Transfer = upload_to_server,
+        allowed: Callable[[], bool] = transfer_allowed,
+        poll_interval: float = POLL_INTERVAL,
+    ) -> None:
+        self._transfer = transfer
+        self._allowed = allowed
+        self.poll_interval = poll_interval
+        self._pending: list[Path] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._paused = False
+
+    @property
+    def pending(self) -> list[Path]:
+        """The videos waiting to be uploaded."""
+        with self._lock:
+            return list(self._pending)
+
+    def enqueue(self, *videos: Union[str, Path]) -> None:
+        """Queue videos for upload and check at once whether they may be uploaded.
+
+        Proxies are uploaded before the full resolution videos.
+        """
+        with self._lock:
+            for video in map(Path, videos):
+                if video not in self._pending:
+                    self._pending.append(video)
+            self._pending.sort(key=lambda video: not name.is_proxy(video))
+        self._wake.set()
+
+    def enqueue_not_uploaded(
+        self,
+        video_dir: Union[str, Path],
+        exclude: Iterable[Union[str, Path]] = (),
+        archive: bool = True,
+    ) -> None:
+        """Queue the videos in `video_dir` that have not been uploaded yet.
+
+        Restores the queue of a previous run, which is lost on reboot or shutdown,
+        e.g. before the upload window opened.
+
+        Args:
+            video_dir (Union[str, Path]): The directory containing the videos.
+            exclude (Iterable[Union[str, Path]], optional): Videos not to queue, e.g.
+                the segment currently recorded and its proxy. Defaults to ().
+            archive (bool, optional): Whether to queue the full resolution videos in
+                addition to the proxies. Defaults to True.
+        """
+        excluded = {Path(video).name for video in exclude}
+        videos = [
+            video
+            for video in sorted(Path(video_dir).glob(f"*.{config.VIDEO_FORMAT}"))
+            if video.name not in excluded
+            and (archive or name.is_proxy(video))
+            and UPLOAD not in offload_state.destinations(video)
+        ]
+        if videos:
+            log.write(f"Queued {len(videos)} videos not uploaded yet")
+            self.enqueue(*videos)
+
+    def wake(self) -> None:
+        """Check at once whether the queued videos may be uploaded."""
+        self._wake.set()
+
+    def start(self) -> None:
+        """Start transferring in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="transfer-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop transferring. A running upload is paused."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @metrics.timed("otcamera_upload_seconds", "Duration of syncing the videos.")
+    def run_pending(self) -> None:
+        """Transfer the queued videos if allowed."""
+        if not self._check_allowed():
+            return
+        with self._lock:
+            self._pending = [video for video in self._pending if video.exists()]
+            videos = list(self._pending)
+        if not videos:
+            return
+        uploaded: set[Path] = set()
+        try:
+            for video in self._transfer(videos, self._pause_if_not_allowed):
+                uploaded.add(video)
+        except Exception as cause:
+            # Transports wrap the exception raised by the progress callback
+            if _find_cause(cause, _TransferPaused):
+                log.write("Upload paused, resuming later", log.LogLevel.DEBUG)
+            else:
+                _UPLOAD_ERRORS.inc()
+                log.write(f"Error uploading video to cloud: {cause}")
+        with self._lock:
+            self._pending = [video for video in self._pending if video not in uploaded]
+
+    def _run(self) -> None:
+        set_background_priority()
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.run_pending()
+            except Exception as cause:
+                log.write(f"Transfer scheduler failed: {cause}", log.LogLevel.EXCEPTION)
+
+    def _check_allowed(self) -> bool:
+        allowed = not self._stop.is_set() and self._allowed()
+        if allowed == self._paused:
+            self._paused = not allowed
+            _UPLOADS_PAUSED.set(int(self._paused))
+            if self._paused:
+                log.write("Uploads paused until an upload window and external power")
+            else:
+                log.write("Uploads resumed")
+        return allowed
+
+    def _pause_if_not_allowed(self, num_bytes: int) -> None:
+        if not self._check_allowed():
+            raise _TransferPaused()
+
+
+class _TransferPaused(Exception):
+    """Raised from the progress callback to interrupt a running upload."""
+
+
+def _find_cause(error: BaseException, cause_type: type) -> bool:
+    """Whether `error` has been caused by an exception of `cause_type`."""
+    while error is not None:
+        if isinstance(error, cause_type):
+            return True
+        error = error.__cause__
+    return False
@@ -0,0 +1,688 @@
+"""OTCamera helper to copy the videos to a USB flash drive.
+
+The progress is tracked in a copy information CSV and an append-only journal on the
+USB flash drive. Thus, an interrupted copy resumes where it stopped. The CSV can be
+edited to mark videos for deletion on OTCamera.
+
+Used by the USB offload while recording and by the standalone copy script
+`usb_flash_drive_copy.py`.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import csv
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Collection, Iterable, Optional, Union
+
+from OTCamera import config
+from OTCamera.helpers import fastcopy, log, privileged
+from OTCamera.helpers.filesystem import video_dir_stats
+from OTCamera.helpers.offload_state import USB, offload_state
+
+if TYPE_CHECKING:
+    from gpiozero import PWMLED
+
+COPY_INFO_CSV_SUFFIX = "_usb-copy-info.csv"
+COPY_JOURNAL_SUFFIX = "_usb-copy-journal.txt"
+TRUE_VALUES = frozenset({"yes", "y", "true", "x", "ja", "j"})
+
+
+class Subject(ABC):
+    @abstractmethod
+    def attach(self, observer: "Observer") -> None:
+        """Attach an observer to the subject."""
+        pass
+
+    @abstractmethod
+    def detach(self, observer: "Observer") -> None:
+        """Detach an observer from the subject."""
+        pass
+
+    @abstractmethod
+    def notify(self) -> None:
+        """Notify all observers subscribed to subject about an event."""
+        pass
+
+
+class Observer(ABC):
+    """The Observer interface declaring update method used by subjects."""
+
+    @abstractmethod
+    def update(self, is_active: bool):
+        """Receive update from subject.
+
+        Args:
+            subject (Subject): the subject.
+            is_active (bool): whether the subject is active
+        """
+        pass
+
+
+class IsNotADirectoryError(OSError):
+    pass
+
+
+class IllegalStateError(Exception):
+    pass
+
+
+class UsbFlashDriveNotMountableError(Exception):
+    pass
+
+
+class UsbFlashDriveUnmountableError(Exception):
+    pass
+
+
+@dataclass
+class Video:
+    filename: str
+    path: Path
+    copied: bool
+    delete: bool
+
+    @staticmethod
+    def from_dict(data: dict, src: Path) -> "Video":
+        filename = data["filename"]
+        copied = data["copied"].strip().lower() in TRUE_VALUES
+        delete = data["delete"].strip().lower() in TRUE_VALUES
+        return Video(filename, src / filename, copied, delete)
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def to_dict(self) -> dict:
+        return {"filename": self.filename, "copied": self.copied, "delete": self.delete}
+
+    def __eq__(self, __o: object) -> bool:
+        """
+        A `Video` object is equal to another Video object if their path is the
+        same.
+        """
+        if not isinstance(__o, Video):
+            return NotImplemented
+        return self.path == __o.path
+
+
+class Led:
+    def __init__(self, led: Optional["PWMLED"]) -> None:
+        """Provides actions to interact with hardware LED.
+
+        Args:
+            led (Optional[PWMLED]): Interface to hardware LED. `None` if the LED is
+            controlled by someone else, e.g. while copying in the background.
+        """
+
+        self._led = led
+
+    def blink(self, times: Union[int, None] = None, background: bool = True) -> None:
+        """Led blinking action.
+
+        Args:
+            times (Union[int, None], optional): Number of times to blink.
+            Defaults to `None` meaning forever.
+            background (bool, optional): Start as background thread.
+            If `False` return only when blink has finished when `n!=None`.
+            Defaults to `True`.
+        """
+        if not config.USE_LED or self._led is None:
+            return
+        self._led.blink(n=times, background=background)
+        time.sleep(2)
+
+    def turn_off(self) -> None:
+        """Turn off LED."""
+        if not config.USE_LED or self._led is None:
+            return
+        self._led.off()
+
+    def turn_on(self) -> None:
+        """Turn on LED."""
+        if not config.USE_LED or self._led is None:
+            return
+        self._led.on()
+        time.sleep(2)
+
+
+class CopyJournal:
+    COPIED = "copied"
+    DELETED = "deleted"
+
+    def __init__(self, file: Path) -> None:
+        """Append-only journal of the state transitions of the videos.
+
+        Each line records one transition, e.g. "copied video.h264". Appending a line
+        is cheap enough to checkpoint the progress after every video. The journal is
+        compacted to one line per copied video when the copy information is written.
+
+        Args:
+            file (Path): The journal file.
+        """
+        self.file = file
+
+    def load(self) -> dict[str, str]:
+        """Load the latest state of each video by its filename."""
+        states: dict[str, str] = {}
+        try:
+            with open(self.file, mode="r") as journal:
+                for line in journal:
+                    state, _, filename = line.rstrip("\n").partition(" ")
+                    if filename:
+                        states[filename] = state
+        except FileNotFoundError:
+            pass
+        return states
+
+    def append(self, state: str, filename: str) -> None:
+        """Record a state transition of a video and sync it to disk."""
+        with open(self.file, mode="a") as journal:
+            journal.write(f"{state} {filename}\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def compact(self, videos: Iterable[Video]) -> None:
+        """Replace the journal atomically by one line per copied video."""
+        tmp_file = self.file.with_name(self.file.name + ".tmp")
+        with open(tmp_file, mode="w") as journal:
+            for video in sorted(videos, key=lambda video: video.filename):
+                if video.copied:
+                    journal.write(f"{self.COPIED} {video.filename}\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(tmp_file, self.file)
+
+
+class CopyInformation:
+    def __init__(
+        self,
+        videos: set[Video],
+        csv_file: Path,
+        src_dir: Path,
+        dest_dir: Path,
+        journal: Optional[CopyJournal] = None,
+    ) -> None:
+        self.videos = videos
+        self.csv_file = csv_file
+        self.src_dir = src_dir
+        self.dest_dir = dest_dir
+        self.journal = (
+            CopyJournal(CopyInformation.get_copy_journal(dest_dir))
+            if journal is None
+            else journal
+        )
+        self._validate_copy_info()
+
+    def _validate_copy_info(self):
+        """Validate and update video copy information with actual videos on disk.
+
+        Each directory is scanned once instead of checking the existence of each
+        video, which is slow on the FAT file system of USB flash drives.
+        """
+        if not self.src_dir.is_dir():
+            raise IsNotADirectoryError(f"Path: '{self.src_dir}' is not a directory!")
+        names_on_src = get_filenames(self.src_dir)
+        names_on_dest = get_filenames(self.dest_dir)
+        states = self.journal.load()
+        videos_on_src = self._get_videos_from_src(names_on_src)
+
+        for video in self.videos.copy():
+            if video.filename not in names_on_src:
+                log.write(
+                    (
+                        f"File: '{video.path}' does not exist on OTCamera. "
+                        "Remove from copy information."
+                    ),
+                    log.LogLevel.WARNING,
+                )
+                self.remove(video)
+                continue
+
+            videos_on_src.discard(video)
+
+            if video.filename in names_on_dest:
+                video.copied = True
+                log.write(
+                    f"Video '{video.filename}' already copied. Set copied=True.",
+                    log.LogLevel.DEBUG,
+                )
+        # Videos remaining in videos_on_src are new ones
+        self.videos.update(videos_on_src)
+        for video in self.videos:
+            if states.get(video.filename) == CopyJournal.COPIED:
+                video.copied = True
+
+    def _get_videos_from_src(self, names_on_src: set[str]) -> set[Video]:
+        videos_on_src: set[Video] = set()
+        for filename in names_on_src:
+            if filename.endswith(".h264"):
+                videos_on_src.add(
+                    Video(filename, self.src_dir / filename, copied=False, delete=False)
+                )
+        return videos_on_src
+
+    def remove(self, video: Video):
+        """Remove video from videos list."""
+        self.videos.discard(video)
+
+    def get_sorted_videos(self) -> list[Video]:
+        """Get sorted list of videos by filename."""
+        return sorted(self.videos, key=lambda video: video.filename)
+
+    def get_copy_plan(self) -> list[Video]:
+        """Get the videos still to be copied, newest first.
+
+        The newest videos are copied first. Thus, if the copy is interrupted, the
+        videos copied form one gap-free period up to the most recent recording.
+        """
+        pending = [
+            video for video in self.videos if not video.copied and video.path.exists()
+        ]
+        return sorted(pending, key=_modification_time, reverse=True)
+
+    def to_dict(self) -> list[dict]:
+        serialized_videos: list[dict] = []
+        for video in self.get_sorted_videos():
+            video_dict = video.to_dict()
+            serialized_videos.append(video_dict)
+        return serialized_videos
+
+    @staticmethod
+    def from_csv(file: Path, src_dir: Path, dest_dir: Path) -> "CopyInformation":
+        videos: set[Video] = set()
+        with open(file, mode="r") as csv_file:
+            csv_reader = csv.DictReader(csv_file)
+            for _dict in csv_reader:
+                videos.add(Video.from_dict(_dict, src_dir))
+
+        return CopyInformation(videos, file, src_dir, dest_dir)
+
+    @staticmethod
+    def get_copy_info_csv(directory: Path) -> Path:
+        """Get the location of the copy information CSV file of this OTCamera."""
+        return Path(directory, f"{get_hostname()}{COPY_INFO_CSV_SUFFIX}")
+
+    @staticmethod
+    def get_copy_journal(directory: Path) -> Path:
+        """Get the location of the copy journal of this OTCamera."""
+        return Path(directory, f"{get_hostname()}{COPY_JOURNAL_SUFFIX}")
+
+    @staticmethod
+    def create_new(src_dir: Path, dest_dir: Path, filetype: str):
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        copy_csv_file = CopyInformation.get_copy_info_csv(dest_dir)
+        copy_csv_file.touch()
+
+        video_filepaths = get_video_files(src_dir, filetype)
+        videos: set[Video] = set()
+
+        for video_filepath in video_filepaths:
+            video = Video(video_filepath.name, video_filepath, False, False)
+            videos.add(video)
+
+        return CopyInformation(videos, copy_csv_file, src_dir, dest_dir)
+
+
+@dataclass
+class UsbFlashDrive:
+    """Wrapper to usb flash drives providing mount and unmount function.
+
+    IMPORTANT: Requires an entry in /etc/fstab to give user permission to access
+    usb mount device.
+
+    `self.mount_point` must be the same as in /etc/fstab.
+
+    Raises:
+        UsbFlashDriveNotMountableError: If not able to mount usb flash drive.
+    """
+
+    mount_point: Path
+
+    def mount(self) -> None:
+        """Mount USB flash drive.
+
+        IMPORTANT: Requires an entry in /etc/fstab to give user permission to access
+        usb mount device.
+
+        `self.mount_point` must be the same as in /etc/fstab.
+        """
+        if self.mount_point.is_mount():
+            log.write("USB flash drive already mounted", log.LogLevel.WARNING)
+            return
+
+        self.mount_point.mkdir(parents=True, exist_ok=True)
+
+        return_code: int = privileged.run("mount", str(self.mount_point))
+        if return_code != 0:
+            raise UsbFlashDriveNotMountableError(
+                (f"Unable to mount USB flash drive to '{self.mount_point}'!",)
+            )
+        log.write("USB flash drive mounted.")
+
+    def unmount(self, lazy: bool = False) -> None:
+        """Unmount USB flash drive.
+
+        Args:
+            lazy (bool, optional): Detach the file system at once, even if it is
+                still busy, e.g. after the USB flash drive has been pulled.
+                Defaults to False.
+        """
+        if not self.mount_point.is_mount():
+            log.write("USB flash drive already unmounted", log.LogLevel.WARNING)
+            return
+
+        action = "lazy_umount" if lazy else "umount"
+        return_code: int = privileged.run(action, str(self.mount_point))
+        if return_code != 0:
+            raise UsbFlashDriveUnmountableError(
+                f"Unable to unmount USB flash drive from '{self.mount_point}'!"
+            )
+        log.write("USB flash drive unmounted.")
+
+
+class OTCameraUsbCopier(Observer):
+    def __init__(
+        self,
+        power_led: Led,
+        wifi_led: Led,
+        rec_led: Led,
+        src_dir: Path,
+        usb_flash_drive: UsbFlashDrive,
+    ) -> None:
+        """This classes' main purpose is to provide methods to copy and delete videos
+        with the help of a `CopyInformation` object.
+
+        Args:
+            power_led (Led): give user visual feedback to inform about the current
+            status of the OTCameraUsbCopier.
+            wifi_led (Led): give user visual feedback to inform about the current
+            status of the OTCameraUsbCopier.
+            rec_led (Led): give user visual feedback to inform about the current
+            status of the OTCameraUsbCopier.
+            src_dir (Path): directory where the video files to be copied are located at.
+            usb_flash_drive (UsbFlashdrive): The USB flash drive.
+        """
+        self.power_led = power_led
+        self.wifi_led = wifi_led
+        self.rec_led = rec_led
+        self.src_dir = src_dir
+        self.usb_flash_drive = usb_flash_drive
+        self._shutdown_requested = threading.Event()
+
+    @property
+    def shutdown_requested(self) -> bool:
+        return self._shutdown_requested.is_set()
+
+    def update(self, is_active: bool) -> None:
+        if is_active:
+            self._shutdown_requested.clear()
+        else:
+            self._shutdown_requested.set()
+
+    def wait_for_shutdown_request(self) -> None:
+        """Block until the power button requests a shutdown."""
+        self._shutdown_requested.wait()
+
+    def shutdown(self):
+        """Shutdown OTCamera."""
+
+        self._turn_off_all_leds()
+        self.power_led.blink(times=4, background=False)
+
+        self.power_led.turn_on()
+
+        if not config.DEBUG_MODE_ON:
+            log.closefile()
+            privileged.run("shutdown")
+
+    def _turn_off_all_leds(self):
+        """Turn off all LEDs."""
+        self.power_led.turn_off()
+        self.wifi_led.turn_off()
+        self.rec_led.turn_off()
+
+    def copy_to_usb(self, copy_info: CopyInformation) -> None:
+        """Copy over videos to USB flash drive.
+
+        The WiFi LED blinking indicates the videos being copied over.
+        The WiFi LED constantly being on indicates that the copy process is finished.
+
+        Args:
+            copy_info (CopyInformation): the copy information.
+        """
+        self.wifi_led.blink()
+        log.write("Start copying files")
+        for video in copy_info.videos:
+            if video.copied:
+                log.write(f"Video at: '{ video.path}' already copied. Skipping.")
+            elif not video.path.exists():
+                log.write(
+                    f"Video at: '{ video.path}' does not exists.", log.LogLevel.WARNING
+                )
+
+        plan = copy_info.get_copy_plan()
+        progress = fastcopy.CopyProgress(
+            sum(video.path.stat().st_size for video in plan)
+        )
+        for video in plan:
+            try:
+                fastcopy.copy_resumable(
+                    src=video.path,
+                    dst=copy_info.dest_dir / video.filename,
+                    progress=progress.add,
+                )
+                video.copied = True
+                log.write(f"Video: '{video.path}' copied.")
+                copy_info.journal.append(CopyJournal.COPIED, video.filename)
+                offload_state.mark(video.path, USB)
+            except IOError:
+                log.write(
+                    f"Unable to copy video '{video.path}'.",
+                    level=log.LogLevel.EXCEPTION,
+                )
+                if not self.usb_flash_drive.mount_point.is_mount():
+                    log.write("USB flash drive removed.", log.LogLevel.ERROR)
+                    break
+        log.write(progress.summary())
+        log.write("Copying over videos to USB flash drive finished.")
+        self.wifi_led.turn_on()
+
+    def delete(self, copy_info: CopyInformation) -> None:
+        """Delete videos marked for deletion on OTCamera.
+
+        The recording LED blinking indicates the videos being deleted.
+        The recording LED constantly being on indicates that the delete process has
+        finished.
+
+        Args:
+            copy_info (CopyInformation): The copy information.
+        """
+        self.rec_led.blink()
+        for video in copy_info.videos.copy():
+            if not video.path.exists():
+                log.write(
+                    f"Video at: '{ video.path}' does not exist.", log.LogLevel.WARNING
+                )
+                copy_info.remove(video)
+                continue
+            if not video.delete:
+                log.write(
+                    f"Video at: '{ video.path}' not marked for deletion. Skipping.",
+                )
+                continue
+
+            if config.DEBUG_MODE_ON:
+                log.write("Debug mode on. Only mock deleting file.", log.LogLevel.DEBUG)
+            else:
+                try:
+                    video.path.unlink()
+                    copy_info.remove(video)
+                    copy_info.journal.append(CopyJournal.DELETED, video.filename)
+                    offload_state.forget(video.path)
+                    video_dir_stats.file_deleted(video.path)
+                except FileNotFoundError:
+                    log.write(
+                        f"Video '{video.path}' could not be found although it should "
+                        "exist.",
+                        log.LogLevel.EXCEPTION,
+                    )
+
+                    pass
+                except IOError:
+                    log.write(
+                        f"Error occurred while trying to delete video '{video.path}'.",
+                        level=log.LogLevel.EXCEPTION,
+                    )
+
+            log.write(f"Video at: '{video.path}' deleted!")
+        self.rec_led.turn_on()
+
+    def write_copy_info(self, copy_info: CopyInformation) -> None:
+        """Writes or overwrites an existing copy information csv.
+
+        The CSV can be edited to mark videos for deletion. It is replaced atomically.
+        Thus, it is never left half written if the USB flash drive is unplugged.
+        Compacts the copy journal afterwards.
+
+        Args:
+            copy_info (CopyInformation): The copy information.
+        """
+        tmp_file = copy_info.csv_file.with_name(copy_info.csv_file.name + ".tmp")
+        with open(tmp_file, "w", newline="") as csv_file:
+            writer = csv.DictWriter(
+                csv_file, fieldnames=["filename", "copied", "delete"]
+            )
+            writer.writeheader()
+            for video_info in copy_info.to_dict():
+                writer.writerow(video_info)
+            csv_file.flush()
+            os.fsync(csv_file.fileno())
+        os.replace(tmp_file, copy_info.csv_file)
+        copy_info.journal.compact(copy_info.videos)
+
+    def mount_usb_device(self) -> None:
+        # """Mount USB flash drive."""
+        self.usb_flash_drive.mount()
+
+    def unmount_usb_device(self) -> None:
+        """Unmount USB flash drive.
+
+        The power LED being permanently turned on indicates the succesful unmount of
+        the USB flash drive.
+        """
+        self.usb_flash_drive.unmount()
+        self.power_led.turn_on()
+
+
+def _modification_time(video: Video) -> tuple[float, str]:
+    try:
+        return video.path.stat().st_mtime, video.filename
+    except FileNotFoundError:
+        return 0.0, video.filename
+
+
+def get_video_files(directory: Path, filetype: str) -> list[Path]:
+    if not directory.is_dir():
+        raise IsNotADirectoryError(f"Path: '{directory}' is not a directory!")
+    return [
+        Path(directory, filename)
+        for filename in get_filenames(directory)
+        if filename.endswith(f".{filetype}")
+    ]
+
+
+def get_filenames(directory: Path) -> set[str]:
+    """Get the names of the files in a directory with a single scan.
+
+    Returns an empty set if the directory does not exist.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        return set()
+
+
+def get_hostname() -> str:
+    return socket.gethostname()
+
+
+def offload(
+    video_dir: str,
+    mount_point: str,
+    exclude: Collection[str] = (),
+    status_led: Optional[Led] = None,
+) -> None:
+    """Copy the videos to the USB flash drive in the background while recording.
+
+    Only the status LED is used, the other LEDs and the buttons are left to the
+    recording.
+
+    Args:
+        video_dir (str): Folder containing videos.
+        mount_point (str): The USB device's mount point.
+        exclude (Collection[str], optional): Filenames of videos to neither copy nor
+            delete, e.g. the video currently recorded. Defaults to ().
+        status_led (Optional[Led], optional): Blinks while copying and is on once the
+            USB flash drive can be removed. Defaults to no LED.
+    """
+    usb_device_mount = Path(mount_point)
+    usb_copier = OTCameraUsbCopier(
+        Led(None),
+        Led(None) if status_led is None else status_led,
+        Led(None),
+        Path(video_dir),
+        UsbFlashDrive(usb_device_mount),
+    )
+    copy_videos(
+        usb_copier, Path(video_dir), Path(usb_device_mount, get_hostname()), exclude
+    )
+
+
+def copy_videos(
+    usb_copier: OTCameraUsbCopier,
+    src_dir: Path,
+    dest_dir: Path,
+    exclude: Collection[str] = (),
+) -> None:
+    """Mount the USB flash drive, copy and delete the videos and unmount it.
+
+    The USB flash drive is unmounted in any case. Otherwise a stale mount would be
+    left after a failed copy, which breaks mounting the next USB flash drive.
+    """
+    usb_copy_info_path = CopyInformation.get_copy_info_csv(dest_dir)
+    usb_copier.mount_usb_device()
+    try:
+        if usb_copy_info_path.exists():
+            usb_copy_info = CopyInformation.from_csv(
+                usb_copy_info_path, src_dir, dest_dir
+            )
+        else:
+            usb_copy_info = CopyInformation.create_new(src_dir, dest_dir, "h264")
+        for video in usb_copy_info.videos.copy():
+            if video.filename in exclude:
+                usb_copy_info.remove(video)
+
+        usb_copier.copy_to_usb(usb_copy_info)
+        usb_copier.delete(usb_copy_info)
+        usb_copier.write_copy_info(usb_copy_info)
+    finally:
+        usb_copier.unmount_usb_device()
@@ -0,0 +1,183 @@
+"""OTCamera helper to offload videos to a USB flash drive while recording.
+
+When a USB flash drive is plugged in, the videos are copied in a background thread.
+The thread runs with the lowest CPU and I/O priority. Thus, the encoder writing the
+current video to the SD card is not slowed down by the copy.
+
+The Wi-Fi LED blinks while copying and is on once the USB flash drive can be removed.
+It blinks very rapidly if the offload failed. After removing the USB flash drive, it
+shows the Wi-Fi state again.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import ctypes
+import os
+import platform
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from OTCamera import config
+from OTCamera.helpers import log, name
+from OTCamera.helpers.usb_copy import Led, UsbFlashDrive, offload
+
+DEVICE_TIMEOUT = 10.0
+"""Seconds to wait for the device node after the kernel announced the device."""
+
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+_SYS_IOPRIO_SET = {
+    "x86_64": 251,
+    "aarch64": 30,
+    "armv6l": 314,
+    "armv7l": 314,
+    "i686": 289,
+}
+
+
+def set_background_priority() -> None:
+    """Lower the CPU and I/O priority of the calling thread to the minimum.
+
+    On Linux, both priorities can be set per thread. The I/O priority class "idle"
+    only gets disk time when no other process needs it.
+    """
+    thread_id = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, thread_id, 19)
+    except OSError as cause:
+        log.write(f"Unable to lower CPU priority: {cause}", log.LogLevel.DEBUG)
+    syscall = _SYS_IOPRIO_SET.get(platform.machine())
+    if syscall is None:
+        return
+    ioprio = _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(syscall, _IOPRIO_WHO_PROCESS, thread_id, ioprio) != 0:
+        log.write(
+            f"Unable to lower I/O priority: {os.strerror(ctypes.get_errno())}",
+            log.LogLevel.DEBUG,
+        )
+
+
+class UsbOffloader:
+    """Copies the videos to a USB flash drive in a background thread.
+
+    Args:
+        video_dir (Union[str, Path]): Folder containing the videos.
+        mount_point (Union[str, Path]): The USB device's mount point.
+        current_segment (Callable[[], Optional[str]], optional): Returns the video
+            currently recorded, which is not copied. Defaults to no video.
+        device_timeout (float, optional): Seconds to wait for the device node.
+            Defaults to `DEVICE_TIMEOUT`.
+    """
+
+    def __init__(
+        self,
+        video_dir: Union[str, Path],
+        mount_point: Union[str, Path],
+        current_segment: Callable[[], Optional[str]] = lambda: None,
+        device_timeout: float = DEVICE_TIMEOUT,
+    ) -> None:
+        self.video_dir = str(video_dir)
+        self.mount_point = str(mount_point)
+        self._current_segment = current_segment
+        self.device_timeout = device_timeout
+        self._removed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def on_device_added(self, device: str) -> None:
+        """Start offloading unless an offload is already running."""
+        if self.running:
+            log.write("USB offload already running", log.LogLevel.WARNING)
+            return
+        self._removed.clear()
+        self._thread = threading.Thread(
+            target=self._offload, args=(device,), name="usb-offload", daemon=True
+        )
+        self._thread.start()
+
+    def on_device_removed(self, device: str) -> None:
+        """Detach the file system of the pulled USB flash drive.
+
+        A stale mount would prevent mounting the next USB flash drive. A running
+        offload stops copying once the file system is gone.
+        """
+        self._removed.set()
+        usb_flash_drive = UsbFlashDrive(Path(self.mount_point))
+        if usb_flash_drive.mount_point.is_mount():
+            try:
+                usb_flash_drive.unmount(lazy=True)
+            except Exception as cause:
+                log.write(
+                    f"Unable to unmount USB flash drive: {cause}", log.LogLevel.ERROR
+                )
+        if config.USE_LED:
+            from OTCamera.hardware import led
+
+            led.wifi_restore()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait for the running offload to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _offload(self, device: str) -> None:
+        set_background_priority()
+        if not self._wait_for_device(Path(device)):
+            log.write(f"USB device '{device}' did not appear", log.LogLevel.WARNING)
+            return
+        current_segment = self._current_segment()
+        # Neither the video nor its proxy are complete while they are recorded
+        exclude = (
+            ()
+            if current_segment is None
+            else (Path(current_segment).name, Path(name.proxy(current_segment)).name)
+        )
+        log.write(f"Start offloading videos to '{self.mount_point}'")
+        try:
+            offload(self.video_dir, self.mount_point, exclude, self._status_led())
+        except Exception as cause:
+            log.write(f"USB offload failed: {cause}", log.LogLevel.EXCEPTION)
+            if config.USE_LED:
+                from OTCamera.hardware import led
+
+                led.wifi_alarm()
+            return
+        log.write("USB offload finished. The USB flash drive can be removed.")
+
+    @staticmethod
+    def _status_led() -> Led:
+        """The Wi-Fi LED, which signals the progress of the offload."""
+        if not config.USE_LED:
+            return Led(None)
+        from OTCamera.hardware import led
+
+        return Led(led.wifi)
+
+    def _wait_for_device(self, device: Path) -> bool:
+        """The kernel announces the device before udev creates the device node."""
+        waited = 0.0
+        interval = 0.1
+        while not device.exists():
+            if waited >= self.device_timeout or self._removed.wait(interval):
+                return False
+            waited += interval
+        return True
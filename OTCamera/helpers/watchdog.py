@@ -0,0 +1,211 @@
+"""OTCamera helper to detect a stalled recording.
+
+A background thread checks the heartbeats of the record loop and the growth of the
+video file currently recorded.
+
+If the video file stops growing while the record loop is still running, a restart of
+the camera is requested from the record loop. If the record loop itself stalls or the
+restart does not help, the notifications to the systemd watchdog are stopped. systemd
+then restarts OTCamera.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+from OTCamera.helpers import log
+
+CHECK_INTERVAL = 1.0
+"""Maximum number of seconds between two checks."""
+
+
+def notify(state: str) -> bool:
+    """Send a notification to systemd, e.g. "READY=1" or "WATCHDOG=1".
+
+    Implements the protocol of `sd_notify(3)` without depending on libsystemd.
+
+    Args:
+        state (str): The state to send.
+
+    Returns:
+        bool: `True` if the notification was sent. `False` if OTCamera is not run by
+        systemd or sending failed.
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        # Abstract namespace socket
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as notify_socket:
+            notify_socket.connect(address)
+            notify_socket.sendall(state.encode())
+    except OSError:
+        return False
+    return True
+
+
+def _notify_interval() -> float:
+    """Seconds between two notifications of the systemd watchdog.
+
+    systemd recommends notifying at half of the configured watchdog timeout.
+    """
+    try:
+        watchdog_usec = int(os.environ.get("WATCHDOG_USEC", ""))
+    except ValueError:
+        return CHECK_INTERVAL
+    return min(CHECK_INTERVAL, watchdog_usec / 2e6)
+
+
+class Watchdog:
+    """Monitors the progress of the recording.
+
+    Args:
+        stall_timeout (Optional[float], optional): Seconds without progress until the
+            recording is considered stalled. `None` disables the stall detection and
+            only keeps notifying the systemd watchdog. Defaults to None.
+        clock (Callable[[], float], optional): The clock to use.
+            Defaults to `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        stall_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.stall_timeout = stall_timeout
+        self._clock = clock
+        self._segment: Callable[[], Optional[str]] = lambda: None
+        self._last_heartbeat = clock()
+        self._segment_path: Optional[str] = None
+        self._segment_size = -1
+        self._last_growth = self._last_heartbeat
+        self._restart_requested = threading.Event()
+        self._restart_pending = False
+        self._healthy = True
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def healthy(self) -> bool:
+        """Whether the systemd watchdog is notified."""
+        return self._healthy
+
+    def heartbeat(self, *args) -> None:
+        """Signal that the record loop makes progress.
+
+        Accepts and ignores any arguments to be usable as a progress callback.
+        """
+        self._last_heartbeat = self._clock()
+
+    def watch_segment(self, segment: Callable[[], Optional[str]]) -> None:
+        """Monitor the growth of the segment recorded.
+
+        Args:
+            segment (Callable[[], Optional[str]]): Returns the path of the video file
+                currently recorded or `None` if not recording.
+        """
+        self._segment = segment
+
+    def take_restart_request(self) -> bool:
+        """Whether a restart of the camera has been requested since the last call."""
+        if not self._restart_requested.is_set():
+            return False
+        self._restart_requested.clear()
+        return True
+
+    def start(self) -> None:
+        """Start checking the progress in a background thread."""
+        if self._thread is not None:
+            return
+        self._last_heartbeat = self._clock()
+        self._last_growth = self._last_heartbeat
+        self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+        self._thread.start()
+        log.write("Watchdog started", log.LogLevel.DEBUG)
+
+    def stop(self) -> None:
+        """Stop checking the progress."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=CHECK_INTERVAL + 1)
+            self._thread = None
+
+    def check(self) -> bool:
+        """Check the progress of the record loop and the recorded segment.
+
+        Returns:
+            bool: Whether the recording is healthy.
+        """
+        if self.stall_timeout is None:
+            return True
+        now = self._clock()
+        loop_healthy = self._check_loop(now)
+        segment_healthy = self._check_segment(now)
+        healthy = loop_healthy and segment_healthy
+        if self._healthy and not healthy:
+            log.write(
+                "Recording stalled, stopped notifying the systemd watchdog",
+                log.LogLevel.ERROR,
+            )
+        elif healthy and not self._healthy:
+            log.write("Recording recovered from stall", log.LogLevel.WARNING)
+        self._healthy = healthy
+        return healthy
+
+    def _check_loop(self, now: float) -> bool:
+        return now - self._last_heartbeat <= self.stall_timeout
+
+    def _check_segment(self, now: float) -> bool:
+        path = self._segment()
+        if path is None:
+            self._segment_path = None
+            self._restart_pending = False
+            return True
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            size = -1
+        if path != self._segment_path or size != self._segment_size:
+            self._segment_path = path
+            self._segment_size = size
+            self._last_growth = now
+            self._restart_pending = False
+            return True
+        if now - self._last_growth <= self.stall_timeout:
+            return True
+        if self._restart_pending:
+            return False
+
+        log.write(
+            f"Video file '{path}' stopped growing, requesting camera restart",
+            log.LogLevel.WARNING,
+        )
+        self._restart_pending = True
+        self._restart_requested.set()
+        self._last_growth = now
+        return True
+
+    def _run(self) -> None:
+        interval = _notify_interval()
+        while not self._stop.wait(interval):
+            if self.check():
+                notify("WATCHDOG=1")
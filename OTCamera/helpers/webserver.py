@@ -0,0 +1,586 @@
+"""OTCamera helper serving the status website, the preview and the videos.
+
+An asyncio HTTP/1.1 server runs in a background thread with the lowest CPU and I/O
+priority, so several clients can be served at once without slowing down the
+recording. It serves
+
+- `/` and `/index.html`: the status website rendered in memory,
+- `/status.json`: the status information,
+- `/preview.jpg`: the latest preview image,
+- `/stream.mjpg`: the live preview as MJPEG stream, encoded only while watched,
+- `/videos/`: a listing of the files in the video directory,
+- `/videos/<name>`: a file of the video directory and
+- any other path: the static files next to the status website, e.g. its CSS.
+
+Files are sent with `sendfile` and support `Range` requests, so an interrupted
+download can be resumed. Each file has an `ETag`. Conditional requests for an
+unchanged file are answered with `304 Not Modified`. Text is compressed with gzip if
+the client accepts it.
+
+Each client of the live preview has a small queue of frames. A client too slow to
+keep up only gets the latest frames, the stale ones are dropped.
+
+"""
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import gzip
+import json
+import mimetypes
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+from urllib.parse import unquote, urlsplit
+
+from OTCamera.helpers import log
+from OTCamera.helpers.live_preview import LivePreview
+from OTCamera.helpers.usb_offload import set_background_priority
+
+IDLE_TIMEOUT = 30.0
+"""Seconds an idle connection is kept open."""
+MAX_HEADERS = 100
+"""Maximum number of header lines of a request."""
+MIN_GZIP_SIZE = 512
+"""Minimum number of bytes of a text to be compressed."""
+MAX_QUEUED_FRAMES = 2
+"""Number of live preview frames queued per client before dropping the oldest."""
+STREAM_PATH = "/stream.mjpg"
+"""Path of the live preview stream."""
+
+_BOUNDARY = "frame"
+
+_TEXT_TYPES = frozenset({"application/json", "application/javascript"})
+_CONTENT_TYPES = {".h264": "video/h264", ".idx": "application/octet-stream"}
+
+
+@dataclass(frozen=True)
+class Request:
+    """A parsed HTTP request.
+
+    Attributes:
+        method (str): The request method, e.g. "GET".
+        path (str): The decoded path of the request target.
+        version (str): The HTTP version, e.g. "HTTP/1.1".
+        headers (dict[str, str]): The headers with lower case names.
+    """
+
+    method: str
+    path: str
+    version: str
+    headers: dict[str, str]
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @property
+    def accepts_gzip(self) -> bool:
+        for coding in self.headers.get("accept-encoding", "").split(","):
+            name, _, params = coding.strip().partition(";")
+            if name.strip().lower() == "gzip":
+                return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.000")
+        return False
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class _LatestFrames:
+    """Queue of the latest frames for a client, fed from the encoder thread.
+
+    Args:
+        loop (asyncio.AbstractEventLoop): The loop of the client's connection.
+        maxlen (int): Number of frames kept. Older frames are dropped.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxlen: int) -> None:
+        self._loop = loop
+        self._frames: deque[bytes] = deque(maxlen=maxlen)
+        self._available = asyncio.Event()
+        self.dropped = 0
+
+    def put_threadsafe(self, frame: bytes) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._put, frame)
+        except RuntimeError:
+            # The loop has been closed while the encoder was still running
+            pass
+
+    def _put(self, frame: bytes) -> None:
+        if len(self._frames) == self._frames.maxlen:
+            self.dropped += 1
+        self._frames.append(frame)
+        self._available.set()
+
+    async def get(self) -> bytes:
+        while not self._frames:
+            self._available.clear()
+            await self._available.wait()
+        return self._frames.popleft()
+
+
+class WebServer:
+    """Serves the status website, the preview and the videos over HTTP.
+
+    Args:
+        host (str): Address the server binds to.
+        port (int): Port of the server. 0 to pick a free port.
+        video_dir (Union[str, Path]): Directory of the videos to serve.
+        preview_path (Union[str, Path]): Path of the preview image.
+        static_dir (Union[str, Path]): Directory of the static files of the status
+            website.
+        status_html (Callable[[], Optional[str]], optional): Returns the status
+            website or `None` if it has not been rendered yet. Defaults to `None`.
+        status_data (Callable[[], dict[str, Any]], optional): Returns the status
+            information. Called in a worker thread. Defaults to no information.
+        live_preview (Optional[LivePreview], optional): Provides the frames of the
+            live preview stream. Defaults to None, which disables the stream.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        video_dir: Union[str, Path],
+        preview_path: Union[str, Path],
+        static_dir: Union[str, Path],
+        status_html: Callable[[], Optional[str]] = lambda: None,
+        status_data: Callable[[], dict[str, Any]] = dict,
+        live_preview: Optional[LivePreview] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.video_dir = Path(video_dir)
+        self.preview_path = Path(preview_path)
+        self.static_dir = Path(static_dir).resolve()
+        self._status_html = status_html
+        self._status_data = status_data
+        self._live_preview = live_preview
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def server_port(self) -> Optional[int]:
+        """The port the server is bound to."""
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    def start(self) -> None:
+        """Start serving in a background thread once the port is bound.
+
+        Raises:
+            OSError: If the server cannot bind to the port.
+        """
+        if self._thread is not None:
+            return
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="webserver", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+        log.write(
+            f"Serving status website on http://{self.host}:{self.server_port}/",
+            log.LogLevel.DEBUG,
+        )
+
+    def stop(self) -> None:
+        """Stop serving and close all connections."""
+        if self._thread is None:
+            return
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        set_background_priority()
+        self._executor = ThreadPoolExecutor(
+            max_workers=2,
+            thread_name_prefix="webserver",
+            initializer=set_background_priority,
+        )
+        try:
+            asyncio.run(self._serve())
+        except Exception as cause:
+            if self._ready.is_set():
+                log.write(f"Web server failed: {cause}", log.LogLevel.EXCEPTION)
+            else:
+                self._error = cause
+        finally:
+            self._executor.shutdown(wait=False)
+            self._server = None
+            self._loop = None
+            self._ready.set()
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._ready.set()
+        await self._stopped.wait()
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        _read_request(reader), IDLE_TIMEOUT
+                    )
+                except _BadRequest:
+                    await self._send_error(writer, HTTPStatus.BAD_REQUEST, None)
+                    return
+                if request is None:
+                    return
+                await self._respond(request, writer)
+                if not request.keep_alive or request.path == STREAM_PATH:
+                    return
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as cause:
+            log.write(f"Web server request failed: {cause}", log.LogLevel.WARNING)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        if request.method not in ("GET", "HEAD"):
+            await self._send_error(
+                writer,
+                HTTPStatus.METHOD_NOT_ALLOWED,
+                request,
+                {"Allow": "GET, HEAD"},
+            )
+        elif request.path in ("/", "/index.html"):
+            html = self._status_html()
+            if html is None:
+                await self._send_error(writer, HTTPStatus.SERVICE_UNAVAILABLE, request)
+            else:
+                await self._send_text(
+                    writer, request, html.encode(), "text/html; charset=utf-8"
+                )
+        elif request.path == "/status.json":
+            data = await self._in_worker(self._status_data)
+            await self._send_text(
+                writer, request, json.dumps(data).encode(), "application/json"
+            )
+        elif request.path == STREAM_PATH and self._live_preview is not None:
+            await self._send_stream(writer, request, self._live_preview)
+        elif request.path == "/preview.jpg":
+            await self._send_file(writer, request, self.preview_path)
+        elif request.path == "/videos/":
+            listing = await self._in_worker(self._list_videos)
+            await self._send_text(
+                writer, request, json.dumps(listing).encode(), "application/json"
+            )
+        elif request.path.startswith("/videos/"):
+            await self._send_file(
+                writer, request, self._video_file(request.path[len("/videos/") :])
+            )
+        else:
+            await self._send_file(
+                writer, request, self._static_file(request.path.lstrip("/"))
+            )
+
+    def _list_videos(self) -> list[dict[str, Any]]:
+        files = []
+        for entry in sorted(os.scandir(self.video_dir), key=lambda entry: entry.name):
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            files.append(
+                {"name": entry.name, "size": stat.st_size, "mtime": stat.st_mtime}
+            )
+        return files
+
+    def _video_file(self, filename: str) -> Optional[Path]:
+        if not filename or "/" in filename or filename.startswith("."):
+            return None
+        return self.video_dir / filename
+
+    def _static_file(self, relative_path: str) -> Optional[Path]:
+        path = (self.static_dir / relative_path).resolve()
+        if not path.is_relative_to(self.static_dir):
+            return None
+        return path
+
+    async def _send_file(
+        self,
+        writer: asyncio.StreamWriter,
+        request: Request,
+        path: Optional[Path],
+    ) -> None:
+        try:
+            if path is None:
+                raise FileNotFoundError()
+            file = open(path, "rb")
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            await self._send_error(writer, HTTPStatus.NOT_FOUND, request)
+            return
+        with file:
+            stat = os.fstat(file.fileno())
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            content_type = _content_type(path)
+            if _etags(request.headers.get("if-none-match", "")) & {
+                "*",
+                etag,
+                _gzip_etag(etag),
+            }:
+                await self._send_head(
+                    writer, HTTPStatus.NOT_MODIFIED, request, {"ETag": etag}
+                )
+                return
+            if _is_text(content_type):
+                body = await self._in_worker(file.read)
+                await self._send_text(
+                    writer, request, body, content_type, {"ETag": etag}
+                )
+                return
+            size = stat.st_size
+            headers = {"Content-Type": content_type, "ETag": etag}
+            byte_range = None
+            if request.headers.get("if-range", etag) == etag:
+                try:
+                    byte_range = _parse_range(request.headers.get("range"), size)
+                except ValueError:
+                    await self._send_error(
+                        writer,
+                        HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                        request,
+                        {"Content-Range": f"bytes */{size}"},
+                    )
+                    return
+            status = HTTPStatus.OK
+            offset, count = 0, size
+            if byte_range is not None:
+                status = HTTPStatus.PARTIAL_CONTENT
+                offset, count = byte_range[0], byte_range[1] - byte_range[0] + 1
+                headers[
+                    "Content-Range"
+                ] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+            headers["Content-Length"] = str(count)
+            await self._send_head(writer, status, request, headers)
+            if request.method != "HEAD" and count:
+                loop = asyncio.get_running_loop()
+                await loop.sendfile(writer.transport, file, offset, count)
+
+    async def _send_stream(
+        self, writer: asyncio.StreamWriter, request: Request, live_preview: LivePreview
+    ) -> None:
+        """Send the live preview frames until the client disconnects."""
+        headers = {
+            "Content-Type": f"multipart/x-mixed-replace; boundary={_BOUNDARY}",
+            "Cache-Control": "no-cache, no-store",
+            "Accept-Ranges": "none",
+            "Connection": "close",
+        }
+        if request.method == "HEAD":
+            await self._send_head(writer, HTTPStatus.OK, request, headers)
+            return
+        frames = _LatestFrames(asyncio.get_running_loop(), MAX_QUEUED_FRAMES)
+        # Only requests the encoder, which is started by the record loop
+        live_preview.subscribe(frames.put_threadsafe)
+        try:
+            await self._send_head(writer, HTTPStatus.OK, request, headers)
+            while True:
+                frame = await asyncio.wait_for(frames.get(), IDLE_TIMEOUT)
+                writer.write(
+                    f"--{_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(frame)}\r\n\r\n".encode()
+                )
+                writer.write(frame)
+                writer.write(b"\r\n")
+                await writer.drain()
+        finally:
+            live_preview.unsubscribe(frames.put_threadsafe)
+            log.write(
+                f"Live preview client left, {frames.dropped} frames dropped",
+                log.LogLevel.DEBUG,
+            )
+
+    async def _send_text(
+        self,
+        writer: asyncio.StreamWriter,
+        request: Request,
+        body: bytes,
+        content_type: str,
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        headers = {"Content-Type": content_type, "Vary": "Accept-Encoding"} | (
+            headers or {}
+        )
+        if request.accepts_gzip and len(body) >= MIN_GZIP_SIZE:
+            body = await self._in_worker(gzip.compress, body, 6, mtime=0)
+            headers["Content-Encoding"] = "gzip"
+            if "ETag" in headers:
+                # The compressed representation needs its own tag
+                headers["ETag"] = _gzip_etag(headers["ETag"])
+        headers["Content-Length"] = str(len(body))
+        await self._send_head(writer, HTTPStatus.OK, request, headers)
+        if request.method != "HEAD":
+            writer.write(body)
+            await writer.drain()
+
+    async def _send_error(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        request: Optional[Request],
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        body = f"{status.value} {status.phrase}\n".encode()
+        headers = {
+            "Content-Type": "text/plain; charset=utf-8",
+            "Content-Length": str(len(body)),
+        } | (headers or {})
+        await self._send_head(writer, status, request, headers)
+        if request is None or request.method != "HEAD":
+            writer.write(body)
+            await writer.drain()
+
+    async def _send_head(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        request: Optional[Request],
+        headers: dict[str, str],
+    ) -> None:
+        keep_alive = request is not None and request.keep_alive
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Connection": "keep-alive" if keep_alive else "close",
+        } | headers
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _in_worker(self, function: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function in a worker thread of low priority."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: function(*args, **kwargs)
+        )
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Read the request line and the headers of the next request.
+
+    Returns:
+        Optional[Request]: The request or `None` if the client closed the connection.
+
+    Raises:
+        _BadRequest: If the request is malformed.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise _BadRequest()
+    if not version.startswith("HTTP/1."):
+        raise _BadRequest()
+    headers: dict[str, str] = {}
+    for _ in range(MAX_HEADERS + 1):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator:
+            raise _BadRequest()
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise _BadRequest()
+    return Request(method, unquote(urlsplit(target).path), version, headers)
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """The first and last byte of a single range of a `Range` header.
+
+    Returns:
+        Optional[tuple[int, int]]: The inclusive byte range or `None` to send the
+            whole file, e.g. if no or several ranges are requested.
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    if header is None:
+        return None
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, separator, last = ranges.strip().partition("-")
+    if not separator or not (first.isdigit() or last.isdigit()):
+        return None
+    if not first:
+        # A suffix range of the last bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = int(last) if last.isdigit() else size - 1
+    if start >= size:
+        raise ValueError(header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _etags(header: str) -> set[str]:
+    """The entity tags of an `If-None-Match` header, ignoring weakness."""
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def _gzip_etag(etag: str) -> str:
+    return etag[:-1] + '-gzip"'
+
+
+def _content_type(path: Path) -> str:
+    content_type = _CONTENT_TYPES.get(path.suffix)
+    if content_type is None:
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return content_type
+
+
+def _is_text(content_type: str) -> bool:
+    return content_type.startswith("text/") or content_type in _TEXT_TYPES
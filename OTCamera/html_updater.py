@@ -35,16 +35,20 @@ Variables:
 # You should have received a copy of the GNU General Public License along with this
 # program.  If not, see <https://www.gnu.org/licenses/>.
 
+from __future__ import annotations
+
 import copy
 from abc import ABC
 from dataclasses import dataclass, fields
 from enum import Enum
+from functools import cached_property
 from pathlib import Path
-from typing import Any, Tuple, Union
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Union
 
-from bs4 import BeautifulSoup, Tag
+from OTCamera.helpers import log, metrics
 
-from OTCamera.helpers import log
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, Tag
 
 
 class StatusHtmlId(Enum):
@@ -65,6 +69,12 @@ class StatusHtmlId(Enum):
     EXT_POWER_SUPPLY_CONNECTED = "ext-power-supply-connected"
     MS_TEAMS_WEBHOOK_ENABLED = "ms-teams-webhook-enabled"
     TIME_UNTIL_WIFI_OFF = "time-until-wifi-off"
+    CPU_LOAD = "cpu-load"
+    SOC_TEMPERATURE = "soc-temperature"
+    THROTTLED = "throttled"
+    MEMORY_AVAILABLE = "memory-available"
+    SD_WRITE_LATENCY = "sd-write-latency"
+    FRAME_DROPS = "frame-drops"
 
 
 class ConfigHtmlId(Enum):
@@ -132,6 +142,10 @@ class OTCameraDataObject(ABC):
         """Returns all properties of this class as a list of tuples."""
         return [getattr(self, field.name) for field in fields(self)]
 
+    def to_dict(self) -> dict[str, Any]:
+        """Returns the values of all properties by their HTML id."""
+        return {html_id.value: value for html_id, value in self.get_properties()}
+
 
 @dataclass
 class StatusDataObject(OTCameraDataObject):
@@ -145,6 +159,12 @@ class StatusDataObject(OTCameraDataObject):
     external_power_supply_connected: Tuple[Enum, bool]
     ms_teams_webhook_enabled: Tuple[Enum, bool]
     time_until_wifi_off: Tuple[Enum, str]
+    cpu_load: Tuple[Enum, str]
+    soc_temperature: Tuple[Enum, str]
+    throttled: Tuple[Enum, str]
+    memory_available: Tuple[Enum, str]
+    sd_write_latency: Tuple[Enum, str]
+    frame_drops: Tuple[Enum, int]
 
 
 @dataclass
@@ -196,6 +216,12 @@ STATUS_DESC = {
     StatusHtmlId.EXT_POWER_SUPPLY_CONNECTED: "External Power Supply Connected",
     StatusHtmlId.MS_TEAMS_WEBHOOK_ENABLED: "MS Teams Webhook Enabled",
     StatusHtmlId.TIME_UNTIL_WIFI_OFF: "Turn Wi-Fi Off In",
+    StatusHtmlId.CPU_LOAD: "CPU Load (1 min)",
+    StatusHtmlId.SOC_TEMPERATURE: "SoC Temperature",
+    StatusHtmlId.THROTTLED: "Throttling",
+    StatusHtmlId.MEMORY_AVAILABLE: "Available Memory",
+    StatusHtmlId.SD_WRITE_LATENCY: "SD Card Write Latency",
+    StatusHtmlId.FRAME_DROPS: "Frames Dropped Recently",
 }
 """Dictionary that maps a StatusHtmlId to its description to be displayed on the status
 website.
@@ -337,8 +363,8 @@ class StatusWebsiteUpdater:
         config_table_id: str = "config-info-table",
         debug_mode_on: bool = False,
     ) -> None:
-        self._html_data = self._parse_html(template_html_path)
-        self._offline_html_data = self._parse_html(offline_html_path)
+        self.template_html_path = template_html_path
+        self.offline_html_path = offline_html_path
         self.html_save_path = html_save_path
         self.status_info_id = status_info_id
         self.config_info_id = config_info_id
@@ -346,7 +372,12 @@ class StatusWebsiteUpdater:
         self.status_table_id = status_table_id
         self.config_table_id = config_table_id
         self.debug_mode_on = debug_mode_on
+        self.html: Optional[str] = None
 
+    @metrics.timed(
+        "otcamera_update_status_website_seconds",
+        "Duration of updating the status website.",
+    )
     def update_info(
         self,
         status_info: OTCameraDataObject,
@@ -535,8 +566,20 @@ class StatusWebsiteUpdater:
             self._disable_tag_by_id(html_tree, self.log_info_id)
         self._save(html_tree)
 
-    def _parse_html(self, html_filepath: Path) -> BeautifulSoup:
+    @cached_property
+    def _html_data(self) -> BeautifulSoup:
+        """The parsed template HTML. Parsed on first use."""
+        return self._parse_html(self.template_html_path)
+
+    @cached_property
+    def _offline_html_data(self) -> BeautifulSoup:
+        """The parsed offline HTML. Parsed on first use."""
+        return self._parse_html(self.offline_html_path)
+
+    def _parse_html(self, html_filepath: Union[str, Path]) -> BeautifulSoup:
         """Parses an html file and returns BeautifulSoup object."""
+        from bs4 import BeautifulSoup
+
         with open(html_filepath) as html_stream:
             soup = BeautifulSoup(html_stream, "html.parser")
         return soup
@@ -552,9 +595,13 @@ class StatusWebsiteUpdater:
             self._change_content(html_tree.find(id=id.value), str(update_content))
 
     def _save(self, html_tree: Tag):
-        """Saves the HTML to path defined by `self.html_save_path`."""
+        """Saves the HTML to path defined by `self.html_save_path`.
+
+        The HTML is kept in `self.html` to be served from memory.
+        """
+        self.html = str(html_tree)
         with open(self.html_save_path, "w", encoding="utf-8") as f:
-            f.write(str(html_tree))
+            f.write(self.html)
 
     def _disable_tag_by_id(self, html_tag: Tag, id: str) -> None:
         """Disables a tag by id making it invisible."""
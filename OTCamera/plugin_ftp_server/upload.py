@@ -1,5 +1,6 @@
-from ftplib import FTP
+from ftplib import FTP, error_perm
 from pathlib import Path
+from typing import Callable, Optional
 
 from OTCamera.plugin_ftp_server.errors import FtpTraversalError, FtpUploadError
 
@@ -10,9 +11,22 @@ class FtpUpload:
     The instance operates on an already connected and authenticated ftplib.FTP
     client. It first navigates to (and creates, if necessary) the destination
     directory on the server, then stores the file using the STOR command.
+
+    The directory navigated to is remembered. Further uploads to the same directory
+    with the same client do not navigate again.
     """
 
-    def upload(self, client: FTP, source: Path, dest: Path) -> None:
+    def __init__(self) -> None:
+        self._current_dir: Optional[tuple[FTP, Path]] = None
+
+    def upload(
+        self,
+        client: FTP,
+        source: Path,
+        dest: Path,
+        callback: Optional[Callable[[bytes], None]] = None,
+        offset: int = 0,
+    ) -> None:
         """Upload a local file to a remote FTP path.
 
         Args:
@@ -22,6 +36,10 @@ class FtpUpload:
                 readable.
             dest (Path): Remote target path (including filename). Parent directories
                 will be traversed and created if missing.
+            callback (Optional[Callable[[bytes], None]]): Called with each block of
+                data sent. Defaults to None.
+            offset (int): Number of bytes already on the server. The upload
+                continues at this offset. Defaults to 0.
 
         Raises:
             FtpTraversalError: If navigating to or creating destination directories
@@ -29,9 +47,74 @@ class FtpUpload:
             FtpUploadError: If the upload operation fails.
         """
         self._navigate_to_dir(client, dest.parent)
-        self._do_upload(client, source=source, dest=dest)
+        self._do_upload(
+            client, source=source, dest=dest, callback=callback, offset=offset
+        )
+
+    def remote_size(self, client: FTP, dest: Path) -> int:
+        """Size of a remote file in bytes.
+
+        Args:
+            client (ftplib.FTP): Connected and authenticated FTP client.
+            dest (Path): Remote path of the file. Parent directories will be
+                traversed and created if missing.
+
+        Returns:
+            int: The size of the file or 0 if it does not exist.
+
+        Raises:
+            FtpTraversalError: If navigating to or creating destination directories
+                fails.
+        """
+        self._navigate_to_dir(client, dest.parent)
+        # SIZE reports the number of bytes only in binary mode
+        client.voidcmd("TYPE I")
+        try:
+            size = client.size(dest.name)
+        except error_perm:
+            return 0
+        return size or 0
+
+    def list_dir(self, client: FTP, directory: Path) -> Optional[dict[str, int]]:
+        """List the files of a remote directory with a single MLSD command.
+
+        Args:
+            client (ftplib.FTP): Connected and authenticated FTP client.
+            directory (Path): Remote directory to list. Created if missing.
+
+        Returns:
+            Optional[dict[str, int]]: The size in bytes of each file in the
+                directory or `None` if the server does not support MLSD.
+
+        Raises:
+            FtpTraversalError: If navigating to or creating the directory fails.
+        """
+        self._navigate_to_dir(client, directory)
+        try:
+            entries = client.mlsd(facts=["type", "size"])
+            return {
+                name: int(facts.get("size", 0))
+                for name, facts in entries
+                if facts.get("type") == "file"
+            }
+        except error_perm:
+            return None
 
     def _navigate_to_dir(self, client: FTP, directory: Path) -> None:
+        if self._current_dir == (client, directory):
+            return
+        try:
+            # A single round trip if the directory already exists
+            client.cwd(str(Path("/", directory)))
+        except error_perm:
+            self._create_dirs(client, directory)
+        except Exception as cause:
+            raise FtpTraversalError(
+                f"Unable to navigate to directory: {directory}"
+            ) from cause
+        self._current_dir = (client, directory)
+
+    def _create_dirs(self, client: FTP, directory: Path) -> None:
         client.cwd("/")
         try:
             for dir_name in directory.parts:
@@ -46,10 +129,20 @@ class FtpUpload:
                 f"Unable to navigate to directory: {directory}"
             ) from cause
 
-    def _do_upload(self, client: FTP, source: Path, dest: Path) -> None:
+    def _do_upload(
+        self,
+        client: FTP,
+        source: Path,
+        dest: Path,
+        callback: Optional[Callable[[bytes], None]] = None,
+        offset: int = 0,
+    ) -> None:
         try:
             with open(source, "rb") as f:
-                client.storbinary(f"STOR {dest.name}", f)
+                f.seek(offset)
+                client.storbinary(
+                    f"STOR {dest.name}", f, callback=callback, rest=offset or None
+                )
         except Exception as cause:
             raise FtpUploadError(
                 f"Unable to upload file: '{source}' to '{dest}'"
@@ -0,0 +1,13 @@
+class UploadError(Exception):
+    """Base class for all upload-related errors."""
+
+
+class UploadConnectionError(UploadError):
+    """Raised when connecting to or logging in to the upload server fails.
+
+    The original exception of the protocol library is attached as the cause.
+    """
+
+
+class UnsupportedSchemeError(UploadError):
+    """Raised when no transport supports the configured upload scheme."""
@@ -0,0 +1,48 @@
+from OTCamera.plugin_upload.errors import UnsupportedSchemeError
+from OTCamera.plugin_upload.transport import DEFAULT_TIMEOUT, Transport
+
+SCHEMES = ("ftp", "ftps", "sftp", "scp", "http", "https")
+"""Upload schemes supported by `create_transport`."""
+
+
+def create_transport(
+    scheme: str,
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    timeout: int = DEFAULT_TIMEOUT,
+) -> Transport:
+    """Create the transport uploading files with the given scheme.
+
+    "ftp" and "ftps" upload via FTPS. "scp" uploads via SFTP, which every OpenSSH
+    server offers alongside scp and which supports resuming uploads.
+
+    Args:
+        scheme (str): One of `SCHEMES`.
+        host (str): Hostname or IP address of the server.
+        port (int): TCP port of the server.
+        user (str): Username for authentication.
+        password (str): Password for authentication.
+        timeout (int): Timeout in seconds for network operations.
+
+    Returns:
+        Transport: The transport, not connected yet.
+
+    Raises:
+        UnsupportedSchemeError: If the scheme is not supported.
+    """
+    scheme = scheme.lower()
+    if scheme in ("ftp", "ftps"):
+        from OTCamera.plugin_upload.ftp import FtpTransport
+
+        return FtpTransport(host, port, user, password, timeout)
+    if scheme in ("sftp", "scp"):
+        from OTCamera.plugin_upload.sftp import SftpTransport
+
+        return SftpTransport(host, port, user, password, timeout)
+    if scheme in ("http", "https"):
+        from OTCamera.plugin_upload.http import HttpTransport
+
+        return HttpTransport(host, port, user, password, timeout, scheme=scheme)
+    raise UnsupportedSchemeError(f"Unsupported upload scheme: '{scheme}'")
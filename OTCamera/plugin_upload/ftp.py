@@ -0,0 +1,55 @@
+from ftplib import FTP
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+from OTCamera.plugin_ftp_server.connect import FtpsServerConnect
+from OTCamera.plugin_ftp_server.upload import FtpUpload
+from OTCamera.plugin_upload.transport import ProgressCallback, Transport
+
+
+class FtpTransport(Transport):
+    """Uploads files to an FTPS server.
+
+    Directories are listed with a single MLSD command. An interrupted upload is
+    resumed with the REST command at the size the server reports for the partial
+    file.
+    """
+
+    scheme = "ftps"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._client: Optional[FTP] = None
+        self._uploader = FtpUpload()
+
+    def _connect(self) -> None:
+        self._client = FtpsServerConnect().connect(
+            self.host, self.port, self.user, self.password, self.timeout
+        )
+
+    def _close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def _list_dir(self, directory: PurePosixPath) -> Optional[dict[str, int]]:
+        return self._uploader.list_dir(self._client, Path(directory))
+
+    def _remote_size(self, dest: PurePosixPath) -> int:
+        return self._uploader.remote_size(self._client, Path(dest))
+
+    def _send(
+        self,
+        source: Path,
+        dest: PurePosixPath,
+        offset: int,
+        size: int,
+        progress: ProgressCallback,
+    ) -> None:
+        self._uploader.upload(
+            self._client,
+            source=source,
+            dest=Path(dest),
+            callback=lambda block: progress(len(block)),
+            offset=offset,
+        )
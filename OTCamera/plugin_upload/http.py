@@ -0,0 +1,108 @@
+from pathlib import Path, PurePath, PurePosixPath
+from typing import Iterator, Optional, Union
+from urllib.parse import quote
+
+import requests
+
+from OTCamera.plugin_upload.transport import ProgressCallback, Transport
+
+# Status codes of servers that do not report the size of partial uploads
+_NO_REMOTE_SIZE = {404, 405, 501}
+TUS_VERSION = "1.0.0"
+"""Version of the tus resumable upload protocol used to resume uploads."""
+
+
+class HttpTransport(Transport):
+    """Uploads files with chunked HTTP requests.
+
+    A session keeps the connection alive between the requests. The file is streamed
+    with chunked transfer encoding and never read into memory as a whole.
+
+    Interrupted uploads are resumed with the tus protocol. A server supporting it
+    reports the number of bytes received in the `Upload-Offset` header of a HEAD
+    request. The missing bytes are then appended with a PATCH request at that
+    offset. Servers without resume support get a partial file again as a whole, as
+    there is no standard way to append with a PUT request.
+
+    Args:
+        scheme (str): Either "http" or "https". Defaults to "https".
+        method (str): HTTP method of the upload, e.g. "PUT" or "POST".
+            Defaults to "PUT".
+    """
+
+    def __init__(
+        self, *args, scheme: str = "https", method: str = "PUT", **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.scheme = scheme
+        self.method = method
+        self._session: Optional[requests.Session] = None
+        # The last file the server reported an upload offset for
+        self._resumable: Optional[PurePosixPath] = None
+
+    def url(self, dest: Union[str, PurePath]) -> str:
+        """The URL of the remote path `dest`."""
+        path = quote(str(PurePosixPath("/", dest)))
+        return f"{self.scheme}://{self.host}:{self.port}{path}"
+
+    def _connect(self) -> None:
+        self._session = requests.Session()
+        if self.user:
+            self._session.auth = (self.user, self.password)
+
+    def _close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _remote_size(self, dest: PurePosixPath) -> int:
+        self._resumable = None
+        response = self._session.head(
+            self.url(dest),
+            headers={"Tus-Resumable": TUS_VERSION},
+            timeout=self.timeout,
+        )
+        if response.status_code in _NO_REMOTE_SIZE:
+            return 0
+        response.raise_for_status()
+        upload_offset = response.headers.get("Upload-Offset")
+        if upload_offset is not None:
+            self._resumable = dest
+            return int(upload_offset)
+        return int(response.headers.get("Content-Length", 0))
+
+    def _can_resume(self, dest: PurePosixPath) -> bool:
+        return dest == self._resumable
+
+    def _send(
+        self,
+        source: Path,
+        dest: PurePosixPath,
+        offset: int,
+        size: int,
+        progress: ProgressCallback,
+    ) -> None:
+        method = self.method
+        headers = {"Content-Type": "application/octet-stream"}
+        if offset:
+            method = "PATCH"
+            headers = {
+                "Content-Type": "application/offset+octet-stream",
+                "Tus-Resumable": TUS_VERSION,
+                "Upload-Offset": str(offset),
+            }
+        response = self._session.request(
+            method,
+            self.url(dest),
+            data=self._stream(source, offset, progress),
+            headers=headers,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+    def _stream(
+        self, source: Path, offset: int, progress: ProgressCallback
+    ) -> Iterator[bytes]:
+        for chunk in self.read_chunks(source, offset):
+            yield chunk
+            progress(len(chunk))
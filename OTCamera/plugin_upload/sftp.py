@@ -0,0 +1,82 @@
+import socket
+import stat
+from pathlib import Path, PurePosixPath
+from typing import Any, Optional
+
+from OTCamera.plugin_upload.errors import UploadConnectionError
+from OTCamera.plugin_upload.transport import ProgressCallback, Transport
+
+
+class SftpTransport(Transport):
+    """Uploads files to an SSH server via SFTP using paramiko.
+
+    Writes are pipelined: the next chunk is sent without waiting for the server to
+    acknowledge the previous one. Thus, the throughput is not limited by the round
+    trip time of the link. An interrupted upload is resumed by writing the missing
+    bytes at the end of the partial file.
+    """
+
+    scheme = "sftp"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._ssh: Optional[Any] = None
+        self._sftp: Optional[Any] = None
+
+    def _connect(self) -> None:
+        try:
+            import paramiko
+        except ImportError as cause:
+            raise UploadConnectionError("SFTP uploads require paramiko") from cause
+
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._ssh = paramiko.Transport(sock)
+        self._ssh.banner_timeout = self.timeout
+        self._ssh.connect(username=self.user, password=self.password)
+        self._sftp = paramiko.SFTPClient.from_transport(self._ssh)
+        self._sftp.get_channel().settimeout(self.timeout)
+
+    def _close(self) -> None:
+        if self._sftp is not None:
+            self._sftp.close()
+            self._sftp = None
+        if self._ssh is not None:
+            self._ssh.close()
+            self._ssh = None
+
+    def _list_dir(self, directory: PurePosixPath) -> Optional[dict[str, int]]:
+        self._make_dirs(directory)
+        return {
+            entry.filename: entry.st_size
+            for entry in self._sftp.listdir_attr(str(directory))
+            if stat.S_ISREG(entry.st_mode or 0)
+        }
+
+    def _remote_size(self, dest: PurePosixPath) -> int:
+        try:
+            return self._sftp.stat(str(dest)).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _send(
+        self,
+        source: Path,
+        dest: PurePosixPath,
+        offset: int,
+        size: int,
+        progress: ProgressCallback,
+    ) -> None:
+        self._make_dirs(dest.parent)
+        with self._sftp.open(str(dest), "r+b" if offset else "wb") as remote:
+            remote.set_pipelined(True)
+            remote.seek(offset)
+            for chunk in self.read_chunks(source, offset):
+                remote.write(chunk)
+                progress(len(chunk))
+
+    def _make_dirs(self, directory: PurePosixPath) -> None:
+        for parent in reversed((directory, *directory.parents)):
+            try:
+                self._sftp.stat(str(parent))
+            except FileNotFoundError:
+                self._sftp.mkdir(str(parent))
@@ -0,0 +1,304 @@
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path, PurePath, PurePosixPath
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+from OTCamera.helpers import log
+from OTCamera.plugin_upload.errors import UploadConnectionError, UploadError
+
+DEFAULT_TIMEOUT = 30
+CHUNK_SIZE = 1024 * 1024
+"""Default number of bytes read from the video file at once."""
+
+ProgressCallback = Callable[[int], None]
+"""Called with the number of bytes sent since the last call."""
+
+
+@dataclass(frozen=True)
+class UploadResult:
+    """Outcome of uploading a single file.
+
+    Attributes:
+        source (Path): The local file uploaded.
+        dest (PurePosixPath): The remote path of the file.
+        offset (int): Number of bytes already on the server, which were not sent.
+        bytes_sent (int): Number of bytes sent.
+        seconds (float): Duration of sending the bytes.
+    """
+
+    source: Path
+    dest: PurePosixPath
+    offset: int
+    bytes_sent: int
+    seconds: float
+
+    @property
+    def resumed(self) -> bool:
+        return self.offset > 0
+
+    @property
+    def throughput(self) -> float:
+        """Average number of bytes sent per second."""
+        return self.bytes_sent / self.seconds if self.seconds > 0 else 0.0
+
+
+class Transport(ABC):
+    """Uploads files to a server, resuming interrupted uploads.
+
+    The connection is opened on the first upload and reused for further uploads
+    until `close` is called. Subclasses implement the protocol specific steps.
+
+    Args:
+        host (str): Hostname or IP address of the server.
+        port (int): TCP port of the server.
+        user (str): Username for authentication.
+        password (str): Password for authentication.
+        timeout (int): Timeout in seconds for network operations.
+        chunk_size (int): Number of bytes read from the file at once.
+        clock (Callable[[], float]): The clock to measure the throughput with.
+    """
+
+    scheme = ""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        timeout: int = DEFAULT_TIMEOUT,
+        chunk_size: int = CHUNK_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._clock = clock
+        self._connected = False
+
+    def __enter__(self) -> "Transport":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def connect(self) -> None:
+        """Connect and log in to the server unless already connected.
+
+        Raises:
+            UploadConnectionError: If connecting or logging in fails.
+        """
+        if self._connected:
+            return
+        try:
+            self._connect()
+        except UploadConnectionError:
+            raise
+        except Exception as cause:
+            raise UploadConnectionError(
+                f"Unable to connect to {self.scheme} server {self.host}:{self.port}"
+            ) from cause
+        self._connected = True
+
+    def close(self) -> None:
+        """Close the connection. Errors are ignored, as the server might be gone."""
+        if not self._connected:
+            return
+        self._connected = False
+        try:
+            self._close()
+        except Exception as cause:
+            log.write(
+                f"Unable to close {self.scheme} connection: {cause}",
+                log.LogLevel.DEBUG,
+            )
+
+    def upload(
+        self,
+        source: Union[str, Path],
+        dest: Union[str, PurePath],
+        progress: Optional[ProgressCallback] = None,
+        resume: bool = True,
+        offset: Optional[int] = None,
+    ) -> UploadResult:
+        """Upload a local file to a remote path.
+
+        If the server already has a part of the file, only the remaining bytes are
+        sent.
+
+        Args:
+            source (Union[str, Path]): Local file to upload.
+            dest (Union[str, PurePath]): Remote target path including the filename.
+                Missing parent directories are created.
+            progress (Optional[ProgressCallback]): Called after each chunk with the
+                number of bytes sent. Defaults to None.
+            resume (bool): Whether to resume a partial upload. Defaults to True.
+            offset (Optional[int]): Number of bytes of the file already on the
+                server if known, e.g. from `plan_sync`. Queried from the server if
+                `None` and `resume` is set. Defaults to None.
+
+        Returns:
+            UploadResult: The number of bytes sent and the throughput.
+
+        Raises:
+            UploadConnectionError: If connecting to the server fails.
+            UploadError: If the upload fails.
+        """
+        source = Path(source)
+        dest = PurePosixPath(dest)
+        self.connect()
+        report = progress if progress is not None else _ignore_progress
+        try:
+            size = source.stat().st_size
+            if offset is None:
+                offset = self._remote_size(dest) if resume else 0
+            if offset > size or (offset < size and not self._can_resume(dest)):
+                offset = 0
+            start = self._clock()
+            if offset < size or size == 0:
+                self._send(source, dest, offset, size, report)
+            seconds = self._clock() - start
+        except UploadError:
+            raise
+        except Exception as cause:
+            raise UploadError(f"Unable to upload '{source}' to '{dest}'") from cause
+        result = UploadResult(source, dest, offset, size - offset, seconds)
+        log.write(
+            f"Uploaded '{source.name}' via {self.scheme}: {result.bytes_sent} bytes "
+            f"at {result.throughput / 1e6:.1f} MB/s"
+            + (f", resumed at byte {offset}" if result.resumed else ""),
+            log.LogLevel.DEBUG,
+        )
+        return result
+
+    def plan_sync(
+        self, sources: Iterable[Union[str, Path]], dest_dir: Union[str, PurePath]
+    ) -> list[tuple[Path, Optional[int]]]:
+        """Decide which files the server is missing with a single listing.
+
+        Files are compared by name and size with the listing of `dest_dir`. Only a
+        transport unable to list directories queries each file separately.
+
+        Args:
+            sources (Iterable[Union[str, Path]]): Local files to sync.
+            dest_dir (Union[str, PurePath]): Remote directory to sync the files to.
+
+        Returns:
+            list[tuple[Path, Optional[int]]]: The files missing or incomplete on the
+                server, each with the number of bytes already on the server. The
+                number is `None` if the transport cannot list directories.
+
+        Raises:
+            UploadConnectionError: If connecting to the server fails.
+            UploadError: If listing the directory fails.
+        """
+        dest_dir = PurePosixPath(dest_dir)
+        self.connect()
+        try:
+            remote_files = self._list_dir(dest_dir)
+        except Exception as cause:
+            raise UploadError(f"Unable to list '{dest_dir}'") from cause
+        plan: list[tuple[Path, Optional[int]]] = []
+        for source in map(Path, sources):
+            if remote_files is None:
+                plan.append((source, None))
+                continue
+            remote_size = remote_files.get(source.name)
+            if remote_size is None:
+                plan.append((source, 0))
+            elif remote_size != source.stat().st_size:
+                plan.append((source, remote_size))
+        return plan
+
+    def sync(
+        self,
+        sources: Iterable[Union[str, Path]],
+        dest_dir: Union[str, PurePath],
+        progress: Optional[ProgressCallback] = None,
+    ) -> Iterator[UploadResult]:
+        """Upload the files the server is missing to `dest_dir`.
+
+        Partial files on the server are resumed. Files already complete on the
+        server are not uploaded again.
+
+        Args:
+            sources (Iterable[Union[str, Path]]): Local files to sync.
+            dest_dir (Union[str, PurePath]): Remote directory to sync the files to.
+            progress (Optional[ProgressCallback]): Called after each chunk with the
+                number of bytes sent. Defaults to None.
+
+        Yields:
+            UploadResult: The result of each file on the server after the sync. Files
+                already complete on the server are reported without bytes sent.
+
+        Raises:
+            UploadConnectionError: If connecting to the server fails.
+            UploadError: If listing the directory or an upload fails.
+        """
+        sources = [Path(source) for source in sources]
+        dest_dir = PurePosixPath(dest_dir)
+        plan = dict(self.plan_sync(sources, dest_dir))
+        log.write(
+            f"{len(plan)} of {len(sources)} videos missing on the {self.scheme} "
+            "server",
+            log.LogLevel.DEBUG,
+        )
+        for source in sources:
+            dest = dest_dir / source.name
+            if source in plan:
+                yield self.upload(source, dest, progress, offset=plan[source])
+            else:
+                size = source.stat().st_size
+                yield UploadResult(source, dest, size, 0, 0.0)
+
+    def read_chunks(self, source: Path, offset: int) -> Iterator[bytes]:
+        """Read `source` from `offset` to its end in chunks of `chunk_size`."""
+        with open(source, "rb") as file:
+            file.seek(offset)
+            while chunk := file.read(self.chunk_size):
+                yield chunk
+
+    @abstractmethod
+    def _connect(self) -> None:
+        pass
+
+    @abstractmethod
+    def _close(self) -> None:
+        pass
+
+    def _list_dir(self, directory: PurePosixPath) -> Optional[dict[str, int]]:
+        """The size of each file in a remote directory, which is created if missing.
+
+        Returns `None` if the protocol cannot list directories.
+        """
+        return None
+
+    @abstractmethod
+    def _remote_size(self, dest: PurePosixPath) -> int:
+        """Number of bytes of `dest` on the server or 0 if it does not exist."""
+
+    def _can_resume(self, dest: PurePosixPath) -> bool:
+        """Whether the server can append to the partial file `dest`.
+
+        Otherwise a partial file is uploaded again as a whole.
+        """
+        return True
+
+    @abstractmethod
+    def _send(
+        self,
+        source: Path,
+        dest: PurePosixPath,
+        offset: int,
+        size: int,
+        progress: ProgressCallback,
+    ) -> None:
+        """Send the bytes of `source` from `offset` on to `dest`."""
+
+
+def _ignore_progress(num_bytes: int) -> None:
+    pass
@@ -23,16 +23,20 @@ It is configured by config.py.
 import errno
 import signal
 import sys
+import threading
 from datetime import datetime as dt
 from pathlib import Path
-from time import sleep
-from typing import Union
+from typing import Optional, Union
 
 from OTCamera import config, status
 from OTCamera.hardware import button, led
 from OTCamera.hardware.camera import Camera
-from OTCamera.helpers import log, name
+from OTCamera.helpers import events, log, metrics, name, startup
+from OTCamera.helpers.config_watcher import ConfigWatcher
 from OTCamera.helpers.filesystem import delete_old_files
+from OTCamera.helpers.telemetry import TelemetryCollector
+from OTCamera.helpers.transfer_scheduler import TransferScheduler
+from OTCamera.helpers.watchdog import Watchdog
 from OTCamera.html_updater import (
     ConfigDataObject,
     ConfigHtmlId,
@@ -54,9 +58,11 @@ class OTCamera:
         camera: Camera,
         html_updater: StatusWebsiteUpdater,
         capture_preview_immediately: bool = False,
-        video_dir: Union[str, Path] = config.VIDEO_DIR,
-        log_dir: Union[str, Path] = config.VIDEO_DIR,
-        num_log_files_html: int = config.NUM_LOG_FILES_HTML,
+        video_dir: Optional[Union[str, Path]] = None,
+        log_dir: Optional[Union[str, Path]] = None,
+        num_log_files_html: Optional[int] = None,
+        watchdog: Optional[Watchdog] = None,
+        telemetry: Optional[TelemetryCollector] = None,
     ) -> None:
         """Constructor to initialise the OTCamera class.
 
@@ -72,20 +78,41 @@ class OTCamera:
             files. Defaults to config.VIDEO_DIR.
             num_log_files_html (int, optional): The number of logfiles to be displayed
             on the status website. Defaults to config.NUM_LOG_FILES_HTML.
+            watchdog (Watchdog, optional): The watchdog monitoring the record loop.
+            Defaults to None.
+            telemetry (TelemetryCollector, optional): Samples the system resources
+            displayed on the status website. Defaults to None.
         """
         self._camera = camera
         self._html_updater = html_updater
         self._capture_preview_immediately = capture_preview_immediately
-        self._video_dir = Path(video_dir)
-        self._log_dir = Path(log_dir)
-        self._num_log_files_html = num_log_files_html
+        self._video_dir = Path(config.VIDEO_DIR if video_dir is None else video_dir)
+        self._log_dir = Path(config.VIDEO_DIR if log_dir is None else log_dir)
+        self._num_log_files_html = (
+            config.NUM_LOG_FILES_HTML
+            if num_log_files_html is None
+            else num_log_files_html
+        )
+        self._watchdog = watchdog
+        self._telemetry = telemetry
         self._shutdown = False
+        # The status website is only rendered again when its status changed
+        self._html_outdated = threading.Event()
+        self._html_outdated.set()
+        self._unsubscribe_status = status.store.subscribe(
+            lambda old, new: self._html_outdated.set(),
+            "recording",
+            "hour_button_pressed",
+            "external_power_connected",
+            "battery_is_low",
+        )
 
         self._register_shutdown_action()
 
         Path(self._video_dir).mkdir(exist_ok=True)
 
         # Initializes the LEDs and Wifi AP
+        log.otc()
         if config.OTCAMERA_VERSION is not None:
             log.write(f"OTCamera Version: {config.OTCAMERA_VERSION}")
         log.breakline()
@@ -94,6 +121,7 @@ class OTCamera:
         if config.USE_BUTTONS:
             button.init_wifi_button()
 
+    @metrics.timed("otcamera_loop_seconds", "Duration of an iteration of the loop.")
     def loop(self) -> None:
         """Record and split videos.
 
@@ -102,16 +130,26 @@ class OTCamera:
         after recording time ends.
 
         """
+        if self._watchdog is not None:
+            self._watchdog.heartbeat()
+            if self._watchdog.take_restart_request():
+                log.write("Restarting stalled camera", log.LogLevel.WARNING)
+                self._camera.restart()
+
+        # Handle the button events between the camera operations
+        events.dispatcher.dispatch()
+
+        state = status.store.state
         if (
-            not status.power_button_pressed
-            and status.power_button_pressed_time is not None
+            not state.power_button_pressed
+            and state.power_button_pressed_time is not None
         ):
             button.handle_power_button_off_state()
 
         if (
-            not status.wifi_button_pressed
-            and status.wifi_on
-            and status.wifi_button_pressed_time is not None
+            not state.wifi_button_pressed
+            and state.wifi_on
+            and state.wifi_button_pressed_time is not None
         ):
             button.handle_wifi_button_off_state()
 
@@ -122,16 +160,12 @@ class OTCamera:
             self._try_capture_preview()
         else:
             self._camera.stop_recording()
-            if not status.html_updated_after_recording:
-                self._html_updater.update_info(
-                    status.get_status_data(),
-                    self._get_config_settings(),
-                    status.recording,
-                    status.hour_button_pressed,
-                    status.external_power_connected,
-                )
-                status.html_updated_after_recording = True
-            sleep(0.5)
+            self._camera.apply_pending_config()
+            if self._html_outdated.is_set():
+                self._html_outdated.clear()
+                self._update_html()
+            # Wakes up at once to handle a button event
+            events.dispatcher.wait(0.5)
 
     def _send_alive_signal(self) -> None:
         """Sends alive signal every 5 seconds using the power LED."""
@@ -139,13 +173,15 @@ class OTCamera:
         alive_signal_interval = 5  # in seconds
         is_send_time = (current_second % alive_signal_interval) == 3
 
-        if is_send_time and not status.power_led_blinked:
+        power_led_blinked = status.store.state.power_led_blinked
+
+        if is_send_time and not power_led_blinked:
             log.write("blink power led", level=log.LogLevel.DEBUG)
             led.power_blink()
-            status.power_led_blinked = True
-        elif (not is_send_time) and status.power_led_blinked:
+            status.store.update(power_led_blinked=True)
+        elif (not is_send_time) and power_led_blinked:
             log.write("reset power_led_blinked", level=log.LogLevel.DEBUG)
-            status.power_led_blinked = False
+            status.store.update(power_led_blinked=False)
 
     def _try_capture_preview(self) -> None:
         """Tries capturing a preview image.
@@ -160,26 +196,34 @@ class OTCamera:
         current_second = dt.now().second
         # To make sure that preview and split are not called in the same second
         # we use offset -1 second. Otherwise picamerax could crash.
-        offset = config.PREVIEW_INTERVAL - 1
-        is_preview_time = (current_second % config.PREVIEW_INTERVAL) == offset
-        time_preview = is_preview_time and status.wifi_on and not status.preview_taken
+        preview_interval = config.settings.preview.interval
+        offset = preview_interval - 1
+        is_preview_time = (current_second % preview_interval) == offset
+        state = status.store.state
+        time_preview = is_preview_time and state.wifi_on and not state.preview_taken
 
         if (
             self._capture_preview_immediately or time_preview
-        ) and not status.shutdownactive:
+        ) and not state.shutdownactive:
             log.write("new preview", level=log.LogLevel.DEBUG)
             self._camera.capture()
-            self._html_updater.update_info(
-                status.get_status_data(),
-                self._get_config_settings(),
-                status.recording,
-                status.hour_button_pressed,
-                status.external_power_connected,
-            )
-            status.preview_taken = True
-        elif not (is_preview_time or not status.preview_taken):
+            self._html_outdated.clear()
+            self._update_html()
+            status.store.update(preview_taken=True)
+        elif not (is_preview_time or not state.preview_taken):
             log.write("reset preview_taken", level=log.LogLevel.DEBUG)
-            status.preview_taken = False
+            status.store.update(preview_taken=False)
+
+    def _update_html(self) -> None:
+        """Render the status website with the current status."""
+        state = status.store.state
+        self._html_updater.update_info(
+            status.get_status_data(self._telemetry),
+            self._get_config_settings(),
+            state.recording,
+            state.hour_button_pressed,
+            state.external_power_connected,
+        )
 
     def record(self) -> None:
         """Run init and record loop.
@@ -194,7 +238,7 @@ class OTCamera:
 
         """
         try:
-            while status.more_intervals:
+            while status.store.state.more_intervals:
                 try:
                     self.loop()
                 except OSError as oe:
@@ -326,7 +370,8 @@ class OTCamera:
             return
 
         log.write("Stopping OTCamera", level=log.LogLevel.INFO)
-        status.shutdownactive = True
+        status.store.update(shutdownactive=True)
+        self._unsubscribe_status()
         # OTCamera teardown
         self._camera.stop_recording()
         self._camera.close()
@@ -339,9 +384,80 @@ class OTCamera:
         sys.exit(0)
 
 
-def main() -> None:
-    """Start running OTCamera."""
+def main(watchdog: Optional[Watchdog] = None) -> None:
+    """Start running OTCamera.
+
+    The camera is started first to keep the gap in the recording after a restart as
+    short as possible. Everything else is initialised afterwards.
+
+    Args:
+        watchdog (Watchdog, optional): The watchdog monitoring the recording.
+            Defaults to None.
+    """
+    startup.timer.mark("imports")
     camera = Camera()
+    startup.timer.mark("camera")
+    if watchdog is not None:
+        camera.attach_watchdog(watchdog)
+    if status.record_time():
+        Path(config.VIDEO_DIR).mkdir(parents=True, exist_ok=True)
+        camera.start_recording()
+        startup.timer.mark("preview")
+    camera.recover_interrupted_segment()
+    metrics_config = config.settings.metrics
+    if metrics_config.enable:
+        try:
+            metrics.MetricsExporter(
+                textfile=metrics_config.textfile,
+                host=metrics_config.host,
+                port=metrics_config.port,
+                interval=metrics_config.interval,
+            ).start()
+        except OSError as cause:
+            log.write(f"Unable to start metrics exporter: {cause}", log.LogLevel.ERROR)
+    if config.settings.profiler.enable:
+        from OTCamera.helpers.profiler import SamplingProfiler
+
+        SamplingProfiler(
+            output_dir=config.VIDEO_DIR,
+            prefix=config.PREFIX,
+            interval=config.settings.profiler.interval,
+        ).start()
+    telemetry = None
+    if config.settings.telemetry.enable:
+        telemetry = TelemetryCollector(
+            frame_info=camera.frame_info,
+            fps=lambda: config.settings.camera.fps,
+            interval=config.settings.telemetry.interval,
+        )
+        telemetry.start()
+    if config.settings.usb_offload.enable:
+        from OTCamera.helpers.hotplug import HotplugListener
+        from OTCamera.helpers.usb_offload import UsbOffloader
+
+        offloader = UsbOffloader(
+            config.VIDEO_DIR, config.USB_MOUNT_POINT, camera.current_segment
+        )
+        HotplugListener(
+            config.USB_DEVICE, offloader.on_device_added, offloader.on_device_removed
+        ).start()
+    transfer_scheduler = TransferScheduler()
+    if config.SERVER_UPLOAD_UPLOAD:
+        recorded = camera.current_segment()
+        transfer_scheduler.enqueue_not_uploaded(
+            config.VIDEO_DIR,
+            exclude=(recorded, name.proxy(recorded)) if recorded else (),
+            archive=config.SERVER_UPLOAD_ARCHIVE,
+        )
+    transfer_scheduler.start()
+    status.store.subscribe(
+        lambda old, new: transfer_scheduler.wake(), "external_power_connected"
+    )
+    camera.attach_transfer_scheduler(transfer_scheduler)
+    if config.USER_CONFIG_FILE is not None:
+        config_watcher = ConfigWatcher(config.USER_CONFIG_FILE)
+        config_watcher.start()
+        camera.watch_config(config_watcher)
     html_updater = StatusWebsiteUpdater(
         template_html_path=config.TEMPLATE_HTML_PATH,
         offline_html_path=config.OFFLINE_HTML_PATH,
@@ -351,7 +467,34 @@ def main() -> None:
         log_info_id="log-info",
         debug_mode_on=config.DEBUG_MODE_ON,
     )
-    otcamera = OTCamera(camera=camera, html_updater=html_updater)
+    webserver_config = config.settings.webserver
+    if webserver_config.enable:
+        from OTCamera.helpers.live_preview import LivePreview
+        from OTCamera.helpers.webserver import WebServer
+
+        try:
+            WebServer(
+                host=webserver_config.host,
+                port=webserver_config.port,
+                video_dir=config.VIDEO_DIR,
+                preview_path=config.settings.preview.path,
+                static_dir=Path(config.INDEX_HTML_PATH).parent,
+                status_html=lambda: html_updater.html,
+                status_data=lambda: status.get_status_data(telemetry).to_dict(),
+                live_preview=LivePreview(
+                    camera.start_live_preview, camera.stop_live_preview
+                ),
+            ).start()
+        except OSError as cause:
+            log.write(f"Unable to start web server: {cause}", log.LogLevel.ERROR)
+    otcamera = OTCamera(
+        camera=camera,
+        html_updater=html_updater,
+        watchdog=watchdog,
+        telemetry=telemetry,
+    )
+    startup.timer.mark("init")
+    startup.timer.log_summary()
     otcamera.record()
 
 
@@ -2,6 +2,10 @@
 
 Contains all status variables and functions to be used across multiple modules.
 
+The status is kept in `store`. It is read from `store.state` and changed with
+`store.update` or `store.transition`, which is safe from the button callback threads.
+Modules interested in a change subscribe to it instead of polling the status.
+
 """
 # Copyright (C) 2023 OpenTrafficCam Contributors
 # <https://github.com/OpenTrafficCam>
@@ -19,39 +23,79 @@ Contains all status variables and functions to be used across multiple modules.
 # program.  If not, see <https://www.gnu.org/licenses/>.
 
 
-import re
-import subprocess
+from dataclasses import dataclass
 from datetime import datetime as dt
 from datetime import timedelta
-from pathlib import Path
-from typing import Union
+from typing import Optional
 
 from OTCamera import config
-from OTCamera.helpers import log
-from OTCamera.helpers.filesystem import calc_free_diskspace, resolve_path
+from OTCamera.helpers import log, metrics
+from OTCamera.helpers.filesystem import video_dir_stats
+from OTCamera.helpers.state_store import StateStore
+from OTCamera.helpers.sysprobe import probe
+from OTCamera.helpers.telemetry import (
+    TelemetryCollector,
+    TelemetrySample,
+    describe_throttled,
+)
 from OTCamera.html_updater import StatusDataObject, StatusHtmlId
 
 log.write("imported status", level=log.LogLevel.DEBUG)
 
-shutdownactive: bool = False
-noblink: bool = False
-power_led_blinked: bool = False
-wifi_on: bool = True
-interval_finished: bool = False
-more_intervals: bool = True
-preview_taken: bool = False
-current_interval: int = 0
-recording: bool = False
-power_button_pressed_time: Union[dt, None] = None
-wifi_button_pressed_time: Union[dt, None] = None
-html_updated_after_recording: bool = False
-
-# Button statuses
-power_button_pressed: bool = False
-hour_button_pressed: bool = False
-wifi_button_pressed: bool = False
-external_power_connected: bool = False
-battery_is_low: bool = False
+
+@dataclass(frozen=True)
+class Status:
+    """The status of OTCamera shared between the record loop and the buttons."""
+
+    shutdownactive: bool = False
+    noblink: bool = False
+    power_led_blinked: bool = False
+    wifi_on: bool = True
+    interval_finished: bool = False
+    more_intervals: bool = True
+    preview_taken: bool = False
+    current_interval: int = 0
+    recording: bool = False
+    footage_at_risk: bool = False
+    power_button_pressed_time: Optional[dt] = None
+    wifi_button_pressed_time: Optional[dt] = None
+
+    # Button statuses
+    power_button_pressed: bool = False
+    hour_button_pressed: bool = False
+    wifi_button_pressed: bool = False
+    external_power_connected: bool = False
+    battery_is_low: bool = False
+
+
+store: StateStore[Status] = StateStore(Status())
+"""The status of OTCamera."""
+
+_EXPORTED = {
+    "recording": metrics.REGISTRY.gauge(
+        "otcamera_recording", "1 while the camera is recording."
+    ),
+    "wifi_on": metrics.REGISTRY.gauge("otcamera_wifi_on", "1 while Wi-Fi is on."),
+    "external_power_connected": metrics.REGISTRY.gauge(
+        "otcamera_external_power_connected", "1 while on external power."
+    ),
+    "battery_is_low": metrics.REGISTRY.gauge(
+        "otcamera_battery_low", "1 if the battery is low."
+    ),
+    "footage_at_risk": metrics.REGISTRY.gauge(
+        "otcamera_footage_at_risk",
+        "1 if videos not offloaded yet will be deleted soon to free up space.",
+    ),
+}
+
+
+def _export_status(old: Status, new: Status) -> None:
+    for field, gauge in _EXPORTED.items():
+        gauge.set(int(getattr(new, field)))
+
+
+_export_status(store.state, store.state)
+store.subscribe(_export_status, *_EXPORTED)
 
 
 def record_time() -> bool:
@@ -63,31 +107,49 @@ def record_time() -> bool:
     Returns:
         bool: Time to record or not.
     """
+    recording_config = config.settings.recording
+    state = store.state
     current_hour = dt.now().hour
-    bytime = current_hour >= config.START_HOUR and current_hour < config.END_HOUR
-    if config.USE_BUTTONS:
-        record = hour_button_pressed or bytime
+    bytime = (
+        current_hour >= recording_config.start_hour
+        and current_hour < recording_config.end_hour
+    )
+    if config.settings.buttons.enable:
+        record = state.hour_button_pressed or bytime
     else:
         record = bytime
-    record = record and (not shutdownactive)
+    record = record and (not state.shutdownactive)
     return record
 
 
-def get_status_data() -> StatusDataObject:
-    """Returns OTCamera's status information."""
-    free_diskspace = calc_free_diskspace(config.VIDEO_DIR) / (1024 * 1024 * 1024)
-    num_videos_recorded = _get_num_videos()
-    currently_recording = recording
-    low_battery = battery_is_low
-    hour_button_active = hour_button_pressed
+def get_status_data(
+    telemetry: Optional[TelemetryCollector] = None,
+) -> StatusDataObject:
+    """Returns OTCamera's status information.
+
+    Args:
+        telemetry (Optional[TelemetryCollector]): Provides the system resource
+            telemetry. Defaults to None.
+    """
+    state = store.state
+    free_diskspace = video_dir_stats.free_diskspace() / (1024 * 1024 * 1024)
+    num_videos_recorded = video_dir_stats.num_videos()
+    currently_recording = state.recording
+    low_battery = state.battery_is_low
+    hour_button_active = state.hour_button_pressed
 
     time_until_wifi_off = "--:--:--"
-    if wifi_button_pressed_time is not None:
+    if state.wifi_button_pressed_time is not None:
         wifi_delay = timedelta(seconds=config.WIFI_DELAY)
         time_until_wifi_off = str_format_timedelta(
-            (wifi_button_pressed_time + wifi_delay) - dt.now()
+            (state.wifi_button_pressed_time + wifi_delay) - dt.now()
         )
 
+    sample = None if telemetry is None else telemetry.latest()
+    frame_drops = (
+        0 if telemetry is None else sum(s.frame_drops for s in telemetry.history)
+    )
+
     return StatusDataObject(
         free_diskspace=(StatusHtmlId.FREE_DISKSPACE, f"{free_diskspace:.2f} GB"),
         num_videos_recorded=(StatusHtmlId.NUM_VIDEOS_RECORDED, num_videos_recorded),
@@ -96,7 +158,7 @@ def get_status_data() -> StatusDataObject:
         hour_button_active=(StatusHtmlId.HOUR_BUTTON_ACTIVE, hour_button_active),
         external_power_supply_connected=(
             StatusHtmlId.EXT_POWER_SUPPLY_CONNECTED,
-            external_power_connected,
+            state.external_power_connected,
         ),
         ms_teams_webhook_enabled=(
             StatusHtmlId.MS_TEAMS_WEBHOOK_ENABLED,
@@ -106,9 +168,34 @@ def get_status_data() -> StatusDataObject:
             StatusHtmlId.TIME_UNTIL_WIFI_OFF,
             time_until_wifi_off,
         ),
+        cpu_load=(StatusHtmlId.CPU_LOAD, _format_telemetry(sample, "load", "{:.2f}")),
+        soc_temperature=(
+            StatusHtmlId.SOC_TEMPERATURE,
+            _format_telemetry(sample, "soc_temperature", "{:.1f} °C"),
+        ),
+        throttled=(
+            StatusHtmlId.THROTTLED,
+            describe_throttled(None if sample is None else sample.throttled),
+        ),
+        memory_available=(
+            StatusHtmlId.MEMORY_AVAILABLE,
+            _format_telemetry(sample, "memory_available", "{:.0f} MB", 1 / 2**20),
+        ),
+        sd_write_latency=(
+            StatusHtmlId.SD_WRITE_LATENCY,
+            _format_telemetry(sample, "sd_write_latency", "{:.1f} ms", 1000),
+        ),
+        frame_drops=(StatusHtmlId.FRAME_DROPS, frame_drops),
     )
 
 
+def _format_telemetry(
+    sample: Optional[TelemetrySample], attr: str, format: str, scale: float = 1
+) -> str:
+    value = None if sample is None else getattr(sample, attr)
+    return "n/a" if value is None else format.format(value * scale)
+
+
 def str_format_timedelta(time_delta: timedelta) -> str:
     """
     Converts a datetime.timedelta object as a string in the format of
@@ -136,64 +223,27 @@ def _is_wifi_enabled(network_device_name: str = "wlan0") -> bool:
     Checks if WiFi is enabled.
 
     On Linux the WiFI network device is usually denoted by 'wlan0'.
+    The state is read from sysfs and cached for a short time.
 
     Args:
         network_device_name (str): The network device's name.
 
     Returns:
         True if WiFI enabled otherwise False.
-
-    Raises:
-        Exception: If unknown error occurs.
-        NetworkDeviceDoesNotExistError: If network name doesn't exist.
     """
-    cmd = f"ip link show {network_device_name}"
-    p = subprocess.Popen(
-        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-    )
-    out, error = p.communicate()
-    if error:
-        err_msg = (
-            f"Error: '{error} occured while checking {network_device_name} status."
-        )
-        log.write(err_msg, log.LogLevel.ERROR)
-        return False
-    if re.search("state up", str(out), re.IGNORECASE):
-        log.write(f"{network_device_name} is up", log.LogLevel.DEBUG)
-        return True
-    elif re.search("state down", str(out), re.IGNORECASE):
-        log.write(f"{network_device_name} is down", log.LogLevel.DEBUG)
-        return False
-    elif re.search("(Device).*(does not exist)", str(out), re.IGNORECASE):
+    state = probe.operstate(network_device_name)
+    if state is None:
         log.write(
             f'Network device: "{network_device_name}" does not exist',
             log.LogLevel.WARNING,
         )
         return False
+    log.write(f"{network_device_name} is {state}", log.LogLevel.DEBUG)
+    return state == "up"
 
 
 # TODO: ip address
 
 
-def _get_num_videos(
-    video_dir: Union[str, Path] = config.VIDEO_DIR, filetype: str = config.VIDEO_FORMAT
-) -> int:
-    """
-    Returns the number of videos in a directory.
-
-    Args:
-        video_dir (Union[str, Path]): Path to directory containing the videos.
-        filetype (str): The filetype of a video file.
-
-    Returns:
-        The number of videos in a directory.
-    """
-    video_dir = resolve_path(video_dir)
-    if not Path(video_dir).is_dir():
-        raise NotADirectoryError(f"'{video_dir}' is not a directory!")
-
-    return len([f for f in video_dir.iterdir() if filetype in f.suffix])
-
-
 if __name__ == "__main__":
     pass
@@ -17,9 +17,17 @@ import argparse
 from pathlib import Path
 
 import OTCamera.config as config
+from OTCamera.helpers import startup
 
+startup.timer.mark("interpreter")
 
-def parse_args() -> Path:
+
+def parse_args() -> list[str]:
+    """Parses the command line arguments and the user config.
+
+    Returns:
+        list[str]: Warnings about missing or unknown settings in the user config.
+    """
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "-c",
@@ -34,28 +42,33 @@ def parse_args() -> Path:
         raise FileNotFoundError(f"The user config '{args.config}' does not exist.")
 
     if args.config:
-        config.parse_user_config(args.config)
-    else:
-        config.parse_user_config("~/user_config.yaml")
-
-
-def usb_device_exists(usb_device: str) -> bool:
-    """Whether a usb device at `usb_device` exists."""
-
-    return Path(usb_device).exists()
+        return config.parse_user_config(args.config)
+    return config.parse_user_config("~/user_config.yaml")
 
 
 def main():
-    parse_args()
+    config_warnings = parse_args()
+
+    # The log file is located in the configured video directory. Thus, the log must
+    # not be initialised before the user config has been parsed.
+    from OTCamera.helpers import log
 
-    if usb_device_exists(config.USB_DEVICE):
-        import usb_flash_drive_copy
+    log.init()
+    startup.timer.mark("config")
+    for warning in config_warnings:
+        log.write(warning, log.LogLevel.WARNING)
 
-        usb_flash_drive_copy.main(config.VIDEO_DIR, config.USB_MOUNT_POINT)
-    else:
-        import OTCamera.record as record
+    # USB flash drives are offloaded in the background while recording.
+    import OTCamera.record as record
+    from OTCamera.helpers.watchdog import Watchdog, notify
 
-        record.main()
+    watchdog_config = config.settings.watchdog
+    watchdog = Watchdog(
+        watchdog_config.stall_timeout if watchdog_config.enable else None
+    )
+    watchdog.start()
+    notify("READY=1")
+    record.main(watchdog)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+
+import pytest
+
+from OTCamera import config
+
+USER_CONFIG = """
+debug_mode:
+  enable: false
+recording:
+  start_hour: 7
+  end_hour: 21
+camera:
+  fps: 10
+video:
+  encoder:
+    bitrate: 800000
+"""
+
+
+@pytest.fixture
+def user_config_file(tmp_path: Path) -> Path:
+    config_file = tmp_path / "user_config.yaml"
+    config_file.write_text(USER_CONFIG)
+    return config_file
+
+
+def test_load_user_config_doesNotApplyValues(user_config_file: Path) -> None:
+    start_hour = config.START_HOUR
+
+    values = config.load_user_config(str(user_config_file))
+
+    assert values["START_HOUR"] == 7
+    assert values["END_HOUR"] == 21
+    assert values["FPS"] == 10
+    assert values["H264_BITRATE"] == 800000
+    assert config.START_HOUR == start_hour
+
+
+def test_load_user_config_missingFile_returnsNone(tmp_path: Path) -> None:
+    assert config.load_user_config(str(tmp_path / "missing.yaml")) is None
+
+
+def test_load_missingSettings_usesDefaultsAndWarns(tmp_path: Path) -> None:
+    config_file = tmp_path / "user_config.yaml"
+    config_file.write_text("recording:\n  start_hour: 8\n  unknown: 1\n")
+
+    loaded = config.load(str(config_file))
+
+    assert loaded.settings.recording.start_hour == 8
+    assert loaded.settings.recording.end_hour == config.DEFAULTS.recording.end_hour
+    assert loaded.settings.camera == config.DEFAULTS.camera
+    assert "Unknown setting 'recording.unknown' in user config" in loaded.warnings
+    assert "Section 'camera' missing, using defaults" in loaded.warnings
+
+
+def test_load_invalidValues_reportsAllErrors(tmp_path: Path) -> None:
+    config_file = tmp_path / "user_config.yaml"
+    config_file.write_text(
+        "debug_mode:\n  enable: 1\n"
+        "recording:\n  start_hour: 25\n"
+        "camera:\n  resolution:\n    width: 1640\n"
+    )
+
+    with pytest.raises(config.ConfigValidationError) as error:
+        config.load(str(config_file))
+
+    assert error.value.errors == [
+        "'debug_mode.enable' must be of type bool: 1",
+        "'recording.start_hour' must be between 0 and 24: 25",
+        "'camera.resolution' has an invalid format: {'width': 1640}",
+    ]
+
+
+def test_load_unchangedFile_returnsCachedConfig(user_config_file: Path) -> None:
+    first = config.load(str(user_config_file))
+    second = config.load(str(user_config_file))
+
+    assert first is second
+
+
+def test_load_convertsValues(tmp_path: Path) -> None:
+    config_file = tmp_path / "user_config.yaml"
+    config_file.write_text(
+        "video:\n  dir: ~/videos\n  resolution:\n    width: 800\n    height: 600\n"
+        "  encoder:\n    level: 4\n"
+    )
+
+    settings = config.load(str(config_file)).settings
+
+    assert settings.video.dir == str(Path("~/videos").expanduser().resolve())
+    assert settings.video.resolution == (800, 600)
+    assert settings.video.encoder.level == "4"
+
+
+def test_diff_groupsChangedValues(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "settings", config.DEFAULTS)
+    monkeypatch.setattr(config, "PREFIX", "otcamera")
+
+    change = config.diff(
+        {
+            "START_HOUR": 7,
+            "END_HOUR": config.DEFAULTS.recording.end_hour,
+            "FPS": 10,
+            "H264_BITRATE": 800000,
+            "VIDEO_DIR": "/other",
+            "PREFIX": "other",
+        }
+    )
+
+    assert change.live == {"START_HOUR": 7}
+    assert change.sensor == {"FPS": 10}
+    assert change.encoder == {"H264_BITRATE": 800000}
+    assert change.restart_required == {"VIDEO_DIR": "/other", "PREFIX": "other"}
+    assert change.requires_pipeline_restart
+
+
+def test_diff_unchangedValues_isEmpty(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "settings", config.DEFAULTS)
+
+    change = config.diff({"START_HOUR": config.DEFAULTS.recording.start_hour})
+
+    assert not change
+    assert not change.requires_pipeline_restart
+
+
+def test_apply_updatesSettingsAndModuleVariables(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(config, "settings", config.DEFAULTS)
+    monkeypatch.setattr(config, "PREVIEW_INTERVAL", 5)
+
+    config.apply({"PREVIEW_INTERVAL": 10})
+
+    assert config.PREVIEW_INTERVAL == 10
+    assert config.settings.preview.interval == 10
+    assert config.settings.camera is config.DEFAULTS.camera
+    assert config.DEFAULTS.preview.interval == 5
+
+
+def test_load_uploadWindows_convertsToMinutes(tmp_path: Path) -> None:
+    config_file = tmp_path / "user_config.yaml"
+    config_file.write_text(
+        'server_upload:\n  windows:\n    - "22:00-06:00"\n    - "12:30-13:00"\n'
+    )
+
+    settings = config.load(str(config_file)).settings
+
+    assert settings.server_upload.windows == ((1320, 360), (750, 780))
+
+
+def test_load_invalidUploadWindow_reportsError(tmp_path: Path) -> None:
+    config_file = tmp_path / "user_config.yaml"
+    config_file.write_text('server_upload:\n  windows:\n    - "22:00"\n')
+
+    with pytest.raises(config.ConfigValidationError) as error:
+        config.load(str(config_file))
+
+    assert error.value.errors == [
+        "'server_upload.windows' has an invalid format: ['22:00']"
+    ]
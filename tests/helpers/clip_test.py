@@ -0,0 +1,167 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from OTCamera import config
+from OTCamera.helpers import clip, name
+from OTCamera.helpers.keyframe_index import Keyframe
+
+FPS = 10
+GOP = 10
+SPS = b"\x00\x00\x00\x01\x27" + b"\xaa" * 8
+PPS = b"\x00\x00\x00\x01\x28" + b"\xaa" * 4
+IDR = b"\x00\x00\x00\x01\x25\x88" + b"\xaa" * 100
+P_FRAME = b"\x00\x00\x00\x01\x21\x9a" + b"\xaa" * 10
+START = datetime(2023, 5, 18, 14, 0, 0)
+
+
+def write_video(path: Path, seconds: int, index: bool = True) -> list[int]:
+    """Write an H264 stream with a keyframe every second like picamera.
+
+    Returns:
+        list[int]: The offset of the SPS header of each keyframe.
+    """
+    data = b""
+    offsets = []
+    for _ in range(seconds):
+        offsets.append(len(data))
+        data += SPS + PPS + IDR + P_FRAME * (GOP - 1)
+    path.write_bytes(data)
+    if index:
+        # Timestamps of the camera clock do not start at zero
+        Path(name.keyframe_index(path)).write_bytes(
+            b"".join(
+                struct.pack("<QQ", offset, 5_000_000 + second * 1_000_000)
+                for second, offset in enumerate(offsets)
+            )
+        )
+    return offsets
+
+
+def video_path(video_dir: Path, start: datetime) -> Path:
+    return video_dir / f"otcamera_FR{FPS}_{start:%Y-%m-%d_%H-%M-%S}.h264"
+
+
+def test_scan_keyframes_findsHeaderOfEachKeyframe(tmp_path: Path) -> None:
+    video = tmp_path / "video.h264"
+    offsets = write_video(video, 3, index=False)
+
+    assert clip.scan_keyframes(video.read_bytes(), FPS) == [
+        Keyframe(offset, second * 1_000_000) for second, offset in enumerate(offsets)
+    ]
+
+
+def test_find_segments_overlappingVideosOnly(tmp_path: Path) -> None:
+    videos = [video_path(tmp_path, START + timedelta(minutes=m)) for m in (0, 1, 2)]
+    for video in videos:
+        write_video(video, 1)
+    Path(name.proxy(videos[1])).touch()
+
+    segments = clip.find_segments(
+        tmp_path, START + timedelta(seconds=70), START + timedelta(seconds=90)
+    )
+
+    assert segments == [clip.Segment(videos[1], START + timedelta(minutes=1))]
+
+
+def test_extract_clip_acrossVideos_cutsAtKeyframes(tmp_path: Path) -> None:
+    first = video_path(tmp_path, START)
+    second = video_path(tmp_path, START + timedelta(seconds=10))
+    first_offsets = write_video(first, 10)
+    second_offsets = write_video(second, 10, index=False)
+    output = tmp_path / "clip.h264"
+
+    parts = clip.extract_clip(
+        START + timedelta(seconds=8.5),
+        START + timedelta(seconds=12),
+        output,
+        video_dir=tmp_path,
+    )
+
+    assert parts == [
+        clip.ClipPart(
+            first, first_offsets[8], first.stat().st_size, START + timedelta(seconds=8)
+        ),
+        clip.ClipPart(second, 0, second_offsets[2], START + timedelta(seconds=10)),
+    ]
+    assert output.read_bytes() == (
+        first.read_bytes()[first_offsets[8] :]
+        + second.read_bytes()[: second_offsets[2]]
+    )
+
+
+def test_extract_clip_noVideos_raisesValueError(tmp_path: Path) -> None:
+    write_video(video_path(tmp_path, START), 10)
+
+    with pytest.raises(ValueError):
+        clip.extract_clip(
+            START - timedelta(minutes=5),
+            START - timedelta(minutes=1),
+            tmp_path / "clip.h264",
+            video_dir=tmp_path,
+        )
+    assert not (tmp_path / "clip.h264").exists()
+
+
+def test_main_timesOnDate_writesClip(tmp_path: Path) -> None:
+    video = video_path(tmp_path, START)
+    write_video(video, 10)
+    output = tmp_path / "clip.h264"
+
+    clip.main(
+        [
+            "14:00:02",
+            "14:00:04",
+            str(output),
+            "--date",
+            "2023-05-18",
+            "--video-dir",
+            str(tmp_path),
+            "--config",
+            str(tmp_path / "missing.yaml"),
+        ]
+    )
+
+    assert output.stat().st_size == 2 * len(SPS + PPS + IDR + P_FRAME * (GOP - 1))
+
+
+def test_main_noVideoDir_usesVideoDirOfConfig(tmp_path: Path) -> None:
+    video_dir = tmp_path / "videos"
+    video_dir.mkdir()
+    write_video(video_path(video_dir, START), 10)
+    user_config = tmp_path / "user_config.yaml"
+    user_config.write_text(f"video:\n  dir: {video_dir}\n")
+    output = tmp_path / "clip.h264"
+
+    with mock.patch.dict(config.__dict__):
+        clip.main(
+            [
+                "14:00:02",
+                "14:00:04",
+                str(output),
+                "--date",
+                "2023-05-18",
+                "--config",
+                str(user_config),
+            ]
+        )
+
+    assert output.stat().st_size == 2 * len(SPS + PPS + IDR + P_FRAME * (GOP - 1))
@@ -0,0 +1,134 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from OTCamera.helpers.events import EventDispatcher, Priority
+
+
+@pytest.fixture
+def dispatcher() -> EventDispatcher:
+    dispatcher = EventDispatcher()
+    dispatcher.register("low_battery", Priority.CRITICAL)
+    dispatcher.register("power", Priority.HIGH)
+    dispatcher.register("wifi")
+    return dispatcher
+
+
+def test_dispatch_runsHandlersByPriority(dispatcher: EventDispatcher) -> None:
+    handled: list[str] = []
+    dispatcher.post("wifi", lambda: handled.append("wifi"))
+    dispatcher.post("power", lambda: handled.append("power"))
+    dispatcher.post("low_battery", lambda: handled.append("low_battery"))
+
+    assert dispatcher.dispatch() == 3
+    assert handled == ["low_battery", "power", "wifi"]
+    assert dispatcher.dispatch() == 0
+
+
+def test_dispatch_criticalPostedWhileHandling_preemptsPending(
+    dispatcher: EventDispatcher,
+) -> None:
+    handled: list[str] = []
+
+    def on_power() -> None:
+        handled.append("power")
+        dispatcher.post("low_battery", lambda: handled.append("low_battery"))
+
+    dispatcher.post("power", on_power)
+    dispatcher.post("wifi", lambda: handled.append("wifi"))
+
+    dispatcher.dispatch()
+
+    assert handled == ["power", "low_battery", "wifi"]
+
+
+def test_post_sameSource_coalescedToLatest(dispatcher: EventDispatcher) -> None:
+    pressed = mock.Mock()
+    released = mock.Mock()
+    dispatcher.post("power", pressed)
+    dispatcher.post("power", released)
+
+    assert dispatcher.dispatch() == 1
+    pressed.assert_not_called()
+    released.assert_called_once()
+
+
+def test_dispatch_edgeOfOwnSource_handledInPostingOrder(
+    dispatcher: EventDispatcher,
+) -> None:
+    dispatcher.register("wifi_held")
+    handled: list[str] = []
+    dispatcher.post("wifi", lambda: handled.append("pressed"))
+    dispatcher.post("wifi_held", lambda: handled.append("held"))
+    dispatcher.post("wifi", lambda: handled.append("released"))
+
+    assert dispatcher.dispatch() == 2
+    assert handled == ["held", "released"]
+
+
+def test_post_unknownSource_raises(dispatcher: EventDispatcher) -> None:
+    with pytest.raises(ValueError, match="hour"):
+        dispatcher.post("hour", mock.Mock())
+
+
+def test_poster_postsFromOtherThread(dispatcher: EventDispatcher) -> None:
+    handler = mock.Mock()
+    thread = threading.Thread(target=dispatcher.poster("wifi", handler))
+    thread.start()
+    thread.join()
+
+    handler.assert_not_called()
+    dispatcher.dispatch()
+    handler.assert_called_once_with()
+
+
+def test_dispatch_debounce_dueOnceSourceIsQuiet() -> None:
+    dispatcher = EventDispatcher()
+    dispatcher.register("hour", debounce=0.05)
+    handler = mock.Mock()
+    dispatcher.post("hour", handler)
+
+    assert dispatcher.dispatch() == 0
+    assert dispatcher.wait(5)
+    assert dispatcher.dispatch() == 1
+    handler.assert_called_once()
+
+
+def test_dispatch_failingHandler_othersHandled(dispatcher: EventDispatcher) -> None:
+    handler = mock.Mock()
+    dispatcher.post("power", mock.Mock(side_effect=RuntimeError("broken")))
+    dispatcher.post("wifi", handler)
+
+    assert dispatcher.dispatch() == 2
+    handler.assert_called_once()
+
+
+def test_wait_postedByOtherThread_wakesUp(dispatcher: EventDispatcher) -> None:
+    timer = threading.Timer(0.05, dispatcher.post, args=("wifi", mock.Mock()))
+    timer.start()
+    start = time.monotonic()
+
+    assert dispatcher.wait(5)
+    assert time.monotonic() - start < 5
+    timer.join()
+
+
+def test_wait_nothingPosted_timesOut(dispatcher: EventDispatcher) -> None:
+    assert not dispatcher.wait(0.01)
@@ -0,0 +1,126 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import errno
+import os
+from pathlib import Path
+
+import pytest
+
+from OTCamera.helpers import fastcopy
+from OTCamera.helpers.fastcopy import CopyProgress, copy_file
+
+SIZE = 1_000_003
+
+
+@pytest.fixture
+def src(tmp_path: Path) -> Path:
+    src = tmp_path / "video.h264"
+    src.write_bytes(os.urandom(SIZE))
+    os.utime(src, (1_600_000_000, 1_600_000_000))
+    return src
+
+
+def _unsupported(*args) -> int:
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+
+@pytest.mark.parametrize(
+    "copy_file_range,sendfile",
+    [
+        (fastcopy._copy_file_range, fastcopy._sendfile),
+        (_unsupported, fastcopy._sendfile),
+        (_unsupported, _unsupported),
+        (None, None),
+    ],
+)
+def test_copyFile_copiesContentAndMetadata(
+    src: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    copy_file_range,
+    sendfile,
+) -> None:
+    monkeypatch.setattr(fastcopy, "_copy_file_range", copy_file_range)
+    monkeypatch.setattr(fastcopy, "_sendfile", sendfile)
+    dst = tmp_path / "copy.h264"
+    chunks: list[int] = []
+
+    copied = copy_file(src, dst, chunk_size=64 * 1024, progress=chunks.append)
+
+    assert copied == SIZE
+    assert sum(chunks) == SIZE
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.stat().st_mtime == src.stat().st_mtime
+
+
+def test_copyFile_sendfileFailsMidway_continuesThreaded(
+    src: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls = []
+
+    def fail_second_call(src_fd: int, dst_fd: int, count: int, offset: int) -> int:
+        calls.append(offset)
+        if len(calls) > 1:
+            raise OSError(errno.EINVAL, "Invalid argument")
+        return fastcopy._sendfile_syscall(src_fd, dst_fd, count, offset)
+
+    monkeypatch.setattr(fastcopy, "_copy_file_range", None)
+    monkeypatch.setattr(fastcopy, "_sendfile", fail_second_call)
+    dst = tmp_path / "copy.h264"
+
+    copy_file(src, dst, chunk_size=64 * 1024)
+
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_copyProgress_summary() -> None:
+    now = [0.0]
+    progress = CopyProgress(4_000_000_000, clock=lambda: now[0])
+
+    now[0] = 10
+    progress.add(1_000_000_000)
+
+    assert progress.fraction == 0.25
+    assert progress.summary() == "Copied 1.0 of 4.0 GB (25%) at 100.0 MB/s"
+
+
+def test_copyResumable_partialFileMatches_resumesAtItsEnd(
+    src: Path, tmp_path: Path
+) -> None:
+    dst = tmp_path / "copy.h264"
+    partial = tmp_path / "copy.h264.part"
+    partial.write_bytes(src.read_bytes()[:300_000])
+    chunks: list[int] = []
+
+    copied = fastcopy.copy_resumable(src, dst, progress=chunks.append)
+
+    assert copied == SIZE - 300_000
+    assert chunks[0] == 300_000
+    assert sum(chunks) == SIZE
+    assert dst.read_bytes() == src.read_bytes()
+    assert not partial.exists()
+
+
+def test_copyResumable_partialFileDiffers_copiesFromStart(
+    src: Path, tmp_path: Path
+) -> None:
+    dst = tmp_path / "copy.h264"
+    Path(tmp_path / "copy.h264.part").write_bytes(b"\xff" * 300_000)
+
+    copied = fastcopy.copy_resumable(src, dst)
+
+    assert copied == SIZE
+    assert dst.read_bytes() == src.read_bytes()
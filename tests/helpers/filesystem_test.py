@@ -13,14 +13,18 @@
 # You should have received a copy of the GNU General Public License along with this
 # program.  If not, see <https://www.gnu.org/licenses/>.
 
+import os
 import shutil
 from pathlib import Path
 from unittest import mock
 
 import pytest
 
+from OTCamera import status
+from OTCamera.helpers import log
 from OTCamera.helpers.errors import NoMoreFilesToDeleteError
-from OTCamera.helpers.filesystem import delete_old_files
+from OTCamera.helpers.filesystem import VideoDirStats, delete_old_files
+from OTCamera.helpers.offload_state import UPLOAD, OffloadState
 
 
 @pytest.fixture(scope="function")
@@ -56,7 +60,6 @@ def test_delete_old_files_noSpaceLeft_raisesNoMoreFilesToDeleteError(
     mock_log_breakline: mock.MagicMock,
     temp_dir: Path,
 ) -> None:
-
     with pytest.raises(NoMoreFilesToDeleteError):
         delete_old_files(video_dir=temp_dir)
 
@@ -94,9 +97,154 @@ def test_delete_old_files_emptyDirAsParam_raisesNoMoreFilesToDeleteError(
     assert get_dir_size(empty_dir) == 0
 
 
+@mock.patch("OTCamera.helpers.filesystem.log.write", return_value=None)
+def test_delete_old_files_offloadedVideo_deletedFirst(
+    mock_log_write: mock.MagicMock, temp_dir: Path
+) -> None:
+    Path(temp_dir, "video_1.csv").touch()
+    Path(temp_dir, "video_3.h264").touch()
+    for video, ctime in [("video_1.h264", 1), ("video_2.h264", 2), ("video_3.h264", 3)]:
+        os.utime(temp_dir / video, (ctime, ctime))
+    state = OffloadState(temp_dir / "offload_state.json")
+    state.mark(temp_dir / "video_2.h264", UPLOAD)
+
+    with mock.patch(
+        "OTCamera.helpers.filesystem._enough_space", side_effect=[False, True]
+    ), mock.patch("OTCamera.helpers.filesystem.offload_state", state):
+        delete_old_files(video_dir=temp_dir)
+
+    assert not Path(temp_dir, "video_2.h264").exists()
+    assert Path(temp_dir, "video_1.h264").exists()
+    assert not state.is_offloaded(temp_dir / "video_2.h264")
+
+
+@mock.patch("OTCamera.helpers.filesystem.log.breakline", return_value=None)
+@mock.patch("OTCamera.helpers.filesystem.log.write", return_value=None)
+@mock.patch("OTCamera.helpers.filesystem._enough_space", return_value=False)
+def test_delete_old_files_noOffloadedVideo_alarmsAndKeepsOtherFiles(
+    mock_enough_space: mock.MagicMock,
+    mock_log_write: mock.MagicMock,
+    mock_log_breakline: mock.MagicMock,
+    temp_dir: Path,
+) -> None:
+    Path(temp_dir, "video_1.csv").touch()
+    state = OffloadState(temp_dir / "offload_state.json")
+
+    with pytest.raises(NoMoreFilesToDeleteError), mock.patch(
+        "OTCamera.helpers.filesystem.offload_state", state
+    ):
+        delete_old_files(video_dir=temp_dir)
+
+    assert get_dir_size(temp_dir, ".h264") == 1
+    assert get_dir_size(temp_dir, ".csv") == 1
+    assert mock.call(mock.ANY, log.LogLevel.ERROR) in mock_log_write.call_args_list
+
+
+@mock.patch("OTCamera.helpers.filesystem.log.write", return_value=None)
+def test_delete_old_files_videoWithSidecars_deletesAll(
+    mock_log_write: mock.MagicMock, temp_dir: Path
+) -> None:
+    Path(temp_dir, "video_1_proxy.h264").touch()
+    Path(temp_dir, "video_2_proxy.h264").touch()
+    Path(temp_dir, "video_1.idx").touch()
+    state = OffloadState(temp_dir / "offload_state.json")
+    state.mark(temp_dir / "video_1.h264", UPLOAD)
+    state.mark(temp_dir / "video_1_proxy.h264", UPLOAD)
+
+    with mock.patch(
+        "OTCamera.helpers.filesystem._enough_space", side_effect=[False, True]
+    ), mock.patch("OTCamera.helpers.filesystem.offload_state", state):
+        delete_old_files(video_dir=temp_dir)
+
+    assert sorted(path.name for path in temp_dir.glob("*.h264")) == [
+        "video_2.h264",
+        "video_2_proxy.h264",
+    ]
+    assert not state.is_offloaded(temp_dir / "video_1_proxy.h264")
+    assert not Path(temp_dir, "video_1.idx").exists()
+
+
 def get_dir_size(dir_path: Path, suffix: str = None) -> int:
     assert dir_path.is_dir()
     if suffix:
         return len([f for f in dir_path.iterdir() if f.suffix == suffix])
 
     return len(list(dir_path.iterdir()))
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@mock.patch("OTCamera.helpers.filesystem.log.write", return_value=None)
+@mock.patch("OTCamera.helpers.filesystem._enough_space", return_value=True)
+def test_delete_old_files_almostFullWithoutOffloadedVideos_alarmsEarly(
+    mock_enough_space: mock.MagicMock, mock_log_write: mock.MagicMock, temp_dir: Path
+) -> None:
+    state = OffloadState(temp_dir / "offload_state.json")
+    almost_full = mock.Mock(free=int(1.5 * 1024 * 1024 * 1024))
+
+    try:
+        with mock.patch(
+            "OTCamera.helpers.filesystem.psutil.disk_usage", return_value=almost_full
+        ), mock.patch("OTCamera.helpers.filesystem.offload_state", state):
+            delete_old_files(video_dir=temp_dir, min_free_space=1)
+            assert status.store.state.footage_at_risk
+            assert (
+                mock.call(mock.ANY, log.LogLevel.ERROR) in mock_log_write.call_args_list
+            )
+
+            for video in ("video_1.h264", "video_2.h264"):
+                state.mark(temp_dir / video, UPLOAD)
+            delete_old_files(video_dir=temp_dir, min_free_space=1)
+            assert not status.store.state.footage_at_risk
+    finally:
+        status.store.update(footage_at_risk=False)
+
+    assert get_dir_size(temp_dir, ".h264") == 2
+
+
+def test_videoDirStats_numVideos_tracksEventsWithoutRescan(temp_dir: Path) -> None:
+    clock = FakeClock()
+    stats = VideoDirStats(temp_dir, "h264", rescan_interval=600, clock=clock)
+
+    assert stats.num_videos() == 2
+    Path(temp_dir, "video_3.h264").touch()
+    assert stats.num_videos() == 2
+    stats.file_created(temp_dir / "video_3.h264")
+    stats.file_created(temp_dir / "video_3.h264")
+    stats.file_created(temp_dir / "logfile.log")
+    assert stats.num_videos() == 3
+    stats.file_deleted(temp_dir / "video_1.h264")
+    assert stats.num_videos() == 2
+
+    clock.now = 600
+    assert stats.num_videos() == 3
+
+
+@mock.patch("OTCamera.helpers.filesystem.calc_free_diskspace", return_value=42)
+def test_videoDirStats_freeDiskspace_cachedUntilTtlOrEvent(
+    mock_calc_free_diskspace: mock.MagicMock, temp_dir: Path
+) -> None:
+    clock = FakeClock()
+    stats = VideoDirStats(temp_dir, "h264", disk_usage_ttl=10, clock=clock)
+
+    assert stats.free_diskspace() == 42
+    clock.now = 9
+    assert stats.free_diskspace() == 42
+    assert mock_calc_free_diskspace.call_count == 1
+    clock.now = 10
+    stats.free_diskspace()
+    assert mock_calc_free_diskspace.call_count == 2
+    stats.file_created(temp_dir / "video_3.h264")
+    stats.free_diskspace()
+    assert mock_calc_free_diskspace.call_count == 3
+
+
+def test_videoDirStats_notADirectory_raisesNotADirectoryError(tmp_path: Path) -> None:
+    with pytest.raises(NotADirectoryError):
+        VideoDirStats(tmp_path / "missing", "h264").num_videos()
@@ -0,0 +1,70 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import socket
+import threading
+from pathlib import Path
+
+from OTCamera.helpers.hotplug import HotplugListener, UEvent
+
+ADD_SDA1 = (
+    b"add@/devices/platform/soc/usb1/1-1/host0/block/sda/sda1\0"
+    b"ACTION=add\0DEVPATH=/devices/platform/soc/usb1/1-1/host0/block/sda/sda1\0"
+    b"SUBSYSTEM=block\0MAJOR=8\0MINOR=1\0DEVNAME=sda1\0DEVTYPE=partition\0SEQNUM=42\0"
+)
+REMOVE_SDA1 = ADD_SDA1.replace(b"add", b"remove")
+
+
+def test_parse_kernelUevent() -> None:
+    assert UEvent.parse(ADD_SDA1) == UEvent("add", "block", "sda1")
+    assert UEvent.parse(b"libudev\0\xfe\xed\xca\xfe") is None
+
+
+def test_handle_watchedDeviceOnly(tmp_path: Path) -> None:
+    added: list[str] = []
+    removed: list[str] = []
+    listener = HotplugListener(tmp_path / "sda1", added.append, removed.append)
+
+    listener.handle(UEvent("add", "block", "sda"))
+    listener.handle(UEvent("add", "usb"))
+    listener.handle(UEvent("add", "block", "sda1"))
+    listener.handle(UEvent("change", "block", "sda1"))
+    listener.handle(UEvent("remove", "block", "sda1"))
+
+    assert added == [str(tmp_path / "sda1")]
+    assert removed == [str(tmp_path / "sda1")]
+
+
+def test_start_receivesEventsFromSocket(tmp_path: Path) -> None:
+    device = tmp_path / "sda1"
+    device.touch()
+    events: list[str] = []
+    received = threading.Event()
+
+    def on_remove(device: str) -> None:
+        events.append("remove")
+        received.set()
+
+    listener = HotplugListener(device, lambda device: events.append("add"), on_remove)
+    sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        assert listener.start(receiver)
+        sender.send(REMOVE_SDA1)
+        assert received.wait(timeout=5)
+    finally:
+        listener.stop()
+        sender.close()
+
+    assert events == ["add", "remove"]
@@ -0,0 +1,91 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+from array import array
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+from OTCamera.helpers.keyframe_index import (
+    IndexedOutput,
+    Keyframe,
+    keyframe_before,
+    read_index,
+)
+
+FRAME = 0
+KEY_FRAME = 1
+SPS_HEADER = 2
+
+
+def record(output: IndexedOutput, buffers: list[tuple[int, bytes, bool, int]]) -> None:
+    """Write buffers like picamera, updating the current frame before each write."""
+    current: Optional[SimpleNamespace] = None
+
+    def frame() -> Optional[SimpleNamespace]:
+        return current
+
+    output._frame = frame
+    for frame_type, data, complete, timestamp in buffers:
+        current = SimpleNamespace(
+            frame_type=frame_type, complete=complete, timestamp=timestamp
+        )
+        output.write(data)
+    output.close()
+
+
+def test_write_indexesHeaderOffsetOfEachKeyframe(tmp_path: Path) -> None:
+    video = tmp_path / "video.h264"
+    output = IndexedOutput(video, lambda: None)
+
+    record(
+        output,
+        [
+            (SPS_HEADER, b"h" * 10, True, 0),
+            (KEY_FRAME, b"k" * 100, False, 0),
+            (KEY_FRAME, b"k" * 50, True, 1000),
+            (FRAME, b"f" * 20, True, 51000),
+            (FRAME, b"f" * 20, True, 101000),
+            (SPS_HEADER, b"h" * 10, True, 101000),
+            (KEY_FRAME, b"k" * 100, True, 151000),
+            (FRAME, b"f" * 20, True, 201000),
+        ],
+    )
+
+    assert video.stat().st_size == 330
+    assert read_index(output.index_file) == [Keyframe(0, 1000), Keyframe(200, 151000)]
+    values = array("Q", Path(output.index_file).read_bytes())
+    if sys.byteorder != "little":
+        values.byteswap()
+    assert values.tolist() == [0, 1000, 200, 151000]
+
+
+def test_read_index_incompleteLastEntry_ignored(tmp_path: Path) -> None:
+    index_file = tmp_path / "video.idx"
+    index_file.write_bytes(
+        (10).to_bytes(8, "little") + (1000).to_bytes(8, "little") + b"\0" * 5
+    )
+
+    assert read_index(index_file) == [Keyframe(10, 1000)]
+
+
+def test_keyframe_before() -> None:
+    keyframes = [Keyframe(0, 1000), Keyframe(200, 151000), Keyframe(400, 301000)]
+
+    assert keyframe_before(keyframes, 500) is None
+    assert keyframe_before(keyframes, 151000) == Keyframe(200, 151000)
+    assert keyframe_before(keyframes, 300000) == Keyframe(200, 151000)
+    assert keyframe_before(keyframes, 10**9) == Keyframe(400, 301000)
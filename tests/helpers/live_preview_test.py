@@ -0,0 +1,88 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from unittest import mock
+
+from OTCamera.helpers.events import EventDispatcher
+from OTCamera.helpers.live_preview import LivePreview, MjpegOutput
+
+
+def test_write_frameInSeveralBuffers_publishedOnce() -> None:
+    publish = mock.Mock()
+    output = MjpegOutput(publish)
+
+    output.write(b"\xff\xd8first")
+    output.write(b"part\xff\xd9")
+    output.write(b"\xff\xd8second\xff\xd9")
+
+    assert publish.call_args_list == [
+        mock.call(b"\xff\xd8firstpart\xff\xd9"),
+        mock.call(b"\xff\xd8second\xff\xd9"),
+    ]
+
+
+def test_subscribe_encoderRunsWhileClientsWatch() -> None:
+    start = mock.Mock()
+    stop = mock.Mock()
+    dispatcher = EventDispatcher()
+    live_preview = LivePreview(start, stop, dispatcher)
+    first = mock.Mock()
+    second = mock.Mock()
+
+    live_preview.subscribe(first)
+    live_preview.subscribe(second)
+    start.assert_not_called()
+    dispatcher.dispatch()
+    start.call_args.args[0].write(b"\xff\xd8frame\xff\xd9")
+    live_preview.unsubscribe(first)
+    dispatcher.dispatch()
+
+    start.assert_called_once()
+    stop.assert_not_called()
+    first.assert_called_once_with(b"\xff\xd8frame\xff\xd9")
+    second.assert_called_once_with(b"\xff\xd8frame\xff\xd9")
+
+    live_preview.unsubscribe(second)
+    dispatcher.dispatch()
+
+    stop.assert_called_once()
+    assert not live_preview.active
+
+
+def test_subscribe_clientLeavesBeforeDispatch_encoderNotStarted() -> None:
+    start = mock.Mock()
+    dispatcher = EventDispatcher()
+    live_preview = LivePreview(start, mock.Mock(), dispatcher)
+    client = mock.Mock()
+
+    live_preview.subscribe(client)
+    live_preview.unsubscribe(client)
+    dispatcher.dispatch()
+
+    start.assert_not_called()
+
+
+def test_subscribe_encoderFails_retriedForNextClient() -> None:
+    start = mock.Mock(side_effect=[RuntimeError, None])
+    dispatcher = EventDispatcher()
+    live_preview = LivePreview(start, mock.Mock(), dispatcher)
+
+    live_preview.subscribe(mock.Mock())
+    dispatcher.dispatch()
+    assert not live_preview.active
+
+    live_preview.subscribe(mock.Mock())
+    dispatcher.dispatch()
+    assert live_preview.active
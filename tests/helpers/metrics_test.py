@@ -0,0 +1,92 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from urllib.request import urlopen
+
+import pytest
+
+from OTCamera.helpers import metrics
+from OTCamera.helpers.metrics import MetricsExporter, Registry
+
+
+def test_render_prometheusTextFormat() -> None:
+    registry = Registry()
+    registry.counter("uploads_total", "Uploads.").inc(2)
+    registry.gauge("free_bytes").set(10)
+    histogram = registry.histogram("split_seconds", "Split.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(3)
+
+    assert registry.render() == (
+        "# HELP uploads_total Uploads.\n"
+        "# TYPE uploads_total counter\n"
+        "uploads_total 2.0\n"
+        "# TYPE free_bytes gauge\n"
+        "free_bytes 10.0\n"
+        "# HELP split_seconds Split.\n"
+        "# TYPE split_seconds histogram\n"
+        'split_seconds_bucket{le="0.1"} 1\n'
+        'split_seconds_bucket{le="1.0"} 2\n'
+        'split_seconds_bucket{le="+Inf"} 3\n'
+        "split_seconds_sum 3.55\n"
+        "split_seconds_count 3\n"
+    )
+
+
+def test_registry_sameNameDifferentType_raisesValueError() -> None:
+    registry = Registry()
+    registry.counter("value")
+
+    assert registry.counter("value") is registry.counter("value")
+    with pytest.raises(ValueError):
+        registry.gauge("value")
+
+
+def test_timed_observesDurationAlsoOnException() -> None:
+    histogram = metrics.REGISTRY.histogram("test_timed_seconds")
+
+    @metrics.timed("test_timed_seconds")
+    def fail() -> None:
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        fail()
+
+    assert histogram.count == 1
+
+
+def test_write_textfile(tmp_path: Path) -> None:
+    registry = Registry()
+    registry.counter("uploads_total").inc()
+    textfile = tmp_path / "otcamera.prom"
+
+    registry.write_textfile(textfile)
+
+    assert textfile.read_text() == registry.render()
+
+
+def test_exporter_servesMetricsOverHttp() -> None:
+    registry = Registry()
+    registry.counter("uploads_total").inc()
+    exporter = MetricsExporter(port=0, registry=registry)
+    exporter.start()
+    try:
+        url = f"http://127.0.0.1:{exporter.server_port}/metrics"
+        with urlopen(url, timeout=5) as response:
+            assert response.read().decode() == registry.render()
+    finally:
+        exporter.stop()
@@ -42,6 +42,24 @@ def test_video_correctFilename(mock_current_dt: mock.MagicMock):
     assert actual == expected
 
 
+def test_proxy_nextToVideo():
+    video = "/videos/otcamera_FR20_2022-05-18_22-00-59.h264"
+
+    proxy = name.proxy(video)
+
+    assert proxy == "/videos/otcamera_FR20_2022-05-18_22-00-59_proxy.h264"
+    assert name.is_proxy(proxy)
+    assert not name.is_proxy(video)
+
+
+def test_keyframe_index_nextToVideo():
+    video = "/videos/otcamera_FR20_2022-05-18_22-00-59.h264"
+
+    assert name.keyframe_index(video) == (
+        "/videos/otcamera_FR20_2022-05-18_22-00-59.idx"
+    )
+
+
 def test_get_datetime_from_filename_correctFilenameAsParam():
     timestamp = "otcamera01_2022-05-20_15-57-52.log"
     result_dt = name.get_datetime_from_filename(timestamp)
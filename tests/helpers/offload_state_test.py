@@ -0,0 +1,40 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+
+from OTCamera.helpers.offload_state import UPLOAD, USB, OffloadState
+
+
+def test_mark_persistsDestinationsPerFilename(tmp_path: Path) -> None:
+    state_file = tmp_path / "offload_state.json"
+    state = OffloadState(state_file)
+
+    state.mark("/videos/video_1.h264", UPLOAD)
+    state.mark("/videos/video_1.h264", USB)
+    state.mark("/videos/video_1.h264", USB)
+    state.mark("/videos/video_2.h264", USB)
+    state.forget("/videos/video_2.h264")
+
+    reloaded = OffloadState(state_file)
+    assert reloaded.destinations("video_1.h264") == {UPLOAD, USB}
+    assert not reloaded.is_offloaded("video_2.h264")
+
+
+def test_load_corruptStateFile_startsEmpty(tmp_path: Path) -> None:
+    state_file = tmp_path / "offload_state.json"
+    state_file.write_text("{")
+
+    assert not OffloadState(state_file).is_offloaded("video_1.h264")
@@ -0,0 +1,60 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from OTCamera.helpers import privileged
+from OTCamera.helpers.privileged import InvalidActionError, PrivilegedHelper
+
+_SERVE_PATCHED_ACTIONS = f"""
+import sys
+from OTCamera.helpers import privileged
+privileged.ACTIONS["reboot"] = ([{sys.executable!r}, "-c", ""], [])
+privileged.ACTIONS["shutdown"] = ([{sys.executable!r}, "-c", "exit(3)"], [])
+privileged.serve(sys.stdin, sys.stdout)
+"""
+
+
+@pytest.mark.parametrize(
+    "action,args",
+    [
+        ("rm", ["-rf", "/"]),
+        ("mount", []),
+        ("mount", ["relative/path"]),
+        ("stop_service", ["sshrelay.service; reboot"]),
+    ],
+)
+def test_buildCommand_invalidRequest_raises(action: str, args: list[str]) -> None:
+    with pytest.raises(InvalidActionError):
+        privileged.build_command(action, args)
+
+
+def test_run_helperWithoutSudo_returnsReturnCode() -> None:
+    helper = PrivilegedHelper(command=[sys.executable, "-c", _SERVE_PATCHED_ACTIONS])
+
+    try:
+        assert helper.run("reboot") == 0
+        assert helper.run("shutdown") == 3
+    finally:
+        helper.close()
+
+
+def test_run_helperNotStartable_returnsMinusOne(tmp_path: Path) -> None:
+    helper = PrivilegedHelper(command=[str(tmp_path / "missing")])
+
+    assert helper.run("reboot") == -1
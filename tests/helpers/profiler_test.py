@@ -0,0 +1,82 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from datetime import date
+from pathlib import Path
+
+from OTCamera.helpers.profiler import SamplingProfiler
+
+
+def _wait_for(event: threading.Event) -> None:
+    event.wait()
+
+
+def test_sample_writesFoldedStacks(tmp_path: Path) -> None:
+    profiler = SamplingProfiler(tmp_path, "otcamera", today=lambda: date(2023, 5, 1))
+    event = threading.Event()
+    thread = threading.Thread(target=_wait_for, args=(event,), name="waiter")
+    thread.start()
+    try:
+        profiler.sample()
+        profiler.sample()
+    finally:
+        event.set()
+        thread.join()
+    profiler.flush()
+
+    lines = (tmp_path / "otcamera_profile_2023-05-01.folded").read_text().splitlines()
+    waiter = [line for line in lines if line.startswith("waiter;")]
+    assert len(waiter) == 1
+    assert "_wait_for (profiler_test.py:" in waiter[0]
+    assert waiter[0].endswith(" 2")
+
+
+def _sample_from_other_thread(profiler: SamplingProfiler) -> None:
+    thread = threading.Thread(target=profiler.sample)
+    thread.start()
+    thread.join()
+
+
+def test_flush_mergesExistingProfileAndRotatesDaily(tmp_path: Path) -> None:
+    profile_file = tmp_path / "otcamera_profile_2023-05-01.folded"
+    profile_file.write_text("MainThread;main (run.py:1) 3\n")
+    today = date(2023, 5, 1)
+    profiler = SamplingProfiler(tmp_path, "otcamera", today=lambda: today)
+
+    _sample_from_other_thread(profiler)
+    today = date(2023, 5, 2)
+    profiler.flush()
+    _sample_from_other_thread(profiler)
+    profiler.flush()
+
+    assert "MainThread;main (run.py:1) 3" in profile_file.read_text()
+    assert len(profile_file.read_text().splitlines()) > 1
+    assert (tmp_path / "otcamera_profile_2023-05-02.folded").exists()
+
+
+def test_flush_newDay_deletesProfilesOlderThanKeepDays(tmp_path: Path) -> None:
+    for day in ("2023-04-29", "2023-04-30", "2023-05-01"):
+        (tmp_path / f"otcamera_profile_{day}.folded").write_text("main 1\n")
+    today = date(2023, 5, 1)
+    profiler = SamplingProfiler(tmp_path, "otcamera", today=lambda: today, keep_days=2)
+    assert not (tmp_path / "otcamera_profile_2023-04-29.folded").exists()
+
+    today = date(2023, 5, 2)
+    profiler.flush()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "otcamera_profile_2023-05-01.folded"
+    ]
@@ -0,0 +1,83 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from unittest.mock import Mock
+
+from OTCamera.helpers import name, segment_journal
+from OTCamera.helpers.keyframe_index import Keyframe, read_index
+from OTCamera.helpers.segment_journal import SegmentEntry, SegmentJournal
+
+SPS = b"\x00\x00\x00\x01\x67\x64\x00\x28"
+FRAME = b"\x00\x00\x01\x65" + b"\x88" * 100
+
+
+def test_journal_startUpdateClear(tmp_path: Path) -> None:
+    video_file = tmp_path / "video.h264"
+    video_file.write_bytes(SPS)
+    clock = Mock(side_effect=[0.0, 5.0, 10.0, 10.0])
+    journal = SegmentJournal(tmp_path / "journal.json", clock=clock)
+
+    journal.start(video_file)
+    video_file.write_bytes(SPS + FRAME)
+    journal.update()
+    assert journal.read().offset == 0
+
+    journal.update()
+    entry = journal.read()
+    assert entry.path == str(video_file)
+    assert entry.offset == len(SPS + FRAME)
+
+    journal.clear()
+    assert journal.read() is None
+
+
+def test_recover_trimsIncompleteNalUnit(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(segment_journal, "_CHUNK_SIZE", 16)
+    video_file = tmp_path / "video.h264"
+    video_file.write_bytes(SPS + FRAME + FRAME + SPS + FRAME[:10])
+
+    recovered = segment_journal.recover(SegmentEntry(str(video_file), "", 0))
+
+    assert recovered == video_file
+    assert video_file.read_bytes() == SPS + FRAME + FRAME + SPS
+
+
+def test_recover_dropsIndexEntriesBeyondTrimmedEnd(tmp_path: Path) -> None:
+    video_file = tmp_path / "video.h264"
+    video_file.write_bytes(SPS + FRAME + SPS + FRAME[:10])
+    index_file = Path(name.keyframe_index(video_file))
+    index_file.write_bytes(
+        b"".join(
+            offset.to_bytes(8, "little") + timestamp.to_bytes(8, "little")
+            for offset, timestamp in ((0, 1000), (len(SPS + FRAME + SPS), 51000))
+        )
+    )
+
+    segment_journal.recover(SegmentEntry(str(video_file), "", 0))
+
+    assert video_file.stat().st_size == len(SPS + FRAME + SPS)
+    assert read_index(index_file) == [Keyframe(0, 1000)]
+
+
+def test_recover_withoutCompleteNalUnit_deletesFile(tmp_path: Path) -> None:
+    video_file = tmp_path / "video.h264"
+    video_file.write_bytes(SPS[:6])
+    index_file = Path(name.keyframe_index(video_file))
+    index_file.write_bytes(b"")
+
+    assert segment_journal.recover(SegmentEntry(str(video_file), "", 0)) is None
+    assert not video_file.exists()
+    assert not index_file.exists()
@@ -0,0 +1,45 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from unittest.mock import Mock
+
+from OTCamera.helpers.startup import StartupTimer
+
+
+def test_mark_measuresPhases() -> None:
+    clock = Mock(side_effect=[1.5, 4.0])
+    timer = StartupTimer(start=0.0, clock=clock)
+
+    timer.mark("config")
+    timer.mark("camera")
+
+    assert timer.phases == [("config", 1.5), ("camera", 2.5)]
+    assert timer.total == 4.0
+    assert timer.summary() == "Startup took 4.00 s (config 1.50 s, camera 2.50 s)"
+
+
+def test_mark_afterSummaryLogged_isIgnored(monkeypatch) -> None:
+    from OTCamera.helpers import log
+
+    monkeypatch.setattr(log, "write", Mock())
+    timer = StartupTimer(start=0.0, clock=Mock(side_effect=[1.0]))
+    timer.mark("camera")
+
+    timer.log_summary()
+    timer.mark("recording")
+    timer.log_summary()
+
+    assert timer.phases == [("camera", 1.0)]
+    log.write.assert_called_once_with("Startup took 1.00 s (camera 1.00 s)")
@@ -0,0 +1,117 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from dataclasses import dataclass
+from unittest import mock
+
+import pytest
+
+from OTCamera.helpers.state_store import StateStore
+
+
+@dataclass(frozen=True)
+class State:
+    count: int = 0
+    on: bool = False
+
+
+def test_update_changesSnapshotAtomically() -> None:
+    store = StateStore(State())
+    snapshot = store.state
+
+    new = store.update(count=1, on=True)
+
+    assert new == State(1, True)
+    assert store.state == new
+    assert snapshot == State()
+
+
+def test_update_notifiesListenersOfChangedFields() -> None:
+    store = StateStore(State())
+    any_change = mock.Mock()
+    on_change = mock.Mock()
+    store.subscribe(any_change)
+    store.subscribe(on_change, "on")
+
+    store.update(count=1)
+    store.update(count=1)
+    store.update(on=True)
+
+    assert any_change.call_args_list == [
+        mock.call(State(0, False), State(1, False)),
+        mock.call(State(1, False), State(1, True)),
+    ]
+    on_change.assert_called_once_with(State(1, False), State(1, True))
+
+
+def test_subscribe_unsubscribe_stopsNotifications() -> None:
+    store = StateStore(State())
+    listener = mock.Mock()
+    unsubscribe = store.subscribe(listener)
+
+    unsubscribe()
+    store.update(count=1)
+
+    listener.assert_not_called()
+
+
+def test_subscribe_unknownField_raises() -> None:
+    with pytest.raises(ValueError, match="missing"):
+        StateStore(State()).subscribe(mock.Mock(), "count", "missing")
+
+
+def test_notify_failingListener_othersNotified() -> None:
+    store = StateStore(State())
+    listener = mock.Mock()
+    store.subscribe(mock.Mock(side_effect=RuntimeError("broken")))
+    store.subscribe(listener)
+
+    store.update(on=True)
+
+    listener.assert_called_once()
+    assert store.state.on
+
+
+def test_transition_concurrentIncrements_noneLost() -> None:
+    store = StateStore(State())
+
+    def increment() -> None:
+        for _ in range(1000):
+            store.transition(lambda state: {"count": state.count + 1})
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.state.count == 4000
+
+
+def test_wait_for_change_changedByOtherThread_wakesUp() -> None:
+    store = StateStore(State())
+    timer = threading.Timer(0.05, store.update, kwargs={"on": True})
+    timer.start()
+
+    assert store.wait_for_change(5)
+    assert store.state.on
+    timer.join()
+
+
+def test_wait_for_change_noChange_timesOut() -> None:
+    store = StateStore(State())
+
+    assert not store.wait_for_change(0.01)
@@ -0,0 +1,78 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+
+from OTCamera.helpers.sysprobe import SystemProbe
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _write(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content + "\n")
+
+
+def test_operstate_withinTtl_isCached(tmp_path: Path) -> None:
+    clock = FakeClock()
+    operstate = tmp_path / "class/net/wlan0/operstate"
+    _write(operstate, "up")
+    probe = SystemProbe(sysfs=tmp_path, ttl=2, clock=clock)
+
+    assert probe.is_interface_up("wlan0")
+    _write(operstate, "down")
+    clock.now = 1
+    assert probe.is_interface_up("wlan0")
+    clock.now = 2
+    assert not probe.is_interface_up("wlan0")
+    assert probe.operstate("eth0") is None
+
+
+def test_radioBlocked_softOrHardBlocked(tmp_path: Path) -> None:
+    _write(tmp_path / "class/rfkill/rfkill0/type", "bluetooth")
+    _write(tmp_path / "class/rfkill/rfkill0/soft", "1")
+    _write(tmp_path / "class/rfkill/rfkill0/hard", "0")
+    _write(tmp_path / "class/rfkill/rfkill1/type", "wlan")
+    _write(tmp_path / "class/rfkill/rfkill1/soft", "0")
+    _write(tmp_path / "class/rfkill/rfkill1/hard", "0")
+    probe = SystemProbe(sysfs=tmp_path, ttl=0)
+
+    assert probe.radio_blocked("wlan") is False
+    assert probe.radio_blocked("bluetooth") is True
+    assert probe.radio_blocked("gps") is None
+    _write(tmp_path / "class/rfkill/rfkill1/hard", "1")
+    assert probe.radio_blocked("wlan") is True
+
+
+def test_setRadioBlocked_writesRfkillEvent(tmp_path: Path) -> None:
+    rfkill_device = tmp_path / "rfkill"
+    probe = SystemProbe(sysfs=tmp_path, rfkill_device=rfkill_device)
+
+    assert probe.set_radio_blocked("wlan", True)
+    assert rfkill_device.read_bytes() == b"\x00\x00\x00\x00\x01\x03\x01\x00"
+    assert probe.set_radio_blocked("wlan", False)
+    assert rfkill_device.read_bytes() == b"\x00\x00\x00\x00\x01\x03\x00\x00"
+
+
+def test_setRadioBlocked_noRfkillDevice_returnsFalse(tmp_path: Path) -> None:
+    probe = SystemProbe(sysfs=tmp_path, rfkill_device=tmp_path / "missing/rfkill")
+
+    assert not probe.set_radio_blocked("wlan", False)
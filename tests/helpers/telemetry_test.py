@@ -0,0 +1,113 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from OTCamera.helpers.telemetry import (
+    FrameInfo,
+    TelemetryCollector,
+    describe_throttled,
+)
+
+MEMINFO = """MemTotal:        3884200 kB
+MemFree:          412000 kB
+MemAvailable:    2048000 kB
+"""
+
+
+def _write(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def _block_stat(writes: int, write_ticks: int) -> str:
+    return f"100 0 800 50 {writes} 0 {writes * 8} {write_ticks} 0 10 60\n"
+
+
+@pytest.fixture
+def roots(tmp_path: Path) -> tuple[Path, Path]:
+    procfs = tmp_path / "proc"
+    sysfs = tmp_path / "sys"
+    _write(procfs / "loadavg", "0.52 0.40 0.31 1/123 4567\n")
+    _write(procfs / "meminfo", MEMINFO)
+    _write(sysfs / "class/thermal/thermal_zone0/temp", "48312\n")
+    _write(sysfs / "devices/platform/soc/soc:firmware/get_throttled", "50005\n")
+    _write(sysfs / "block/mmcblk0/stat", _block_stat(writes=10, write_ticks=100))
+    return procfs, sysfs
+
+
+def test_sample_fakeRoots_readsValues(roots: tuple[Path, Path]) -> None:
+    procfs, sysfs = roots
+    collector = TelemetryCollector(procfs=procfs, sysfs=sysfs)
+
+    first = collector.sample()
+    _write(sysfs / "block/mmcblk0/stat", _block_stat(writes=30, write_ticks=500))
+    second = collector.sample()
+
+    assert first.load == 0.52
+    assert first.soc_temperature == pytest.approx(48.312)
+    assert first.throttled == 0x50005
+    assert first.memory_total == 3884200 * 1024
+    assert first.memory_available == 2048000 * 1024
+    assert first.sd_write_latency is None
+    assert second.sd_write_latency == pytest.approx(0.02)
+    assert collector.latest() == second
+    assert len(collector.history) == 2
+
+
+def test_sample_missingFiles_valuesAreNone(tmp_path: Path) -> None:
+    collector = TelemetryCollector(procfs=tmp_path, sysfs=tmp_path)
+
+    sample = collector.sample()
+
+    assert sample.load is None
+    assert sample.soc_temperature is None
+    assert sample.throttled is None
+    assert sample.memory_available is None
+    assert sample.sd_write_latency is None
+
+
+def test_sample_framesMissing_countsFrameDrops(tmp_path: Path) -> None:
+    frames: list[Optional[FrameInfo]] = [
+        (0, 0),
+        (95, 4_000_000),  # 100 frames expected at 25 fps
+        (0, 50_000),  # recording restarted
+    ]
+    collector = TelemetryCollector(
+        frame_info=lambda: frames.pop(0),
+        fps=lambda: 25,
+        procfs=tmp_path,
+        sysfs=tmp_path,
+    )
+
+    drops = [collector.sample().frame_drops for _ in range(3)]
+
+    assert drops == [0, 5, 0]
+
+
+@pytest.mark.parametrize(
+    "throttled,expected",
+    [
+        (None, "n/a"),
+        (0, "OK"),
+        (0x50005, "under-voltage, throttled, since boot: under-voltage, throttled"),
+        (0x20000, "OK, since boot: frequency capped"),
+    ],
+)
+def test_describeThrottled(throttled: Optional[int], expected: str) -> None:
+    assert describe_throttled(throttled).startswith(expected)
@@ -0,0 +1,188 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+from unittest import mock
+
+import pytest
+
+from OTCamera import config, status
+from OTCamera.helpers.offload_state import UPLOAD, USB, OffloadState
+from OTCamera.helpers.transfer_scheduler import (
+    TransferScheduler,
+    in_windows,
+    transfer_allowed,
+)
+
+NIGHTS = ((22 * 60, 6 * 60),)
+
+
+@pytest.mark.parametrize(
+    "hour,expected", [(21, False), (22, True), (0, True), (5, True), (6, False)]
+)
+def test_in_windows_windowSpanningMidnight(hour: int, expected: bool) -> None:
+    assert in_windows(NIGHTS, datetime(2023, 5, 1, hour, 30)) == expected
+
+
+def test_in_windows_noWindows_always() -> None:
+    assert in_windows((), datetime(2023, 5, 1, 12))
+
+
+@mock.patch.object(config, "USE_BUTTONS", True)
+@mock.patch.object(config, "SERVER_UPLOAD_REQUIRE_EXTERNAL_POWER", True)
+@mock.patch.object(config, "SERVER_UPLOAD_WINDOWS", NIGHTS)
+def test_transfer_allowed_onlyOnExternalPowerInWindow() -> None:
+    night = datetime(2023, 5, 1, 23)
+    previous = status.store.state.external_power_connected
+    try:
+        status.store.update(external_power_connected=False)
+        assert not transfer_allowed(night)
+        status.store.update(external_power_connected=True)
+        assert transfer_allowed(night)
+        assert not transfer_allowed(datetime(2023, 5, 1, 12))
+    finally:
+        status.store.update(external_power_connected=previous)
+
+
+@pytest.fixture
+def videos(tmp_path: Path) -> list[Path]:
+    videos = [tmp_path / f"video_{index}.h264" for index in range(1, 4)]
+    for video in videos:
+        video.touch()
+    return videos
+
+
+class FakeTransfer:
+    """Uploads the videos and reports one byte per video."""
+
+    def __init__(self, fail_at: str = "") -> None:
+        self.fail_at = fail_at
+        self.calls: list[list[Path]] = []
+
+    def __call__(
+        self, videos: list[Path], progress: Callable[[int], None]
+    ) -> Iterator[Path]:
+        self.calls.append(videos)
+        for video in videos:
+            progress(1)
+            if video.name == self.fail_at:
+                raise ConnectionError("server gone")
+            yield video
+
+
+def test_run_pending_notAllowed_keepsVideosQueued(videos: list[Path]) -> None:
+    transfer = FakeTransfer()
+    scheduler = TransferScheduler(transfer, allowed=lambda: False)
+    scheduler.enqueue(*videos)
+
+    scheduler.run_pending()
+
+    assert transfer.calls == []
+    assert scheduler.pending == videos
+
+
+@mock.patch("OTCamera.helpers.transfer_scheduler.log.write", return_value=None)
+def test_run_pending_failure_keepsRemainingVideosQueued(
+    mock_log_write: mock.MagicMock, videos: list[Path]
+) -> None:
+    transfer = FakeTransfer(fail_at="video_2.h264")
+    scheduler = TransferScheduler(transfer, allowed=lambda: True)
+    scheduler.enqueue(*videos, videos[0])
+
+    scheduler.run_pending()
+
+    assert scheduler.pending == videos[1:]
+
+
+@mock.patch("OTCamera.helpers.transfer_scheduler.log.write", return_value=None)
+def test_run_pending_noLongerAllowed_pausesAndResumes(
+    mock_log_write: mock.MagicMock, videos: list[Path]
+) -> None:
+    # allowed before the transfer and for the first video only
+    allowed = iter([True, True, False])
+    transfer = FakeTransfer()
+    scheduler = TransferScheduler(transfer, allowed=lambda: next(allowed, True))
+    scheduler.enqueue(*videos)
+
+    scheduler.run_pending()
+    assert scheduler.pending == videos[1:]
+
+    scheduler.run_pending()
+    assert scheduler.pending == []
+    assert transfer.calls[1] == videos[1:]
+
+
+def test_start_enqueuedVideo_uploadedInBackground(videos: list[Path]) -> None:
+    transfer = FakeTransfer()
+    scheduler = TransferScheduler(transfer, allowed=lambda: True, poll_interval=60)
+    scheduler.start()
+    try:
+        scheduler.enqueue(videos[0])
+        for _ in range(100):
+            if not scheduler.pending:
+                break
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+
+    assert transfer.calls == [[videos[0]]]
+    assert scheduler.pending == []
+
+
+def test_enqueue_proxies_queuedBeforeVideos(videos: list[Path]) -> None:
+    scheduler = TransferScheduler(FakeTransfer())
+    proxy = videos[2].with_name("video_3_proxy.h264")
+
+    scheduler.enqueue(*videos[:2])
+    scheduler.enqueue(videos[2], proxy)
+
+    assert scheduler.pending == [proxy, *videos]
+
+
+def test_enqueue_not_uploaded_videosOfPreviousRun_queued(
+    videos: list[Path], tmp_path: Path
+) -> None:
+    proxy = videos[1].with_name("video_2_proxy.h264")
+    proxy.touch()
+    current_proxy = videos[2].with_name("video_3_proxy.h264")
+    current_proxy.touch()
+    state = OffloadState(tmp_path / "state.json")
+    state.mark(videos[0], UPLOAD)
+    state.mark(videos[1], USB)
+    scheduler = TransferScheduler(FakeTransfer())
+
+    with mock.patch("OTCamera.helpers.transfer_scheduler.offload_state", state):
+        scheduler.enqueue_not_uploaded(tmp_path, exclude=(videos[2], current_proxy))
+
+    assert scheduler.pending == [proxy, videos[1]]
+
+
+def test_enqueue_not_uploaded_withoutArchive_queuesProxiesOnly(
+    videos: list[Path], tmp_path: Path
+) -> None:
+    proxy = videos[0].with_name("video_1_proxy.h264")
+    proxy.touch()
+    scheduler = TransferScheduler(FakeTransfer())
+
+    with mock.patch(
+        "OTCamera.helpers.transfer_scheduler.offload_state",
+        OffloadState(tmp_path / "state.json"),
+    ):
+        scheduler.enqueue_not_uploaded(tmp_path, archive=False)
+
+    assert scheduler.pending == [proxy]
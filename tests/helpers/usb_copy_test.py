@@ -0,0 +1,123 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from OTCamera.helpers.usb_copy import (
+    CopyInformation,
+    CopyJournal,
+    Video,
+    copy_videos,
+)
+
+
+@pytest.fixture
+def src_dir(tmp_path: Path) -> Path:
+    src_dir = tmp_path / "videos"
+    src_dir.mkdir()
+    for name in ["video_1.h264", "video_2.h264", "video_3.h264", "otcamera.log"]:
+        Path(src_dir, name).touch()
+    return src_dir
+
+
+@pytest.fixture
+def dest_dir(tmp_path: Path) -> Path:
+    dest_dir = tmp_path / "usb"
+    dest_dir.mkdir()
+    return dest_dir
+
+
+def test_copyJournal_loadsLatestStatePerVideo(tmp_path: Path) -> None:
+    journal = CopyJournal(tmp_path / "journal.txt")
+
+    journal.append(CopyJournal.COPIED, "video_1.h264")
+    journal.append(CopyJournal.COPIED, "video 2.h264")
+    journal.append(CopyJournal.DELETED, "video_1.h264")
+
+    assert journal.load() == {
+        "video_1.h264": CopyJournal.DELETED,
+        "video 2.h264": CopyJournal.COPIED,
+    }
+
+
+def test_copyInformation_fromCsv_mergesJournalAndDestination(
+    src_dir: Path, dest_dir: Path
+) -> None:
+    csv_file = dest_dir / "copy-info.csv"
+    csv_file.write_text(
+        "filename,copied,delete\n"
+        "video_1.h264,False,x\n"
+        "video_2.h264,no,\n"
+        "video_9.h264,yes,yes\n"
+    )
+    Path(dest_dir, "video_2.h264").touch()
+    journal = CopyJournal(CopyInformation.get_copy_journal(dest_dir))
+    journal.append(CopyJournal.COPIED, "video_3.h264")
+
+    copy_info = CopyInformation.from_csv(csv_file, src_dir, dest_dir)
+
+    assert copy_info.to_dict() == [
+        {"filename": "video_1.h264", "copied": False, "delete": True},
+        {"filename": "video_2.h264", "copied": True, "delete": False},
+        {"filename": "video_3.h264", "copied": True, "delete": False},
+    ]
+    assert [video.filename for video in copy_info.get_copy_plan()] == ["video_1.h264"]
+
+
+def test_copyJournal_compact_keepsOneLinePerCopiedVideo(
+    src_dir: Path, dest_dir: Path
+) -> None:
+    journal = CopyJournal(dest_dir / "journal.txt")
+    journal.append(CopyJournal.COPIED, "video_1.h264")
+    journal.append(CopyJournal.COPIED, "video_1.h264")
+    journal.append(CopyJournal.DELETED, "video_3.h264")
+
+    journal.compact(
+        [
+            Video("video_2.h264", src_dir / "video_2.h264", False, False),
+            Video("video_1.h264", src_dir / "video_1.h264", True, False),
+        ]
+    )
+
+    assert journal.file.read_text() == "copied video_1.h264\n"
+
+
+def test_copy_videos_copyFails_unmounted(src_dir: Path, dest_dir: Path) -> None:
+    usb_copier = mock.Mock()
+    usb_copier.copy_to_usb.side_effect = OSError("USB flash drive removed")
+
+    with pytest.raises(OSError):
+        copy_videos(usb_copier, src_dir, dest_dir)
+
+    usb_copier.unmount_usb_device.assert_called_once()
+    usb_copier.write_copy_info.assert_not_called()
+
+
+def test_copy_videos_excludedVideos_neitherCopiedNorDeleted(
+    src_dir: Path, dest_dir: Path
+) -> None:
+    usb_copier = mock.Mock()
+
+    copy_videos(usb_copier, src_dir, dest_dir, exclude=("video_3.h264",))
+
+    copy_info = usb_copier.copy_to_usb.call_args.args[0]
+    assert {video.filename for video in copy_info.videos} == {
+        "video_1.h264",
+        "video_2.h264",
+    }
+    usb_copier.unmount_usb_device.assert_called_once()
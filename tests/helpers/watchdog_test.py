@@ -0,0 +1,94 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import socket
+from pathlib import Path
+
+import pytest
+
+from OTCamera.helpers import watchdog
+from OTCamera.helpers.watchdog import Watchdog
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_check_loopStalled_isUnhealthy() -> None:
+    clock = FakeClock()
+    dog = Watchdog(stall_timeout=10, clock=clock)
+
+    clock.now = 10
+    assert dog.check()
+
+    clock.now = 11
+    assert not dog.check()
+
+    dog.heartbeat()
+    assert dog.check()
+
+
+def test_check_segmentStalled_requestsRestartThenEscalates(tmp_path: Path) -> None:
+    video_file = tmp_path / "video.h264"
+    video_file.write_bytes(b"\x00")
+    clock = FakeClock()
+    dog = Watchdog(stall_timeout=10, clock=clock)
+    dog.watch_segment(lambda: str(video_file))
+
+    assert dog.check()
+    clock.now = 11
+    dog.heartbeat()
+    assert dog.check()
+    assert dog.take_restart_request()
+    assert not dog.take_restart_request()
+
+    clock.now = 22
+    dog.heartbeat()
+    assert not dog.check()
+
+    video_file.write_bytes(b"\x00\x01")
+    assert dog.check()
+
+
+def test_check_withoutStallTimeout_isAlwaysHealthy() -> None:
+    clock = FakeClock()
+    dog = Watchdog(clock=clock)
+
+    clock.now = 1000
+    assert dog.check()
+
+
+def test_notify_sendsStateToNotifySocket(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    address = str(tmp_path / "notify")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as server:
+        server.bind(address)
+        monkeypatch.setenv("NOTIFY_SOCKET", address)
+
+        assert watchdog.notify("READY=1")
+        assert server.recv(64) == b"READY=1"
+
+
+def test_notify_withoutNotifySocket_returnsFalse(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.delenv("NOTIFY_SOCKET", raising=False)
+
+    assert not watchdog.notify("WATCHDOG=1")
@@ -0,0 +1,247 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import gzip
+import json
+import threading
+import time
+from http.client import HTTPConnection
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from OTCamera.helpers.events import EventDispatcher
+from OTCamera.helpers.live_preview import LivePreview, MjpegOutput
+from OTCamera.helpers.webserver import WebServer, _LatestFrames, _parse_range
+
+VIDEO = bytes(range(256)) * 64
+
+
+class FakeEncoder:
+    """Writes numbered JPEG frames to the output while started."""
+
+    def __init__(self) -> None:
+        self.running = threading.Event()
+        self.stopped = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self, output: MjpegOutput) -> None:
+        self.running.set()
+        self.stopped.clear()
+
+        def encode() -> None:
+            index = 0
+            while self.running.is_set():
+                output.write(b"\xff\xd8" + str(index).encode() + b"\xff\xd9")
+                index += 1
+                time.sleep(0.01)
+
+        self._thread = threading.Thread(target=encode, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.running.clear()
+        self._thread.join()
+        self.stopped.set()
+
+
+@pytest.fixture
+def encoder() -> FakeEncoder:
+    return FakeEncoder()
+
+
+@pytest.fixture
+def dispatcher() -> Iterator[EventDispatcher]:
+    """Dispatches the events in the background like the record loop."""
+    dispatcher = EventDispatcher()
+    stopped = threading.Event()
+
+    def dispatch() -> None:
+        while not stopped.is_set():
+            if dispatcher.wait(0.05):
+                dispatcher.dispatch()
+
+    thread = threading.Thread(target=dispatch, daemon=True)
+    thread.start()
+    yield dispatcher
+    stopped.set()
+    thread.join()
+
+
+@pytest.fixture
+def server(
+    tmp_path: Path, encoder: FakeEncoder, dispatcher: EventDispatcher
+) -> Iterator[WebServer]:
+    video_dir = tmp_path / "videos"
+    video_dir.mkdir()
+    (video_dir / "video.h264").write_bytes(VIDEO)
+    (video_dir / ".offload_state.json").write_text("{}")
+    static_dir = tmp_path / "webfiles"
+    (static_dir / "css").mkdir(parents=True)
+    (static_dir / "css" / "style.css").write_text("body { margin: 0; }\n" * 100)
+    (tmp_path / "secret.txt").write_text("secret")
+    preview = tmp_path / "preview.jpg"
+    preview.write_bytes(b"\xff\xd8jpeg")
+    web_server = WebServer(
+        "127.0.0.1",
+        0,
+        video_dir,
+        preview,
+        static_dir,
+        status_html=lambda: "<html>status</html>",
+        status_data=lambda: {"num-videos": 1},
+        live_preview=LivePreview(encoder.start, encoder.stop, dispatcher),
+    )
+    web_server.start()
+    yield web_server
+    web_server.stop()
+
+
+def request(server: WebServer, path: str, **headers: str):
+    connection = HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def test_status_servedFromMemory(server: WebServer) -> None:
+    response, body = request(server, "/")
+    assert response.status == 200
+    assert body == b"<html>status</html>"
+
+    response, body = request(server, "/status.json")
+    assert response.status == 200
+    assert json.loads(body) == {"num-videos": 1}
+
+
+def test_preview_unchanged_notModified(server: WebServer) -> None:
+    response, body = request(server, "/preview.jpg")
+    etag = response.getheader("ETag")
+    assert body == b"\xff\xd8jpeg"
+    assert etag
+
+    response, body = request(server, "/preview.jpg", **{"If-None-Match": etag})
+    assert response.status == 304
+    assert body == b""
+
+
+def test_video_range_resumesDownload(server: WebServer) -> None:
+    response, body = request(server, "/videos/video.h264", Range="bytes=1000-")
+
+    assert response.status == 206
+    assert response.getheader("Content-Range") == f"bytes 1000-{len(VIDEO) - 1}/16384"
+    assert body == VIDEO[1000:]
+
+
+def test_video_rangeBeyondEnd_notSatisfiable(server: WebServer) -> None:
+    response, _ = request(server, "/videos/video.h264", Range="bytes=20000-")
+
+    assert response.status == 416
+    assert response.getheader("Content-Range") == "bytes */16384"
+
+
+def test_video_listing_hidesHiddenFiles(server: WebServer) -> None:
+    response, body = request(server, "/videos/")
+
+    assert [video["name"] for video in json.loads(body)] == ["video.h264"]
+    assert request(server, "/videos/.offload_state.json")[0].status == 404
+
+
+def test_static_text_gzipped(server: WebServer) -> None:
+    response, body = request(server, "/css/style.css", **{"Accept-Encoding": "gzip"})
+
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == b"body { margin: 0; }\n" * 100
+
+
+def test_static_outsideDirectory_notFound(server: WebServer) -> None:
+    assert request(server, "/../secret.txt")[0].status == 404
+    assert request(server, "/%2e%2e/secret.txt")[0].status == 404
+
+
+def test_concurrentClients_allServed(server: WebServer) -> None:
+    bodies = []
+
+    def download() -> None:
+        bodies.append(request(server, "/videos/video.h264")[1])
+
+    threads = [threading.Thread(target=download) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert bodies == [VIDEO] * 8
+
+
+def test_keepAlive_severalRequestsOnOneConnection(server: WebServer) -> None:
+    connection = HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    for _ in range(3):
+        connection.request("GET", "/preview.jpg")
+        assert connection.getresponse().read() == b"\xff\xd8jpeg"
+
+
+def test_stream_encodesOnlyWhileClientConnected(
+    server: WebServer, encoder: FakeEncoder
+) -> None:
+    assert not encoder.running.is_set()
+    connection = HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    connection.request("GET", "/stream.mjpg")
+    response = connection.getresponse()
+
+    assert response.status == 200
+    assert response.getheader("Content-Type").startswith("multipart/x-mixed-replace")
+    assert response.readline() == b"--frame\r\n"
+    assert response.readline() == b"Content-Type: image/jpeg\r\n"
+    assert encoder.running.is_set()
+
+    response.close()
+    connection.close()
+
+    assert encoder.stopped.wait(5)
+
+
+def test_latest_frames_slowClient_dropsStaleFrames() -> None:
+    async def consume() -> tuple[list[bytes], int]:
+        frames = _LatestFrames(asyncio.get_running_loop(), 2)
+        for frame in (b"1", b"2", b"3", b"4"):
+            frames.put_threadsafe(frame)
+        await asyncio.sleep(0)
+        return [await frames.get(), await frames.get()], frames.dropped
+
+    assert asyncio.run(consume()) == ([b"3", b"4"], 2)
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=900-2000", (900, 999)),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_range(header, expected) -> None:
+    assert _parse_range(header, 1000) == expected
+
+
+def test_parse_range_unsatisfiable_raisesValueError() -> None:
+    with pytest.raises(ValueError):
+        _parse_range("bytes=1000-", 1000)
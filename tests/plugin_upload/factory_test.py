@@ -0,0 +1,52 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from OTCamera.plugin_upload.errors import UnsupportedSchemeError
+from OTCamera.plugin_upload.factory import create_transport
+from OTCamera.plugin_upload.ftp import FtpTransport
+from OTCamera.plugin_upload.http import HttpTransport
+from OTCamera.plugin_upload.sftp import SftpTransport
+
+
+@pytest.mark.parametrize(
+    "scheme,transport_type",
+    [
+        ("ftp", FtpTransport),
+        ("FTPS", FtpTransport),
+        ("sftp", SftpTransport),
+        ("scp", SftpTransport),
+        ("http", HttpTransport),
+        ("https", HttpTransport),
+    ],
+)
+def test_create_transport_supportedScheme(scheme: str, transport_type: type) -> None:
+    transport = create_transport(scheme, "localhost", 1234, "user", "password")
+
+    assert isinstance(transport, transport_type)
+
+
+def test_create_transport_httpScheme_buildsUrl() -> None:
+    transport = create_transport("http", "localhost", 8080, "user", "password")
+
+    assert transport.url("videos/video 1.h264") == (
+        "http://localhost:8080/videos/video%201.h264"
+    )
+
+
+def test_create_transport_unsupportedScheme_raisesError() -> None:
+    with pytest.raises(UnsupportedSchemeError):
+        create_transport("smb", "localhost", 445, "user", "password")
@@ -0,0 +1,199 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from OTCamera.plugin_upload.errors import UploadError
+from OTCamera.plugin_upload.http import HttpTransport
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Stores uploaded files in memory and remembers the client connections."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.files: dict[str, bytes] = {}
+        self.clients: set[tuple[str, int]] = set()
+        self.resumable = True
+        self.upload_offsets: list[str] = []
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def do_HEAD(self) -> None:
+        self.server.clients.add(self.client_address)
+        if self.path not in self.server.files:
+            self._respond(404)
+            return
+        size = str(len(self.server.files[self.path]))
+        self.send_response(200)
+        self.send_header("Content-Length", size)
+        if self.server.resumable and self.headers.get("Tus-Resumable") == "1.0.0":
+            self.send_header("Tus-Resumable", "1.0.0")
+            self.send_header("Upload-Offset", size)
+        self.end_headers()
+
+    def do_PUT(self) -> None:
+        self.server.clients.add(self.client_address)
+        assert "Content-Range" not in self.headers
+        self.server.files[self.path] = self._read_chunked()
+        self._respond(201)
+
+    def do_PATCH(self) -> None:
+        self.server.clients.add(self.client_address)
+        assert self.server.resumable
+        assert self.headers["Content-Type"] == "application/offset+octet-stream"
+        offset = self.headers["Upload-Offset"]
+        self.server.upload_offsets.append(offset)
+        if int(offset) != len(self.server.files[self.path]):
+            self._respond(409)
+            return
+        self.server.files[self.path] += self._read_chunked()
+        self._respond(204)
+
+    def _read_chunked(self) -> bytes:
+        assert self.headers.get("Transfer-Encoding") == "chunked"
+        body = b""
+        while size := int(self.rfile.readline().strip(), 16):
+            body += self.rfile.read(size)
+            self.rfile.readline()
+        self.rfile.readline()
+        return body
+
+    def _respond(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[StandInServer]:
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport(server: StandInServer) -> Iterator[HttpTransport]:
+    with HttpTransport(
+        "127.0.0.1",
+        server.server_address[1],
+        "user",
+        "password",
+        timeout=5,
+        chunk_size=1000,
+        scheme="http",
+    ) as transport:
+        yield transport
+
+
+@pytest.fixture
+def video(tmp_path: Path) -> Path:
+    video = tmp_path / "video_1.h264"
+    video.write_bytes(bytes(range(256)) * 20)
+    return video
+
+
+def test_upload_newFile_streamsInChunks(
+    server: StandInServer, transport: HttpTransport, video: Path
+) -> None:
+    progress: list[int] = []
+
+    result = transport.upload(video, "/videos/video_1.h264", progress.append)
+
+    assert server.files["/videos/video_1.h264"] == video.read_bytes()
+    assert progress == [1000] * 5 + [120]
+    assert result.bytes_sent == 5120
+    assert not result.resumed
+
+
+def test_upload_partialFile_resumesAtRemoteSize(
+    server: StandInServer, transport: HttpTransport, video: Path
+) -> None:
+    server.files["/videos/video_1.h264"] = video.read_bytes()[:3000]
+
+    result = transport.upload(video, "/videos/video_1.h264")
+
+    assert server.files["/videos/video_1.h264"] == video.read_bytes()
+    assert server.upload_offsets == ["3000"]
+    assert result.offset == 3000
+    assert result.bytes_sent == 2120
+
+
+def test_upload_partialFileWithoutResumeSupport_uploadsWholeFile(
+    server: StandInServer, transport: HttpTransport, video: Path
+) -> None:
+    server.resumable = False
+    server.files["/videos/video_1.h264"] = video.read_bytes()[:3000]
+
+    result = transport.upload(video, "/videos/video_1.h264")
+
+    assert server.files["/videos/video_1.h264"] == video.read_bytes()
+    assert server.upload_offsets == []
+    assert result.offset == 0
+    assert result.bytes_sent == 5120
+
+
+def test_upload_completeFileWithoutResumeSupport_sendsNothing(
+    server: StandInServer, transport: HttpTransport, video: Path
+) -> None:
+    server.resumable = False
+    server.files["/videos/video_1.h264"] = video.read_bytes()
+
+    result = transport.upload(video, "/videos/video_1.h264")
+
+    assert result.bytes_sent == 0
+
+
+def test_upload_completeFile_sendsNothing(
+    server: StandInServer, transport: HttpTransport, video: Path
+) -> None:
+    server.files["/videos/video_1.h264"] = video.read_bytes()
+
+    result = transport.upload(video, "/videos/video_1.h264")
+
+    assert result.bytes_sent == 0
+
+
+def test_upload_severalFiles_reusesConnection(
+    server: StandInServer, transport: HttpTransport, video: Path
+) -> None:
+    transport.upload(video, "/videos/video_1.h264")
+    transport.upload(video, "/videos/video_2.h264")
+
+    assert len(server.clients) == 1
+
+
+def test_upload_serverGone_raisesUploadError(
+    server: StandInServer, transport: HttpTransport, video: Path
+) -> None:
+    server.shutdown()
+    server.server_close()
+
+    with pytest.raises(UploadError):
+        transport.upload(video, "/videos/video_1.h264")
@@ -0,0 +1,157 @@
+# Copyright (C) 2023 OpenTrafficCam Contributors
+# <https://github.com/OpenTrafficCam>
+# <team@opentrafficcam.org>
+
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <https://www.gnu.org/licenses/>.
+
+from ftplib import error_perm
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+import pytest
+
+from OTCamera.plugin_ftp_server.upload import FtpUpload
+from OTCamera.plugin_upload.transport import ProgressCallback, Transport
+
+
+class MemoryTransport(Transport):
+    """Keeps the uploaded files in memory and counts the round trips."""
+
+    scheme = "memory"
+
+    def __init__(self, can_list: bool = True) -> None:
+        super().__init__("localhost", 0, "user", "password")
+        self.can_list = can_list
+        self.files: dict[PurePosixPath, bytes] = {}
+        self.round_trips = 0
+
+    def _connect(self) -> None:
+        pass
+
+    def _close(self) -> None:
+        pass
+
+    def _list_dir(self, directory: PurePosixPath) -> Optional[dict[str, int]]:
+        if not self.can_list:
+            return None
+        self.round_trips += 1
+        return {
+            path.name: len(data)
+            for path, data in self.files.items()
+            if path.parent == directory
+        }
+
+    def _remote_size(self, dest: PurePosixPath) -> int:
+        self.round_trips += 1
+        return len(self.files.get(dest, b""))
+
+    def _send(
+        self,
+        source: Path,
+        dest: PurePosixPath,
+        offset: int,
+        size: int,
+        progress: ProgressCallback,
+    ) -> None:
+        data = self.files.get(dest, b"")[:offset]
+        for chunk in self.read_chunks(source, offset):
+            data += chunk
+            progress(len(chunk))
+        self.files[dest] = data
+
+
+@pytest.fixture
+def videos(tmp_path: Path) -> list[Path]:
+    videos = []
+    for index in range(1, 5):
+        video = tmp_path / f"video_{index}.h264"
+        video.write_bytes(bytes([index]) * 100 * index)
+        videos.append(video)
+    return videos
+
+
+def test_sync_uploadsOnlyMissingAndPartialFiles(videos: list[Path]) -> None:
+    dest_dir = PurePosixPath("/videos")
+    transport = MemoryTransport()
+    transport.files[dest_dir / "video_1.h264"] = videos[0].read_bytes()
+    transport.files[dest_dir / "video_2.h264"] = videos[1].read_bytes()[:50]
+
+    results = list(transport.sync(videos, dest_dir))
+
+    assert [(result.offset, result.bytes_sent) for result in results] == [
+        (100, 0),
+        (50, 150),
+        (0, 300),
+        (0, 400),
+    ]
+    for video in videos:
+        assert transport.files[dest_dir / video.name] == video.read_bytes()
+    assert transport.round_trips == 1
+
+
+def test_sync_transportUnableToList_queriesEachFile(videos: list[Path]) -> None:
+    dest_dir = PurePosixPath("/videos")
+    transport = MemoryTransport(can_list=False)
+    transport.files[dest_dir / "video_1.h264"] = videos[0].read_bytes()
+
+    results = list(transport.sync(videos, dest_dir))
+
+    assert [result.bytes_sent for result in results] == [0, 200, 300, 400]
+    assert transport.round_trips == len(videos)
+
+
+class RecordingFtp:
+    """Records the commands sent and knows the directories of the server."""
+
+    def __init__(self, dirs: set[str], files: dict[str, int]) -> None:
+        self.dirs = dirs
+        self.files = files
+        self.commands: list[str] = []
+        self.cwd_path = "/"
+
+    def cwd(self, dirname: str) -> None:
+        self.commands.append(f"CWD {dirname}")
+        path = str(Path(self.cwd_path, dirname))
+        if path not in self.dirs:
+            raise error_perm("550 No such directory")
+        self.cwd_path = path
+
+    def mkd(self, dirname: str) -> None:
+        self.commands.append(f"MKD {dirname}")
+        self.dirs.add(str(Path(self.cwd_path, dirname)))
+
+    def mlsd(self, facts: list[str]):
+        self.commands.append("MLSD")
+        return [(".", {"type": "cdir"})] + [
+            (name, {"type": "file", "size": str(size)})
+            for name, size in self.files.items()
+        ]
+
+
+def test_list_dir_existingDir_singleCwdAndMlsd() -> None:
+    client = RecordingFtp({"/", "/videos", "/videos/cam"}, {"video_1.h264": 100})
+    uploader = FtpUpload()
+
+    files = uploader.list_dir(client, Path("/videos/cam"))
+    uploader.list_dir(client, Path("/videos/cam"))
+
+    assert files == {"video_1.h264": 100}
+    assert client.commands == ["CWD /videos/cam", "MLSD", "MLSD"]
+
+
+def test_list_dir_missingDir_createsDir() -> None:
+    client = RecordingFtp({"/"}, {})
+    uploader = FtpUpload()
+
+    assert uploader.list_dir(client, Path("/videos")) == {}
+    assert client.cwd_path == "/videos"
+    assert "MKD videos" in client.commands
@@ -88,12 +88,15 @@ def test_record_handleENOSPC(
 
 
 def test_record_videoRecordedHasCorrectFrames(otcamera: OTCamera, test_dir: Path):
-    config.NUM_INTERVALS = 2
-    config.INTERVAL_LENGTH = 2  # in min
-
     video_dir = test_dir / "videos"
     video_dir.mkdir(exist_ok=True)
-    config.VIDEO_DIR = str(video_dir)
+    config.apply(
+        {
+            "NUM_INTERVALS": 2,
+            "INTERVAL_LENGTH": 2,  # in min
+            "VIDEO_DIR": str(video_dir),
+        }
+    )
 
     with pytest.raises(SystemExit):
         otcamera.record()